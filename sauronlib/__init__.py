@@ -1,30 +1,61 @@
+import importlib
 import logging
+import types
 from pathlib import Path
 from typing import Sequence, Optional
-from terminaltables import AsciiTable
 
-logger = logging.getLogger('sauronlib')
+logger = logging.getLogger("sauronlib")
 
-# importlib.metadata is compat with Python 3.8 only
-from importlib_metadata import PackageNotFoundError, metadata as __load
+__status__ = "Development"
+__copyright__ = "Copyright 2016–2020"
+__date__ = "2020-05-22"
+
+# read from the package metadata on first access, because importlib_metadata is slow to import
+_metadata_keys = {
+	"__uri__": "home-page",
+	"__title__": "name",
+	"__summary__": "summary",
+	"__license__": "license",
+	"__version__": "version",
+	"__author__": "author",
+	"__maintainer__": "maintainer",
+	"__contact__": "maintainer",
+}
+
+
+def __getattr__(name: str):
+	if name == "metadata":
+		# importlib.metadata is compat with Python 3.8 only
+		from importlib_metadata import PackageNotFoundError, metadata as __load
+		try:
+			globals()["metadata"] = __load(Path(__file__).parent.name)
+		except PackageNotFoundError:
+			logger.error("Failed to import from sauronlib", exc_info=True)
+			globals()["metadata"] = None
+		return globals()["metadata"]
+	if name in _metadata_keys:
+		metadata = __getattr__("metadata")
+		return None if metadata is None else metadata[_metadata_keys[name]]
+	raise AttributeError("module {} has no attribute {}".format(__name__, name))
+
+
+class LazyModule(types.ModuleType):
+	"""A stand-in for a module that imports it on first attribute access.
+	Afterward, the module's attributes are copied in, so lookups cost the same as on the module itself.
+	Example usage:
+		cv2 = lazy_import('cv2')  # at module level; cv2 is imported when cv2.VideoCapture is first used
+	"""
+	def __getattr__(self, attr: str):
+		module = importlib.import_module(self.__name__)
+		self.__dict__.update(module.__dict__)
+		return getattr(module, attr)
+
+	def __repr__(self) -> str:
+		return "LazyModule({})".format(self.__name__)
 
-logger = logging.getLogger("sauronlib")
 
-try:
-    metadata = __load(Path(__file__).parent.name)
-    __status__ = "Development"
-    __copyright__ = "Copyright 2016–2020"
-    __date__ = "2020-05-22"
-    __uri__ = metadata["home-page"]
-    __title__ = metadata["name"]
-    __summary__ = metadata["summary"]
-    __license__ = metadata["license"]
-    __version__ = metadata["version"]
-    __author__ = metadata["author"]
-    __maintainer__ = metadata["maintainer"]
-    __contact__ = metadata["maintainer"]
-except PackageNotFoundError:
-    logger.error("Failed to import from sauronlib", exc_info=True)
+def lazy_import(name: str) -> types.ModuleType:
+	return LazyModule(name)
 
 
 def stamp(dt):
@@ -32,6 +63,7 @@ def stamp(dt):
 	return dt.isoformat(timespec='microseconds')
 
 def show_table(headers: Sequence[str], rows: Sequence[Sequence[str]], title: Optional[str] = None) -> str:
+	from terminaltables import AsciiTable
 	data = [headers]
 	data.extend(rows)
 	return AsciiTable(data, title=title).table
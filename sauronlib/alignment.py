@@ -0,0 +1,241 @@
+"""
+Post-run alignment of the files written during a run.
+Loads the stimulus log, sensor CSVs, microphone timestamps, and camera timestamps as sorted NumPy arrays
+and joins them onto a common timeline with np.searchsorted, which is O(n log m) and fully vectorized.
+All files are expected to share one time base (see RunClock), and their timestamps to be ISO 8601 strings.
+"""
+
+from typing import Dict, List, Mapping, Optional
+
+import numpy as np
+
+from sauronlib import logger, lazy_import
+
+pd = lazy_import('pandas')
+
+_stamp_format = '%Y-%m-%dT%H:%M:%S.%f'
+_stamp_length = len('2020-01-01T00:00:00.000000')
+
+
+class TimeStream:
+	"""Timestamps in nanoseconds, sorted ascending, with one value per timestamp.
+	For sensors, the values are readings; for camera and microphone timestamp files, they're frame or buffer indices.
+	"""
+	def __init__(self, name: str, times_ns: np.ndarray, values: Optional[np.ndarray] = None) -> None:
+		times_ns = np.asarray(times_ns, dtype=np.int64)
+		values = np.arange(len(times_ns)) if values is None else np.asarray(values)
+		if len(times_ns) != len(values):
+			raise ValueError("Stream {} has {} times but {} values".format(name, len(times_ns), len(values)))
+		if len(times_ns) > 1 and np.any(times_ns[1:] < times_ns[:-1]):
+			logger.warning("Timestamps for {} are out of order; sorting".format(name))
+			order = np.argsort(times_ns, kind='stable')
+			times_ns, values = times_ns[order], values[order]
+		self.name = name
+		self.times_ns = times_ns
+		self.values = values
+
+	def __len__(self) -> int:
+		return len(self.times_ns)
+
+	def __repr__(self) -> str:
+		return "TimeStream({}, n={})".format(self.name, len(self))
+	def __str__(self): return repr(self)
+
+
+def parse_stamps(stamps) -> np.ndarray:
+	"""Parses ISO 8601 timestamps (as written by RunClock.stamp) to int64 nanoseconds."""
+	parsed = pd.to_datetime(pd.Series(stamps), format=_stamp_format)
+	return parsed.values.astype('datetime64[ns]').astype(np.int64)
+
+
+def _parse_line_end_stamps(path: str, skip_lines: int, chunk_size: int = 1000000) -> Optional[np.ndarray]:
+	"""Parses the timestamp that ends each line of a file straight from its bytes, without building Python strings.
+	This is several times faster than pandas for long files.
+	Returns None if any line does not end in a timestamp in RunClock.stamp's exact format.
+	"""
+	buf = np.fromfile(path, dtype=np.uint8)
+	if len(buf) == 0 or buf[-1] != ord('\n'):
+		buf = np.append(buf, np.uint8(ord('\n')))
+	ends = np.flatnonzero(buf == ord('\n'))
+	starts = np.concatenate(([0], ends[:-1] + 1))
+	# tolerate CRLF line endings from files written in text mode on Windows
+	ends = ends - (buf[np.maximum(ends - 1, 0)] == ord('\r'))
+	starts, ends = starts[skip_lines:], ends[skip_lines:]
+	nonblank = ends > starts
+	starts, ends = starts[nonblank], ends[nonblank]
+	if len(ends) == 0:
+		return np.empty(0, dtype=np.int64)
+	if (ends - starts).min() < _stamp_length:
+		return None
+	windows = np.lib.stride_tricks.as_strided(buf, shape=(len(buf) - _stamp_length + 1, _stamp_length), strides=(1, 1))
+	times_ns = np.empty(len(ends), dtype=np.int64)
+	for i in range(0, len(ends), chunk_size):
+		parsed = _parse_stamp_block(windows[ends[i:i + chunk_size] - _stamp_length])
+		if parsed is None:
+			return None
+		times_ns[i:i + chunk_size] = parsed
+	return times_ns
+
+
+def _parse_stamp_block(block: np.ndarray) -> Optional[np.ndarray]:
+	"""Parses an (n, 26) uint8 array of timestamps like 2020-01-01T00:00:00.000000 to nanoseconds."""
+	for position, char in ((4, '-'), (7, '-'), (10, 'T'), (13, ':'), (16, ':'), (19, '.')):
+		if np.any(block[:, position] != ord(char)):
+			return None
+	digits = block - np.uint8(ord('0'))
+
+	def number(begin: int, end: int) -> np.ndarray:
+		value = digits[:, begin].astype(np.int32)
+		for position in range(begin + 1, end):
+			value = value * 10 + digits[:, position]
+		return value
+
+	ymd = number(0, 4) * 10000 + number(5, 7) * 100 + number(8, 10)
+	# there are very few distinct dates, so convert those and broadcast back
+	unique_dates, inverse = np.unique(ymd, return_inverse=True)
+	days = np.array([
+		np.datetime64('{:04d}-{:02d}-{:02d}'.format(d // 10000, d // 100 % 100, d % 100), 'D')
+		for d in unique_dates
+	]).astype(np.int64)[inverse.ravel()]
+	seconds = (number(11, 13) * 60 + number(14, 16)) * 60 + number(17, 19)
+	return ((days * 86400 + seconds) * 1000000 + number(20, 26)) * 1000
+
+
+def read_timestamps(path: str, name: Optional[str] = None) -> TimeStream:
+	"""Reads a file of one timestamp per line, such as a camera or microphone timestamps file."""
+	times_ns = _parse_line_end_stamps(path, 0)
+	if times_ns is None:
+		times_ns = parse_stamps(pd.read_csv(path, header=None, names=['time'], dtype=str, engine='c')['time'])
+	return TimeStream(path if name is None else name, times_ns)
+
+
+def read_sensor_csv(path: str, name: Optional[str] = None) -> TimeStream:
+	"""Reads a CSV with columns Value and Time, as written by ArduinoCsvSensor."""
+	times_ns = _parse_line_end_stamps(path, 1)
+	if times_ns is None:
+		df = pd.read_csv(path, usecols=['Value', 'Time'], dtype={'Value': np.float64, 'Time': str}, engine='c')
+		return TimeStream(path if name is None else name, parse_stamps(df['Time']), df['Value'].values)
+	values = pd.read_csv(path, usecols=['Value'], dtype={'Value': np.float64}, engine='c')['Value'].values
+	return TimeStream(path if name is None else name, times_ns, values)
+
+
+def match_indices(times_ns: np.ndarray, targets_ns: np.ndarray, direction: str = 'backward', tolerance_ns: Optional[int] = None) -> np.ndarray:
+	"""For each target, finds the index of the matching element of the sorted array times_ns, or -1 if there is none.
+	:param direction: 'backward' for the last time <= target, 'forward' for the first time >= target, or 'nearest'
+	:param tolerance_ns: If set, matches further than this from the target are -1
+	"""
+	n = len(times_ns)
+	if n == 0:
+		return np.full(len(targets_ns), -1, dtype=np.int64)
+	if direction == 'backward':
+		idx = np.searchsorted(times_ns, targets_ns, side='right') - 1
+	elif direction == 'forward':
+		idx = np.searchsorted(times_ns, targets_ns, side='left')
+		idx[idx == n] = -1
+	elif direction == 'nearest':
+		right = np.searchsorted(times_ns, targets_ns, side='left')
+		left = np.clip(right - 1, 0, n - 1)
+		right = np.clip(right, 0, n - 1)
+		use_left = np.abs(targets_ns - times_ns[left]) <= np.abs(times_ns[right] - targets_ns)
+		idx = np.where(use_left, left, right)
+	else:
+		raise ValueError("Direction {} is not one of 'backward', 'forward', or 'nearest'".format(direction))
+	idx = idx.astype(np.int64)
+	if tolerance_ns is not None:
+		valid = idx >= 0
+		too_far = np.abs(times_ns[np.where(valid, idx, 0)] - targets_ns) > tolerance_ns
+		idx[valid & too_far] = -1
+	return idx
+
+
+class RunAlignment:
+	"""All of the timestamped outputs of one run, joinable into a single time-aligned table.
+	Example usage:
+		run = RunAlignment.from_files(
+			'stimuli.csv', {'thermometer': 'thermometer.csv'},
+			microphone_timestamps_path='microphone-timestamps.txt', camera_timestamps_paths={'cam0': 'cam0-timestamps.txt'}
+		)
+		events = run.by_stimulus()            # one row per stimulus event, with the previous sensor reading
+		frames = run.by_frame('cam0')         # one row per camera frame, with stimulus intensities and nearest readings
+	"""
+	def __init__(
+			self, stimuli: 'pd.DataFrame', start_ns: Optional[int], end_ns: Optional[int],
+			sensors: List[TimeStream], cameras: List[TimeStream]
+	) -> None:
+		"""
+		:param stimuli: Stimulus events with columns time_ns, id, and intensity, sorted by time_ns
+		:param sensors: Streams with values, including the microphone (whose values are buffer indices)
+		:param cameras: Frame timestamps, by camera
+		"""
+		self.stimuli = stimuli
+		self.start_ns = start_ns
+		self.end_ns = end_ns
+		self.sensors = sensors
+		self.cameras = {c.name: c for c in cameras}  # type: Dict[str, TimeStream]
+
+	@classmethod
+	def from_files(
+			cls, stimulus_log_path: str, sensor_paths: Optional[Mapping[str, str]] = None,
+			microphone_timestamps_path: Optional[str] = None, camera_timestamps_paths: Optional[Mapping[str, str]] = None
+	):
+		stimuli = pd.read_csv(stimulus_log_path, dtype={'datetime': str}, engine='c')
+		stimuli.insert(0, 'time_ns', parse_stamps(stimuli['datetime']))
+		stimuli = stimuli.drop(columns=['datetime'])
+		# StimulusTimeLog.write brackets the events with start and end rows of id 0
+		start_ns, end_ns = None, None
+		# ids are read as strings if any key is a name, so compare as strings
+		if len(stimuli) >= 2 and str(stimuli['id'].iloc[0]) == '0' and str(stimuli['id'].iloc[-1]) == '0':
+			start_ns, end_ns = int(stimuli['time_ns'].iloc[0]), int(stimuli['time_ns'].iloc[-1])
+			stimuli = stimuli.iloc[1:-1]
+		stimuli = stimuli.sort_values('time_ns', kind='stable').reset_index(drop=True)
+		sensors = [read_sensor_csv(path, name) for name, path in ({} if sensor_paths is None else sensor_paths).items()]
+		if microphone_timestamps_path is not None:
+			sensors.append(read_timestamps(microphone_timestamps_path, 'microphone'))
+		cameras = [read_timestamps(path, name) for name, path in ({} if camera_timestamps_paths is None else camera_timestamps_paths).items()]
+		return cls(stimuli, start_ns, end_ns, sensors, cameras)
+
+	def by_stimulus(self, direction: str = 'backward', tolerance_ms: Optional[float] = None) -> 'pd.DataFrame':
+		"""One row per stimulus event, with the matching value of each sensor and the matching frame of each camera.
+		Unmatched values are NaN and unmatched frames are -1.
+		Each stream also gets a column {name}_offset_ms, the sample time minus the event time.
+		"""
+		return self._join(self.stimuli.copy(), list(self.cameras.values()), direction, tolerance_ms)
+
+	def by_frame(self, camera: str, direction: str = 'nearest', tolerance_ms: Optional[float] = None) -> 'pd.DataFrame':
+		"""One row per frame of camera, with the intensity of every stimulus at that frame,
+		the matching value of each sensor, and the matching frame of each other camera.
+		"""
+		frames = self.cameras[camera]
+		table = pd.DataFrame({'frame': frames.values, 'time_ns': frames.times_ns})
+		# the intensity of a stimulus at a frame is that of its last event at or before the frame
+		for stim_id, events in self.stimuli.groupby('id', sort=True):
+			idx = match_indices(events['time_ns'].values, frames.times_ns, 'backward')
+			intensities = events['intensity'].values
+			table['stimulus_{}'.format(stim_id)] = np.where(idx >= 0, intensities[np.maximum(idx, 0)], 0)
+		others = [c for c in self.cameras.values() if c.name != camera]
+		return self._join(table, others, direction, tolerance_ms)
+
+	def _join(self, table: 'pd.DataFrame', cameras: List[TimeStream], direction: str, tolerance_ms: Optional[float]) -> 'pd.DataFrame':
+		targets = table['time_ns'].values
+		tolerance_ns = None if tolerance_ms is None else int(tolerance_ms * 1e6)
+		for stream in self.sensors + cameras:
+			idx = match_indices(stream.times_ns, targets, direction, tolerance_ns)
+			found = idx >= 0
+			safe = np.maximum(idx, 0)
+			if len(stream) == 0:
+				table[stream.name] = -1 if stream.values.dtype.kind in 'iu' else np.nan
+			elif stream.values.dtype.kind in 'iu':
+				# frame and buffer indices
+				table[stream.name] = np.where(found, stream.values[safe], -1)
+			else:
+				table[stream.name] = np.where(found, stream.values[safe], np.nan)
+			offsets = (stream.times_ns[safe] - targets) / 1e6 if len(stream) > 0 else np.zeros(len(targets))
+			table[stream.name + '_offset_ms'] = np.where(found, offsets, np.nan)
+		return table
+
+	def __repr__(self) -> str:
+		return "RunAlignment(n_stimuli={}, sensors={}, cameras={})".format(len(self.stimuli), self.sensors, list(self.cameras.values()))
+	def __str__(self): return repr(self)
+
+
+__all__ = ['TimeStream', 'RunAlignment', 'parse_stamps', 'read_timestamps', 'read_sensor_csv', 'match_indices']
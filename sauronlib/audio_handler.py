@@ -1,11 +1,14 @@
-import platform, typing
-from typing import Optional
+import platform, re, subprocess, threading, time, typing
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence
 
 from klgists.common.exceptions import ExternalCommandFailed
 from klgists.files.wrap_cmd_call import wrap_cmd_call
 
 from sauronlib import logger
 from sauronlib.audio_info import AudioInfo
+from sauronlib.audio_output import AudioOutputEngine
+from sauronlib.tracing import tracer
 
 
 class CouldNotConfigureOsAudioError(IOError):
@@ -18,6 +21,8 @@ class GlobalAudio:
 	"""A global lock for audio input and output.
 	Calling start() turns it on and calling stop() turns it off.
 	Doing so may change the intput and output device if necessary.
+	If an AudioOutputEngine is given, its output stream is opened once on start and reused by every play();
+	otherwise each play() opens its own stream through simpleaudio.
 	"""
 
 	def start(self) -> None:
@@ -32,24 +37,53 @@ class GlobalAudio:
 		"""
 		pass
 
-	def __init__(self) -> None:
+	def __init__(self, engine: Optional[AudioOutputEngine] = None) -> None:
 		self.is_on = False  # type: bool
+		self.engine = engine
 
 	def __enter__(self):
 		self.start()
+		self._open_output()
 		self.is_on = True
 		return self
 
 	def __exit__(self, exc_type, exc_val, exc_tb):
+		self._close_output()
 		self.stop()
 		self.is_on = False
 
-	def play(self, info: AudioInfo, blocking: bool = False):
+	def _open_output(self) -> None:
+		if self.engine is not None:
+			self.engine.start()
+
+	def _close_output(self) -> None:
+		if self.engine is not None:
+			self.engine.stop()
+
+	def play(self, info: AudioInfo, blocking: bool = False, at_sample: Optional[int] = None, gain: float = 1.0):
+		"""Plays the audio now, or, with an engine, at sample position at_sample of the engine's stream.
+		With an engine, overlapping audio is mixed, and gain scales this audio in the mix.
+		If blocking, returns once the audio has finished, which with at_sample is at_sample plus its length.
+		Without an engine, playback can't be scheduled, so passing at_sample raises a ValueError.
+		"""
 		assert self.is_on, "Cannot play sound because the audio service is off"
+		if at_sample is not None and self.engine is None:
+			raise ValueError("at_sample requires an AudioOutputEngine")
 		if info.intensity > 0:
-			aud = info.wave_obj.play()
-			if blocking:
-				aud.wait_done()
+			with tracer.span('audio.play', 'audio', sound=info.name, engine=self.engine is not None, blocking=blocking):
+				if self.engine is not None:
+					samples = info.samples()
+					self.engine.schedule(samples, at_sample, gain)
+					if blocking:
+						now_ns = self.engine.clock.now_ns
+						start = self.engine.sample_at(now_ns()) if at_sample is None else at_sample
+						wait_ns = self.engine.time_of(start + len(samples)) - now_ns()
+						if wait_ns > 0:
+							time.sleep(wait_ns / 1e9)
+				else:
+					aud = info.wave_obj.play()
+					if blocking:
+						aud.wait_done()
 
 
 class SmartGlobalAudio(GlobalAudio):
@@ -63,9 +97,9 @@ class SmartGlobalAudio(GlobalAudio):
 			self,
 			input_device: Optional[typing.Tuple[str, str]], output_device: Optional[typing.Tuple[str, str]],
 			input_gain: Optional[typing.Tuple[int, int]], output_gain: Optional[typing.Tuple[int, int]],
-			timeout_secs: float
+			timeout_secs: float, engine: Optional[AudioOutputEngine] = None
 	):
-		super(SmartGlobalAudio, self).__init__()
+		super(SmartGlobalAudio, self).__init__(engine)
 		self.input_device = input_device
 		self.output_device = output_device
 		self.input_gain = input_gain
@@ -92,13 +126,16 @@ class SmartGlobalAudio(GlobalAudio):
 			return
 		self.__wrap('start')
 		logger.debug("Starting audio handler.")
+		self._open_output()
 		self.is_on = True
 		logger.info("Started audio handler.")
 
 	def stop(self) -> None:
 		if not self.is_on:
 			logger.debug("Audio handler is already off. Ignoring.")
+			return
 		logger.debug("Stopping audio handler.")
+		self._close_output()
 		self.__wrap('stop')
 		self.is_on = False
 		logger.info("Stopped audio handler.")
@@ -112,12 +149,46 @@ class SmartGlobalAudio(GlobalAudio):
 			raise CouldNotConfigureOsAudioError("OS {} not recognized".format(platform.system())) from e
 
 
+class OsAudioSetting:
+	"""One device or gain to set through the OS: a command that sets it, and optionally a command that reads it.
+	If read_cmd is given, parse turns its stdout into a value comparable to target.
+	"""
+	def __init__(
+			self, name: str, target: typing.Any, set_cmd: List[str],
+			read_cmd: Optional[List[str]] = None, parse: Callable[[str], typing.Any] = str.strip
+	) -> None:
+		self.name = name
+		self.target = target
+		self.set_cmd = set_cmd
+		self.read_cmd = read_cmd
+		self.parse = parse
+
+	def __repr__(self) -> str:
+		return "OsAudioSetting({}={})".format(self.name, self.target)
+	def __str__(self): return repr(self)
+
+
+def _parse_percent(out: str) -> Optional[int]:
+	match = re.search(r'(\d+)%', out)
+	return None if match is None else int(match.group(1))
+
+
 class DefaultSmartGlobalAudio(SmartGlobalAudio):
 	"""
-	A default implementation of SmartGlobalAudio.
-	WARNING: Won't break on Windows, but only changes sources in Mac OS.
+	A default implementation of SmartGlobalAudio for Mac OS (SwitchAudioSource and osascript),
+	Linux (pactl, for PulseAudio or PipeWire), and Windows (nircmd).
+	Where the OS can report the current device or gain, it's read first and settings that already match are skipped.
+	Values read or set are cached until refresh(), so a stop() followed by start() only runs what changed.
+	Commands that don't depend on each other run concurrently; on Mac OS, gains are set after devices,
+	because osascript sets the volume of the current device. The cache is guarded by a lock, since those commands'
+	threads update it; the commands themselves run outside the lock.
 	"""
 
+	def __init__(self, *args, **kwargs):
+		super(DefaultSmartGlobalAudio, self).__init__(*args, **kwargs)
+		self._current = {}  # type: Dict[str, typing.Any]
+		self._current_lock = threading.Lock()
+
 	def __repr__(self):
 		return "{}:{}(input={}@{},output={}@{})" \
 			.format(self.__class__.__name__, self.is_on, self.input_device, self.input_gain, self.output_device,
@@ -126,63 +197,144 @@ class DefaultSmartGlobalAudio(SmartGlobalAudio):
 	def __str__(self):
 		return repr(self)
 
-	def _start_mac(self) -> None:
-		self.__darwin_switch(0)
+	def refresh(self) -> None:
+		"""Forgets the cached devices and gains, so they're read again next time."""
+		with self._current_lock:
+			self._current.clear()
+
+	def _start_darwin(self) -> None:
+		self.__apply(self.__darwin_settings(0))
+
+	def _stop_darwin(self) -> None:
+		self.__apply(self.__darwin_settings(1))
 
-	def _stop_mac(self) -> None:
-		self.__darwin_switch(1)
+	def _start_linux(self) -> None:
+		self.__apply(self.__linux_settings(0))
+
+	def _stop_linux(self) -> None:
+		self.__apply(self.__linux_settings(1))
 
 	def _start_windows(self) -> None:
-		self.__windows_switch(0)
+		self.__apply(self.__windows_settings(0))
 
 	def _stop_windows(self) -> None:
-		self.__windows_switch(1)
+		self.__apply(self.__windows_settings(1))
+
+	def __apply(self, stages: Sequence[Sequence[OsAudioSetting]]) -> None:
+		"""Runs each stage in turn; within a stage, reads and then sets every setting concurrently."""
+		with ThreadPoolExecutor(max_workers=4, thread_name_prefix='os-audio') as pool:
+			for stage in stages:
+				needed = [s for s, done in zip(stage, pool.map(self.__is_satisfied, stage)) if not done]
+				for setting in needed:
+					logger.debug("Setting {} to {}".format(setting.name, setting.target))
+				for future in [pool.submit(self.__set, setting) for setting in needed]:
+					future.result()
+				logger.debug("Skipped {} of {} audio settings that were already satisfied".format(len(stage) - len(needed), len(stage)))
+		logger.debug("Done configuring audio")
 
-	def __windows_switch(self, i: int):
+	def __is_satisfied(self, setting: OsAudioSetting) -> bool:
+		with self._current_lock:
+			known = setting.name in self._current
+		if not known and setting.read_cmd is not None:
+			try:
+				out = subprocess.run(
+					setting.read_cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+					universal_newlines=True, timeout=self.timeout_secs, check=True
+				).stdout
+				with self._current_lock:
+					self._current[setting.name] = setting.parse(out)
+			except (OSError, subprocess.SubprocessError):
+				logger.debug("Could not read {}".format(setting.name), exc_info=True)
+		with self._current_lock:
+			return self._current.get(setting.name) == setting.target
+
+	def __set(self, setting: OsAudioSetting) -> None:
+		with self._current_lock:
+			self._current.pop(setting.name, None)
+			if setting.name.endswith('_device'):
+				# a gain read from the previous device no longer applies
+				for name in [n for n in self._current if n.startswith(setting.name.replace('_device', '_gain'))]:
+					self._current.pop(name, None)
+		wrap_cmd_call(setting.set_cmd, timeout_secs=self.timeout_secs)
+		with self._current_lock:
+			self._current[setting.name] = setting.target
+
+	def __windows_settings(self, i: int) -> List[List[OsAudioSetting]]:
 		def percent_to_real(percent: int) -> int:
 			audio_max = 65535  # This is true of Windows in general, so not necessary to put in config
 			# audio min is 0
 			return round(audio_max * percent / 100)
 
+		# nircmd can't read the current values
+		settings = []
 		if self.output_device is not None:
-			logger.debug("Setting audio output device to %s" % self.output_device[i])
-			wrap_cmd_call(
-				['nircmd', 'setdefaultsounddevice', '%s' % self.output_device[i]],
-				timeout_secs=self.timeout_secs
-			)
+			settings.append(OsAudioSetting(
+				'output_device', self.output_device[i], ['nircmd', 'setdefaultsounddevice', '%s' % self.output_device[i]]
+			))
 		if self.input_device is not None:
-			logger.debug("Setting audio input device to %s" % self.input_device[i])
-			wrap_cmd_call(
-				['nircmd', 'setdefaultsounddevice', '%s' % self.input_device[i], '2'],
-				timeout_secs=self.timeout_secs
-			)
+			settings.append(OsAudioSetting(
+				'input_device', self.input_device[i], ['nircmd', 'setdefaultsounddevice', '%s' % self.input_device[i], '2']
+			))
 		if self.output_gain is not None:
-			logger.debug("Setting system volume to configured default %s" % self.output_gain[i])
-			wrap_cmd_call(
-				['nircmd', 'setsysvolume', '%s' % percent_to_real(self.output_gain[i]), self.output_device[i]],
-				timeout_secs=self.timeout_secs
-			)
+			settings.append(OsAudioSetting(
+				'output_gain', self.output_gain[i],
+				['nircmd', 'setsysvolume', '%s' % percent_to_real(self.output_gain[i]), self.output_device[i]]
+			))
 		if self.input_gain is not None:
-			logger.debug("Setting input gain to configured default %s" % self.input_gain[i])
-			wrap_cmd_call(
-				['nircmd', 'setsysvolume', '%s' % percent_to_real(self.input_gain[i]), self.input_device[i]],
-				timeout_secs=self.timeout_secs
-			)
-
-	def __darwin_switch(self, i: int):
+			settings.append(OsAudioSetting(
+				'input_gain', self.input_gain[i],
+				['nircmd', 'setsysvolume', '%s' % percent_to_real(self.input_gain[i]), self.input_device[i]]
+			))
+		return [settings]
+
+	def __darwin_settings(self, i: int) -> List[List[OsAudioSetting]]:
+		devices, gains = [], []
 		if self.output_device is not None:
-			logger.debug("Setting audio output device to %s" % self.output_device[i])
-			wrap_cmd_call(['SwitchAudioSource', '-s', '%s' % self.output_device[i]])
+			devices.append(OsAudioSetting(
+				'output_device', self.output_device[i], ['SwitchAudioSource', '-s', '%s' % self.output_device[i]],
+				['SwitchAudioSource', '-c']
+			))
 		if self.input_device is not None:
-			logger.debug("Setting audio input device to %s" % self.input_device[i])
-			wrap_cmd_call(['SwitchAudioSource', '-t input', '-s', '%s' % self.input_device[i]])
+			devices.append(OsAudioSetting(
+				'input_device', self.input_device[i], ['SwitchAudioSource', '-t', 'input', '-s', '%s' % self.input_device[i]],
+				['SwitchAudioSource', '-c', '-t', 'input']
+			))
 		if self.output_gain is not None:
-			logger.debug("Setting system volume to configured default %s" % self.output_gain[i])
-			wrap_cmd_call(['osascript', '-e', 'set volume output volume %s' % self.output_gain[i]])
+			gains.append(OsAudioSetting(
+				'output_gain', self.output_gain[i], ['osascript', '-e', 'set volume output volume %s' % self.output_gain[i]],
+				['osascript', '-e', 'output volume of (get volume settings)'], lambda out: int(out.strip())
+			))
 		if self.input_gain is not None:
-			logger.debug("Setting input gain to configured default %s" % self.input_gain[i])
-			wrap_cmd_call(['osascript', '-e', 'set volume input volume %s' % self.input_gain[i]])
-		logger.debug("Done configuring audio")
+			gains.append(OsAudioSetting(
+				'input_gain', self.input_gain[i], ['osascript', '-e', 'set volume input volume %s' % self.input_gain[i]],
+				['osascript', '-e', 'input volume of (get volume settings)'], lambda out: int(out.strip())
+			))
+		return [devices, gains]
+
+	def __linux_settings(self, i: int) -> List[List[OsAudioSetting]]:
+		# volumes are set on named devices rather than the defaults, so they don't depend on the device switches
+		settings = []
+		sink = '@DEFAULT_SINK@' if self.output_device is None else self.output_device[i]
+		source = '@DEFAULT_SOURCE@' if self.input_device is None else self.input_device[i]
+		if self.output_device is not None:
+			settings.append(OsAudioSetting(
+				'output_device', sink, ['pactl', 'set-default-sink', sink], ['pactl', 'get-default-sink']
+			))
+		if self.input_device is not None:
+			settings.append(OsAudioSetting(
+				'input_device', source, ['pactl', 'set-default-source', source], ['pactl', 'get-default-source']
+			))
+		if self.output_gain is not None:
+			settings.append(OsAudioSetting(
+				'output_gain:' + sink, self.output_gain[i], ['pactl', 'set-sink-volume', sink, '%s%%' % self.output_gain[i]],
+				['pactl', 'get-sink-volume', sink], _parse_percent
+			))
+		if self.input_gain is not None:
+			settings.append(OsAudioSetting(
+				'input_gain:' + source, self.input_gain[i], ['pactl', 'set-source-volume', source, '%s%%' % self.input_gain[i]],
+				['pactl', 'get-source-volume', source], _parse_percent
+			))
+		return [settings]
 
 
-__all__ = ['GlobalAudio', 'SmartGlobalAudio', 'DefaultSmartGlobalAudio']
+__all__ = ['GlobalAudio', 'SmartGlobalAudio', 'DefaultSmartGlobalAudio', 'OsAudioSetting']
@@ -1,41 +1,195 @@
-import math, logging
-from typing import Union, Optional
+import hashlib, math, logging, threading
+from concurrent.futures import Future
+from typing import Dict, Union, Optional, Tuple
 
-import pydub
-import simpleaudio as sa
+import numpy as np
 
 from klgists.common.operators import approxeq
 
+from sauronlib import lazy_import
+from sauronlib.tracing import tracer
+
+pydub = lazy_import('pydub')
+sa = lazy_import('simpleaudio')
+
 class BadVolumeException(Exception): pass
 class BadAudioLengthException(Exception): pass
 
 
+# (base hash, applied_length, volume, volume_floor, bytes_per_sample, sample_rate)
+RenderKey = Tuple[str, Optional[int], int, int, int, int]
+
+
+class AudioRenderCache:
+	"""Base audio segments keyed by a hash of their content, and the buffers rendered from them.
+	A buffer is rendered the first time an AudioInfo needs it, and only once per distinct RenderKey,
+	so a battery that plays one sound at a few lengths and volumes many times holds only those few buffers.
+	Rendering happens outside the lock: a thread that needs a buffer another thread is rendering waits for that one,
+	and renders of different keys run concurrently.
+	Buffers are kept until clear(), so every AudioInfo with a RenderKey shares the one buffer for it:
+	memory grows with the number of distinct keys, not with the number of AudioInfos or plays.
+	"""
+	def __init__(self) -> None:
+		self._bases = {}  # type: Dict[str, pydub.AudioSegment]
+		self._rendered = {}  # type: Dict[RenderKey, sa.WaveObject]
+		self._rendered_nbytes = 0
+		self._rendering = {}  # type: Dict[RenderKey, Future]
+		self._lock = threading.Lock()
+
+	def add_base(self, song: 'pydub.AudioSegment') -> str:
+		"""Stores song if no identical segment is stored yet, and returns its content hash."""
+		h = hashlib.blake2b(digest_size=16)
+		h.update('{}:{}:{}:'.format(song.frame_rate, song.sample_width, song.channels).encode('ascii'))
+		h.update(song.raw_data)
+		digest = h.hexdigest()
+		with self._lock:
+			self._bases.setdefault(digest, song)
+		return digest
+
+	def base(self, digest: str) -> 'pydub.AudioSegment':
+		return self._bases[digest]
+
+	def render(self, key: RenderKey) -> 'sa.WaveObject':
+		with self._lock:
+			wave_obj = self._rendered.get(key)
+			if wave_obj is not None:
+				return wave_obj
+			future = self._rendering.get(key)
+			if future is None:
+				future = Future()
+				self._rendering[key] = future
+				base = self._bases[key[0]]
+			else:
+				base = None
+		if base is None:
+			return future.result()
+		try:
+			with tracer.span('audio.render', 'audio', length=key[1], volume=key[2]):
+				wave_obj = AudioInfo.render(base, *key[1:])
+		except BaseException as e:
+			with self._lock:
+				del self._rendering[key]
+			future.set_exception(e)
+			raise e
+		with self._lock:
+			self._rendered[key] = wave_obj
+			self._rendered_nbytes += len(wave_obj.audio_data)
+			del self._rendering[key]
+		future.set_result(wave_obj)
+		return wave_obj
+
+	def is_rendered(self, key: RenderKey) -> bool:
+		with self._lock:
+			return key in self._rendered
+
+	def n_rendered(self) -> int:
+		with self._lock:
+			return len(self._rendered)
+
+	def nbytes(self) -> int:
+		"""Bytes held by the base segments and every rendered buffer."""
+		with self._lock:
+			bases, rendered_nbytes = list(self._bases.values()), self._rendered_nbytes
+		return sum(len(b.raw_data) for b in bases) + rendered_nbytes
+
+	def clear(self) -> None:
+		with self._lock:
+			self._bases.clear()
+			self._rendered.clear()
+			self._rendered_nbytes = 0
+
+	def __repr__(self) -> str:
+		return "AudioRenderCache(bases={}, rendered={}, {}MB)".format(len(self._bases), self.n_rendered(), round(self.nbytes() / 1e6, 2))
+	def __str__(self): return repr(self)
+
+
+audio_cache = AudioRenderCache()
+
+
 class AudioInfo:
 	"""All information necessary to play an audio file.
 	Most importantly, contains a static build() method that will alter the volume extend and truncate an audio segment
 	as needed for a specified length.
+	AudioInfos from build() hold only a RenderKey into an AudioRenderCache; wave_obj is rendered on first access.
 	"""
 
-	def __init__(self, name: str, wave_obj: sa.WaveObject, duration_ms: Optional[float], intensity: float):
+	def __init__(
+			self, name: str, wave_obj: Optional['sa.WaveObject'], duration_ms: Optional[float], intensity: float,
+			render_key: Optional[RenderKey] = None, cache: Optional[AudioRenderCache] = None
+	):
+		assert (wave_obj is None) != (render_key is None), "Pass exactly one of wave_obj and render_key"
 		self.name = name
-		self.wave_obj = wave_obj
+		self._wave_obj = wave_obj
 		self.duration_ms = duration_ms
 		self.intensity = intensity
+		self.render_key = render_key
+		self.cache = audio_cache if cache is None else cache
+		self._samples = None  # type: Optional[np.ndarray]
+
+	@property
+	def wave_obj(self) -> 'sa.WaveObject':
+		if self._wave_obj is None:
+			self._wave_obj = self.cache.render(self.render_key)
+		return self._wave_obj
+
+	def samples(self) -> np.ndarray:
+		"""The 16-bit samples of wave_obj, as a read-only array that shares its memory. Used by AudioOutputEngine."""
+		if self._samples is None:
+			self._samples = np.frombuffer(self.wave_obj.audio_data, dtype=np.int16)
+		return self._samples
+
+	def derive(self, applied_length: Optional[int], volume: int) -> 'AudioInfo':
+		"""An AudioInfo for the same base audio at a different length and volume, sharing the base and rendered buffers."""
+		if self.render_key is None:
+			raise ValueError("{} was not built from a base segment".format(self))
+		digest, _, _, volume_floor, bytes_per_sample, sample_rate = self.render_key
+		return AudioInfo.build(
+			self.name, self.cache.base(digest), applied_length, volume, volume_floor,
+			bytes_per_sample, sample_rate, cache=self.cache, digest=digest
+		)
+
+	def nbytes(self) -> int:
+		"""The size of the rendered buffer, estimated from the base segment if not rendered yet."""
+		if self._wave_obj is not None or self.cache.is_rendered(self.render_key):
+			return len(self.wave_obj.audio_data)
+		digest, applied_length, volume = self.render_key[:3]
+		if volume == 0 or applied_length == 0:
+			return 0
+		base = self.cache.base(digest)
+		length_ms = len(base) if applied_length is None else applied_length
+		return int(length_ms * base.frame_rate / 1000) * base.frame_width
 
 	def __str__(self):
 		return "AudioInfo({}ms@{}dB)".format(self.duration_ms, round(self.intensity, 5))
 
 	@staticmethod
 	def build(
-			name: str, song: pydub.AudioSegment,
+			name: str, song: 'pydub.AudioSegment',
 			applied_length: Optional[int]=None, volume: int=255, volume_floor: int = -50,
-			bytes_per_sample: int=2, sample_rate: int=44100
+			bytes_per_sample: int=2, sample_rate: int=44100,
+			cache: Optional[AudioRenderCache] = None, digest: Optional[str] = None
 	):
-
+		"""Validates the arguments and returns a lazily rendered AudioInfo.
+		:param cache: Defaults to the shared audio_cache
+		:param digest: The content hash of song, if already known from the cache
+		"""
 		if applied_length is not None and applied_length < 0:
 			raise BadAudioLengthException("The length is {} but cannot be negative".format(applied_length))
 		if volume < 0 or volume > 255:
 			raise BadVolumeException("The volume is {} but must be 0–255".format(volume))
+		with tracer.span('audio.build', 'audio', sound=name, hashed=digest is None):
+			cache = audio_cache if cache is None else cache
+			if digest is None:
+				digest = cache.add_base(song)
+			key = (digest, applied_length, volume, volume_floor, bytes_per_sample, sample_rate)
+			return AudioInfo(name, None, applied_length, volume, render_key=key, cache=cache)
+
+	@staticmethod
+	def render(
+			song: 'pydub.AudioSegment',
+			applied_length: Optional[int], volume: int, volume_floor: int,
+			bytes_per_sample: int, sample_rate: int
+	) -> 'sa.WaveObject':
 
 		if applied_length is None:
 			resized = song
@@ -51,8 +205,7 @@ class AudioInfo:
 				assert len(resized) << approxeq >> applied_length or applied_length == 1,\
 						"The actual audio stimulus length is {}, but the length in stimulus_frames is {}".format(len(resized), applied_length)
 
-		play_obj = sa.WaveObject(final.raw_data, 1, bytes_per_sample, sample_rate)
-		return AudioInfo(name, play_obj, applied_length, volume)
+		return sa.WaveObject(final.raw_data, 1, bytes_per_sample, sample_rate)
 
 
-__all__ = ['AudioInfo']
+__all__ = ['AudioInfo', 'AudioRenderCache', 'audio_cache']
@@ -0,0 +1,171 @@
+import time
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from sauronlib import logger, lazy_import
+from sauronlib.audio_handler import GlobalAudio
+from sauronlib.audio_info import AudioInfo
+from sauronlib.sensors.microphone import Microphone
+
+signal = lazy_import('scipy.signal')
+
+
+class LatencyReport:
+	"""The measured delays between when probes were scheduled to be heard and when the microphone recorded them.
+	Delays are in milliseconds and include the output and input latency that the audio engine doesn't already account for.
+	nan marks a probe that wasn't found.
+	"""
+	def __init__(self, delays_ms: Sequence[float]) -> None:
+		self.delays_ms = np.asarray(delays_ms, dtype=np.float64)
+
+	def found(self) -> np.ndarray:
+		return self.delays_ms[~np.isnan(self.delays_ms)]
+
+	def n_missing(self) -> int:
+		return int(np.count_nonzero(np.isnan(self.delays_ms)))
+
+	def mean_ms(self) -> float: return float(np.mean(self.found()))
+	def median_ms(self) -> float: return float(np.median(self.found()))
+	def std_ms(self) -> float: return float(np.std(self.found()))
+	def min_ms(self) -> float: return float(np.min(self.found()))
+	def max_ms(self) -> float: return float(np.max(self.found()))
+
+	def percentile_ms(self, q: float) -> float:
+		return float(np.percentile(self.found(), q))
+
+	def offset_ms(self) -> float:
+		"""The scheduling offset to apply: the median delay, which is robust to a few misdetected probes."""
+		return self.median_ms()
+
+	def apply(self, audio: GlobalAudio) -> None:
+		"""Sets the offset on the audio engine, so audio scheduled afterward is heard on time."""
+		audio.engine.latency_offset_ns += int(round(self.offset_ms() * 1e6))
+		logger.info("Applied an audio scheduling offset of {}ms".format(round(self.offset_ms(), 3)))
+
+	def __repr__(self) -> str:
+		found = self.found()
+		if len(found) == 0:
+			return "LatencyReport(n=0, missing={})".format(self.n_missing())
+		return "LatencyReport(n={}, missing={}, median={}ms, std={}ms, range=[{}, {}]ms)".format(
+			len(found), self.n_missing(), round(self.median_ms(), 3), round(self.std_ms(), 3),
+			round(self.min_ms(), 3), round(self.max_ms(), 3)
+		)
+	def __str__(self): return repr(self)
+
+
+def chirp(sample_rate: int = 44100, duration_ms: int = 50, f0: float = 500, f1: float = 8000, amplitude: float = 0.5) -> np.ndarray:
+	"""A linear frequency sweep as 16-bit samples. Its autocorrelation has one sharp peak, which makes a good probe."""
+	t = np.arange(int(sample_rate * duration_ms / 1000)) / sample_rate
+	sweep = signal.chirp(t, f0, t[-1], f1) * signal.windows.tukey(len(t), 0.1)
+	return (sweep * amplitude * 32767).astype(np.int16)
+
+
+def find_delays(
+		recording: np.ndarray, sample_rate: int, recording_start_ns: int,
+		probe: np.ndarray, scheduled_ns: Sequence[int], max_delay_ms: float = 200, min_delay_ms: float = -50
+) -> LatencyReport:
+	"""Finds each probe in a recording by FFT cross-correlation within a window around its scheduled time.
+	:param recording: Mono samples, in any numeric dtype
+	:param recording_start_ns: The RunClock time of the first sample of recording
+	:param probe: The samples that were played
+	:param scheduled_ns: The RunClock time each probe was scheduled to be heard
+	:param max_delay_ms: The latest onset to search, relative to the scheduled time
+	:param min_delay_ms: The earliest onset to search, relative to the scheduled time
+	"""
+	recording = np.asarray(recording, dtype=np.float64)
+	template = np.asarray(probe, dtype=np.float64)
+	template = template - template.mean()
+	delays = []  # type: List[float]
+	for t_ns in scheduled_ns:
+		expected = (t_ns - recording_start_ns) * sample_rate / 1e9
+		lo = int(np.floor(expected + min_delay_ms * sample_rate / 1000))
+		hi = int(np.ceil(expected + max_delay_ms * sample_rate / 1000)) + len(template)
+		if lo < 0 or hi > len(recording):
+			delays.append(float('nan'))
+			continue
+		window = recording[lo:hi]
+		correlation = signal.correlate(window - window.mean(), template, mode='valid', method='fft')
+		peak = int(np.argmax(np.abs(correlation)))
+		delays.append((lo + peak - expected) / sample_rate * 1000)
+	return LatencyReport(delays)
+
+
+def synthetic_recording(
+		probe: np.ndarray, sample_rate: int, recording_start_ns: int, scheduled_ns: Sequence[int],
+		delays_ms: Sequence[float], n_samples: int, noise: float = 0.01, seed: int = 0
+) -> np.ndarray:
+	"""A recording that contains probe at each scheduled time plus a known delay, with white noise, as 32-bit samples.
+	For testing find_delays without audio hardware.
+	"""
+	rng = np.random.RandomState(seed)
+	recording = rng.normal(0, noise, n_samples)
+	scaled = np.asarray(probe, dtype=np.float64) / 32768
+	for t_ns, delay_ms in zip(scheduled_ns, delays_ms):
+		start = int(round((t_ns - recording_start_ns) * sample_rate / 1e9 + delay_ms * sample_rate / 1000))
+		end = min(start + len(scaled), n_samples)
+		if 0 <= start < n_samples:
+			recording[start:end] += scaled[:end - start]
+	return (np.clip(recording, -1, 1 - 2**-31) * 2**31).astype(np.int32)
+
+
+class LatencyCalibration:
+	"""Measures audio output latency by playing a probe several times while a microphone records it.
+	The audio must have an AudioOutputEngine, and the microphone must be able to hear the speaker.
+	The microphone writes its files as usual.
+	Example usage:
+		with DefaultSmartGlobalAudio(..., engine=AudioOutputEngine()) as audio:
+			report = LatencyCalibration(audio, microphone, probe_info).run()
+			report.apply(audio)
+	"""
+	def __init__(
+			self, audio: GlobalAudio, microphone: Microphone, probe: AudioInfo,
+			n_probes: int = 20, interval_ms: int = 300, lead_ms: int = 500, max_delay_ms: float = 200
+	) -> None:
+		if audio.engine is None:
+			raise ValueError("Latency calibration needs a GlobalAudio with an AudioOutputEngine")
+		if microphone.sample_rate != audio.engine.sample_rate:
+			raise ValueError("The microphone records at {}Hz but audio plays at {}Hz".format(
+				microphone.sample_rate, audio.engine.sample_rate
+			))
+		self.audio = audio
+		self.microphone = microphone
+		self.probe = probe
+		self.n_probes = n_probes
+		self.interval_ms = interval_ms
+		self.lead_ms = lead_ms
+		self.max_delay_ms = max_delay_ms
+
+	def run(self) -> LatencyReport:
+		engine = self.audio.engine
+		clock = engine.clock
+		self.microphone.arm()
+		self.microphone.fire()
+		try:
+			while len(self.microphone.timestamps) == 0:
+				time.sleep(0.001)
+			t0 = clock.now_ns() + self.lead_ms * 1000000
+			scheduled_ns = [t0 + i * self.interval_ms * 1000000 for i in range(self.n_probes)]
+			for t_ns in scheduled_ns:
+				self.audio.play(self.probe, at_sample=engine.sample_at(t_ns))
+			probe_ms = len(self.probe.samples()) / engine.sample_rate * 1000
+			wait_ns = scheduled_ns[-1] + int((self.max_delay_ms + probe_ms) * 1e6) - clock.now_ns()
+			time.sleep(max(0, wait_ns) / 1e9)
+		finally:
+			self.microphone.disarm()
+		mic = self.microphone
+		recording = np.frombuffer(b''.join(mic.frames), dtype=np.int32)
+		# a buffer's timestamp is taken when the read returns, just after its last sample
+		start_ns = mic.timestamps[0] - int(mic.frames_per_buffer * 1e9 / mic.sample_rate)
+		report = find_delays(
+			recording, mic.sample_rate, start_ns, self.probe.samples(), scheduled_ns, max_delay_ms=self.max_delay_ms
+		)
+		logger.info("Audio latency: {}".format(report))
+		return report
+
+	def __repr__(self) -> str:
+		return "LatencyCalibration({} x{} every {}ms)".format(self.probe, self.n_probes, self.interval_ms)
+	def __str__(self): return repr(self)
+
+
+__all__ = ['LatencyReport', 'LatencyCalibration', 'chirp', 'find_delays', 'synthetic_recording']
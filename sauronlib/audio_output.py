@@ -0,0 +1,188 @@
+import heapq
+import itertools
+import queue
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from sauronlib import logger, lazy_import
+from sauronlib.clock import RunClock, global_clock
+
+pyaudio = lazy_import('pyaudio')
+
+
+class AudioMixer:
+	"""Sums overlapping 16-bit voices into one block of output, each scaled by its own gain.
+	Mixing is done in float32 into a buffer allocated once, then hard-clipped to the 16-bit range;
+	n_clipped counts the samples that were clipped, so that overloaded mixes show up in the logs.
+	"""
+	def __init__(self, frames_per_buffer: int = 256) -> None:
+		self.n_clipped = 0
+		self._accumulator = np.zeros(frames_per_buffer, dtype=np.float32)
+		self._out = np.zeros(frames_per_buffer, dtype=np.int16)
+
+	def mix(self, voices: List[Tuple[int, int, np.ndarray, float]], start: int, frame_count: int) -> np.ndarray:
+		"""Mixes the part of each (start_sample, sequence, samples, gain) voice that falls in [start, start + frame_count).
+		Returns a view of an internal buffer that is overwritten by the next call.
+		"""
+		if len(self._accumulator) < frame_count:
+			self._accumulator = np.zeros(frame_count, dtype=np.float32)
+			self._out = np.zeros(frame_count, dtype=np.int16)
+		acc = self._accumulator[:frame_count]
+		out = self._out[:frame_count]
+		acc.fill(0)
+		for voice_start, sequence, samples, gain in voices:
+			offset = max(voice_start - start, 0)
+			first = start + offset - voice_start
+			n = min(frame_count - offset, len(samples) - first)
+			if n <= 0:
+				continue
+			if gain == 1:
+				acc[offset:offset + n] += samples[first:first + n]
+			else:
+				acc[offset:offset + n] += samples[first:first + n] * np.float32(gain)
+		if len(voices) > 1 or any(gain > 1 for _, _, _, gain in voices):
+			n_over = np.count_nonzero((acc > 32767) | (acc < -32768))
+			if n_over > 0:
+				self.n_clipped += int(n_over)
+				np.clip(acc, -32768, 32767, out=acc)
+		np.copyto(out, acc, casting='unsafe')
+		return out
+
+	def __repr__(self) -> str:
+		return "AudioMixer(buffer={}, clipped={})".format(len(self._accumulator), self.n_clipped)
+	def __str__(self): return repr(self)
+
+
+class AudioOutputEngine:
+	"""A persistent audio output stream that plays buffers at exact sample positions.
+	start() opens the output device once; from then on, PortAudio calls a callback for each block of samples,
+	and the callback mixes whichever scheduled buffers overlap that block with an AudioMixer.
+	Overlapping stimuli therefore start sample-aligned on one stream, each at its own gain.
+	Scheduling a buffer is a lock-free queue put, so play latency doesn't depend on opening a stream or starting a thread.
+	Sample positions count samples output since start(). sample_at() converts a RunClock time to the sample heard then.
+	latency_offset_ns is added to the device's reported output latency; LatencyReport.apply() sets it from a measurement.
+	Example usage:
+		with AudioOutputEngine() as engine:
+			s0 = engine.sample_at(engine.clock.now_ns()) + engine.sample_rate // 10  # 100ms from now
+			engine.schedule(info.samples(), s0)
+			engine.schedule(info.samples(), s0 + engine.sample_rate)  # exactly 1s later
+	"""
+	def __init__(
+			self, sample_rate: int = 44100, frames_per_buffer: int = 256, clock: Optional[RunClock] = None,
+			latency_offset_ns: int = 0
+	) -> None:
+		self.sample_rate = sample_rate
+		self.latency_offset_ns = latency_offset_ns
+		self.frames_per_buffer = frames_per_buffer
+		self.clock = global_clock if clock is None else clock
+		self.n_late = 0
+		self.n_underflows = 0
+		self.mixer = AudioMixer(frames_per_buffer)
+		self._p = None
+		self._stream = None
+		self._position = 0
+		self._anchor = (0, 0)  # type: Tuple[int, int]
+		self._latency_ns = 0
+		self._incoming = queue.SimpleQueue()
+		self._pending = []  # type: List[Tuple[int, int, np.ndarray, float]]
+		self._active = []  # type: List[Tuple[int, int, np.ndarray, float]]
+		self._sequence = itertools.count()
+
+	def __enter__(self):
+		self.start()
+		return self
+
+	def __exit__(self, type, value, traceback) -> None:
+		self.stop()
+
+	def is_running(self) -> bool:
+		return self._stream is not None
+
+	def start(self) -> None:
+		if self.is_running():
+			return
+		self._position = 0
+		self._pending, self._active = [], []
+		self._p = pyaudio.PyAudio()
+		try:
+			self._stream = self._p.open(
+				format=pyaudio.paInt16, channels=1, rate=self.sample_rate, output=True,
+				frames_per_buffer=self.frames_per_buffer, stream_callback=self._callback
+			)
+		except Exception as e:
+			self._p.terminate()
+			self._p = None
+			logger.fatal("Failed to open the audio output stream")
+			raise e
+		self._latency_ns = int(self._stream.get_output_latency() * 1e9)
+		self._anchor = (0, self.clock.now_ns())
+		logger.info("Started audio output at {}Hz with {}ms output latency".format(self.sample_rate, self._latency_ns / 1e6))
+
+	def stop(self) -> None:
+		if not self.is_running():
+			return
+		try:
+			self._stream.stop_stream()
+			self._stream.close()
+		finally:
+			self._stream = None
+			self._p.terminate()
+			self._p = None
+		if self.n_late > 0 or self.n_underflows > 0 or self.mixer.n_clipped > 0:
+			logger.warning("Audio output had {} late buffers, {} underflows, and {} clipped samples".format(
+				self.n_late, self.n_underflows, self.mixer.n_clipped
+			))
+		logger.info("Stopped audio output.")
+
+	def position(self) -> int:
+		"""The sample position of the block most recently handed to the device."""
+		return self._anchor[0]
+
+	def sample_at(self, monotonic_ns: int) -> int:
+		"""The sample position that will be heard at a RunClock time, extrapolated from the latest callback."""
+		position, anchor_ns = self._anchor
+		return position + int((monotonic_ns - anchor_ns - self._latency_ns - self.latency_offset_ns) * self.sample_rate // 1000000000)
+
+	def time_of(self, sample: int) -> int:
+		"""The RunClock time at which a sample position will be heard; the inverse of sample_at()."""
+		position, anchor_ns = self._anchor
+		return anchor_ns + self._latency_ns + self.latency_offset_ns + (sample - position) * 1000000000 // self.sample_rate
+
+	def schedule(self, samples: np.ndarray, at_sample: Optional[int] = None, gain: float = 1.0) -> None:
+		"""Queues 16-bit mono samples to start at a sample position, or as soon as possible if at_sample is None.
+		Buffers whose position has already passed start immediately and are counted in n_late.
+		:param gain: A linear factor applied while mixing; the mix is clipped to the 16-bit range
+		"""
+		start = -1 if at_sample is None else at_sample
+		self._incoming.put((start, next(self._sequence), samples, gain))
+
+	def _callback(self, in_data, frame_count, time_info, status):
+		start = self._position
+		end = start + frame_count
+		self._anchor = (start, self.clock.now_ns())
+		if status & pyaudio.paOutputUnderflow:
+			self.n_underflows += 1
+		while True:
+			try:
+				heapq.heappush(self._pending, self._incoming.get_nowait())
+			except queue.Empty:
+				break
+		while len(self._pending) > 0 and self._pending[0][0] < end:
+			voice_start, sequence, samples, gain = heapq.heappop(self._pending)
+			if voice_start < start:
+				if voice_start >= 0:
+					self.n_late += 1
+				voice_start = start
+			self._active.append((voice_start, sequence, samples, gain))
+		out = self.mixer.mix(self._active, start, frame_count)
+		self._active = [voice for voice in self._active if voice[0] + len(voice[2]) > end]
+		self._position = end
+		return out.tobytes(), pyaudio.paContinue
+
+	def __repr__(self) -> str:
+		return "AudioOutputEngine({}Hz, buffer={}, running={})".format(self.sample_rate, self.frames_per_buffer, self.is_running())
+	def __str__(self): return repr(self)
+
+
+__all__ = ['AudioOutputEngine', 'AudioMixer']
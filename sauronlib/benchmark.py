@@ -0,0 +1,220 @@
+"""
+Built-in performance scenarios, run against in-process stand-ins for the board, sensors, audio device, and cameras.
+Each scenario returns a list of flat dicts, so results can be printed as a table or written as JSON.
+Run them from the command line with `bench run`.
+"""
+
+import os
+import platform
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Sequence
+
+import numpy as np
+
+from sauronlib import logger
+
+
+def system_info() -> Dict[str, Any]:
+	import sauronlib
+	return {
+		'python': platform.python_version(),
+		'implementation': platform.python_implementation(),
+		'platform': platform.platform(),
+		'machine': platform.machine(),
+		'processor': platform.processor(),
+		'n_cpus': os.cpu_count(),
+		'numpy': np.__version__,
+		'sauronlib': sauronlib.__version__
+	}
+
+
+def _percentiles_us(values_ns: np.ndarray, prefix: str) -> Dict[str, Any]:
+	values_us = np.asarray(values_ns, dtype=np.float64) / 1000
+	return {
+		prefix + '_mean_us': float(values_us.mean()),
+		prefix + '_p50_us': float(np.percentile(values_us, 50)),
+		prefix + '_p99_us': float(np.percentile(values_us, 99)),
+		prefix + '_max_us': float(values_us.max())
+	}
+
+
+def _synthetic_blocks(n_stimuli: int, n_blocks: int, block_ms: int, seed: int = 0):
+	from sauronlib.scheduling.block_scheduler import Block
+	rng = np.random.RandomState(seed)
+	tracks = []
+	for s in range(n_stimuli):
+		# on/off pulses of random lengths, so each track has many changes
+		blocks = []
+		for b in range(n_blocks):
+			frames = np.repeat(rng.randint(0, 2, size=block_ms // 50) * 255, 50)
+			blocks.append(Block('block-{}'.format(b), b * block_ms, frames))
+		tracks.append(('stimulus-{}'.format(s), blocks))
+	return tracks
+
+
+def bench_schedule(quick: bool = False) -> List[Dict[str, Any]]:
+	"""Times BlockScheduler.build() and ScheduleRunner setup for a synthetic battery of on/off stimuli, and StreamingSchedule."""
+	from sauronlib.scheduling.block_scheduler import BlockScheduler
+	from sauronlib.scheduling.schedule_runner import ScheduleRunner
+	from sauronlib.scheduling.streaming_schedule import StreamingSchedule
+	results = []
+	for n_stimuli, n_blocks in ([(4, 10)] if quick else [(4, 10), (16, 40), (32, 120)]):
+		block_ms = 10000
+		tracks = _synthetic_blocks(n_stimuli, n_blocks, block_ms)
+		t0 = time.perf_counter()
+		scheduler = BlockScheduler(n_blocks * block_ms)
+		for name, blocks in tracks:
+			scheduler.append(name, name, None, blocks)
+		schedule = scheduler.build()
+		t1 = time.perf_counter()
+		ScheduleRunner(schedule)
+		t2 = time.perf_counter()
+		streaming = StreamingSchedule(n_blocks * block_ms)
+		for name, blocks in tracks:
+			streaming.append(name, name, None, blocks)
+		events = streaming.events()
+		next(events)
+		t3 = time.perf_counter()
+		for _ in events: pass
+		t4 = time.perf_counter()
+		results.append({
+			'n_stimuli': n_stimuli,
+			'n_blocks': n_blocks,
+			'n_events': schedule.n_events(),
+			'build_ms': (t1 - t0) * 1000,
+			'runner_setup_ms': (t2 - t1) * 1000,
+			'events_per_sec': schedule.n_events() / (t2 - t0),
+			'stream_first_event_ms': (t3 - t2) * 1000,
+			'stream_events_per_sec': schedule.n_events() / (t4 - t2)
+		})
+	return results
+
+
+def bench_runner(quick: bool = False) -> List[Dict[str, Any]]:
+	"""Runs ScheduleRunner against no-op board and audio callbacks and reports how late each stimulus was applied."""
+	from sauronlib.scheduling.schedule import Schedule
+	from sauronlib.scheduling.schedule_runner import ScheduleRunner
+	from sauronlib.stimulus import Stimulus, StimulusType
+	results = []
+	for n_events, total_ms in ([(500, 1000)] if quick else [(500, 1000), (5000, 5000), (20000, 5000)]):
+		times = np.linspace(0, total_ms - 1, n_events).astype(int)
+		stimuli = [
+			(int(t), Stimulus('led', 'led', i % 2 * 255, None, StimulusType.DIGITAL))
+			for i, t in enumerate(times)
+		]
+		schedule = Schedule(stimuli, [], total_ms, in_order=True)
+		writes = []
+		runner = ScheduleRunner(schedule)
+		runner.run(writes.append, lambda s: None)
+		result = {'n_events': n_events, 'total_ms': total_ms}
+		summary = runner.lateness.summary(scale=1000)
+		result.update({'lateness_' + stat + '_us': summary[stat] for stat in ['mean', 'p50', 'p99', 'max']})
+		results.append(result)
+	return results
+
+
+def bench_sensor_ingest(quick: bool = False) -> List[Dict[str, Any]]:
+	"""Feeds values to an ArduinoCsvSensor through its board callback as fast as possible."""
+	from sauronlib.sensors.arduino_sensor import Photometer
+	n = 20000 if quick else 200000
+	callbacks = []
+	with tempfile.TemporaryDirectory() as temp_dir:
+		sensor = Photometer(os.path.join(temp_dir, 'photometer.csv'), callbacks.append, lambda: None)
+		sensor.arm()
+		record = callbacks[0]
+		values = np.random.RandomState(0).randint(0, 1024, size=n).tolist()
+		t0 = time.perf_counter()
+		for value in values:
+			record([0, value])
+		elapsed = time.perf_counter() - t0
+		sensor.disarm()
+		size = os.path.getsize(sensor.output_path)
+	return [{
+		'n_values': n,
+		'values_per_sec': n / elapsed,
+		'us_per_value': elapsed / n * 1e6,
+		'csv_mb': size / 1e6
+	}]
+
+
+def bench_audio(quick: bool = False) -> List[Dict[str, Any]]:
+	"""Times rendering AudioInfo buffers from a synthetic tone, and mixing overlapping voices with AudioMixer."""
+	import pydub
+	from sauronlib.audio_info import AudioInfo, AudioRenderCache
+	from sauronlib.audio_output import AudioMixer
+	sample_rate = 44100
+	tone = (np.sin(np.arange(sample_rate) * 2 * np.pi * 440 / sample_rate) * 8000).astype(np.int16)
+	song = pydub.AudioSegment(tone.tobytes(), frame_rate=sample_rate, sample_width=2, channels=1)
+	cache = AudioRenderCache()
+	lengths = [100, 500, 2000] if quick else [100, 500, 2000, 10000]
+	volumes = [64, 255]
+	t0 = time.perf_counter()
+	infos = [AudioInfo.build('tone', song, length, volume, cache=cache) for length in lengths for volume in volumes for _ in range(10)]
+	t1 = time.perf_counter()
+	for info in infos:
+		info.samples()
+	t2 = time.perf_counter()
+	results = [{
+		'scenario': 'render',
+		'n_infos': len(infos),
+		'n_rendered': cache.n_rendered(),
+		'build_ms_each': (t1 - t0) / len(infos) * 1000,
+		'render_ms_each': (t2 - t1) / cache.n_rendered() * 1000,
+		'cache_mb': cache.nbytes() / 1e6
+	}]
+	frames_per_buffer = 256
+	mixer = AudioMixer(frames_per_buffer)
+	n_blocks = 500 if quick else 5000
+	for n_voices in [1, 4, 16]:
+		voices = [(0, i, tone, 0.5) for i in range(n_voices)]
+		t0 = time.perf_counter()
+		for b in range(n_blocks):
+			mixer.mix(voices, (b * frames_per_buffer) % (len(tone) - frames_per_buffer), frames_per_buffer)
+		elapsed = time.perf_counter() - t0
+		results.append({
+			'scenario': 'mix',
+			'n_voices': n_voices,
+			'us_per_block': elapsed / n_blocks * 1e6,
+			# how many times faster than the device consumes the blocks
+			'realtime_factor': n_blocks * frames_per_buffer / sample_rate / elapsed
+		})
+	return results
+
+
+def bench_camera(quick: bool = False) -> List[Dict[str, Any]]:
+	"""Streams and snapshots from SyntheticWebcam; see sauronlib.camera.benchmark."""
+	from sauronlib.camera.benchmark import benchmark_matrix
+	if quick:
+		return benchmark_matrix(sizes=[(320, 240)], fps_values=[30], n_milliseconds=1000, n_snapshots=3)
+	return benchmark_matrix()
+
+
+scenarios = {
+	'schedule': bench_schedule,
+	'runner': bench_runner,
+	'sensor': bench_sensor_ingest,
+	'audio': bench_audio,
+	'camera': bench_camera
+}  # type: Dict[str, Callable[[bool], List[Dict[str, Any]]]]
+
+
+def run_scenarios(names: Sequence[str], quick: bool = False) -> Dict[str, Any]:
+	"""Runs the named scenarios in order. A scenario that fails is recorded with its error, and the rest still run."""
+	unknown = [name for name in names if name not in scenarios]
+	if len(unknown) > 0:
+		raise KeyError("Unknown scenarios {}; choose from {}".format(unknown, list(scenarios.keys())))
+	report = {'system': system_info(), 'quick': quick, 'scenarios': {}}  # type: Dict[str, Any]
+	for name in names:
+		logger.info("Running benchmark {}".format(name))
+		t0 = time.perf_counter()
+		try:
+			results = scenarios[name](quick)
+			report['scenarios'][name] = {'results': results, 'seconds': time.perf_counter() - t0}
+		except Exception as e:
+			logger.error("Benchmark {} failed".format(name), exc_info=True)
+			report['scenarios'][name] = {'error': '{}: {}'.format(type(e).__name__, e), 'seconds': time.perf_counter() - t0}
+	return report
+
+
+__all__ = ['scenarios', 'run_scenarios', 'system_info']
@@ -4,16 +4,18 @@ from enum import Enum
 from typing import Union, List, Optional
 
 import asyncio
-from pymata_aio.pymata3 import PyMata3
-from pymata_aio.private_constants import PrivateConstants
-from pymata_aio.constants import Constants
 
 from klgists.common.silenced import silenced
 from klgists.common.exceptions import ExternalDeviceNotFound, NoSuchOutputPinException, BadPinWriteValueException
 
-from sauronlib import logger
+from sauronlib import logger, lazy_import
 from .board_layout import BoardLayout
 from .stimulus import StimulusType
+from .tracing import tracer
+
+pymata3 = lazy_import('pymata_aio.pymata3')
+constants = lazy_import('pymata_aio.constants')
+private_constants = lazy_import('pymata_aio.private_constants')
 
 
 class StatusCode(Enum):
@@ -81,7 +83,7 @@ class Board:
 		logger.debug("Registered sensor on pin {}".format(pin_number))
 		self._board.enable_analog_reporting(pin=pin_number)
 		# TODO should be able to use pin_state[1] instead of Constants.ANALOG, but for some reason the setting doesn't stick??
-		self._board.set_pin_mode(pin_number=pin_number, pin_state=Constants.ANALOG, callback=callback, cb_type=Constants.CB_TYPE_DIRECT)
+		self._board.set_pin_mode(pin_number=pin_number, pin_state=constants.Constants.ANALOG, callback=callback, cb_type=constants.Constants.CB_TYPE_DIRECT)
 
 	def reset_sensor(self, pin_number: int) -> None:
 		self._board.disable_analog_reporting(pin=pin_number)
@@ -124,7 +126,7 @@ class Board:
 		pin = self.layout.status_led_pin
 		for i, delta in enumerate(status.pattern):
 			self._board.digital_write(pin, i % 2)
-			self._board.sleep(status.on_ms/1000)
+			self._board.sleep(delta / 1000)
 		self._board.digital_write(pin, 1)
 
 	def sleep(self, seconds: float) -> None:
@@ -142,16 +144,31 @@ class Board:
 		for pin in self.layout.startup_pins:
 			self._board.digital_write(pin, int(value))
 
+	def write(self, stimulus) -> None:
+		"""Applies a digital or analog Stimulus by its name, without checks (for performance). For ScheduleRunner.run."""
+		traced = tracer.enabled
+		if traced:
+			start_ns = tracer.now_ns()
+		if stimulus.stim_type is StimulusType.DIGITAL:
+			self._board.digital_write(self.layout.digital_stimuli[stimulus.name], 1 if stimulus.byte_intensity else 0)
+		else:
+			self._board.analog_write(self.layout.analog_stimuli[stimulus.name], int(stimulus.byte_intensity))
+		if traced:
+			tracer.complete('board.write', start_ns, 'board', stimulus=stimulus.name, value=int(stimulus.byte_intensity))
+			tracer.count('board.writes')
+
 	def set_stimulus(self, stim_name: str, value: int) -> None:
 		"""Sets an analog or digital stimulus. For external calls."""
-		if self.is_digital(stim_name):
-			if value != 0 and value != 1:
-				raise BadPinWriteValueException("Value {} is out of range for digital stimulus {}".format(value, stim_name))
-			self._board.digital_write(self.layout.digital_stimuli[stim_name], value)
-		elif self.is_analog(stim_name):
-			if value > 255 or value < 0:
-				raise BadPinWriteValueException("Value {} is out of range for analog stimulus {}".format(value, stim_name))
-			self._board.analog_write(self.layout.analog_stimuli[stim_name], value)
+		with tracer.span('board.set_stimulus', 'board', stimulus=stim_name, value=value):
+			if self.is_digital(stim_name):
+				if value != 0 and value != 1:
+					raise BadPinWriteValueException("Value {} is out of range for digital stimulus {}".format(value, stim_name))
+				self._board.digital_write(self.layout.digital_stimuli[stim_name], value)
+			elif self.is_analog(stim_name):
+				if value > 255 or value < 0:
+					raise BadPinWriteValueException("Value {} is out of range for analog stimulus {}".format(value, stim_name))
+				self._board.analog_write(self.layout.analog_stimuli[stim_name], value)
+			tracer.count('board.writes')  # only once validated and written
 
 	def set_analog_stimulus(self, stim_name: str, value: int) -> None:
 		"""For external calls; performs a value check."""
@@ -219,27 +236,27 @@ class Board:
 		# Instead, it's set only if a callback is passed
 		# This means we can't set the type to Constants.INPUT here
 		for name, pin in self.layout.analog_stimuli.items():
-			self._board.set_pin_mode(pin, Constants.PWM)
+			self._board.set_pin_mode(pin, constants.Constants.PWM)
 		for name, pin in self.layout.analog_sensors.items():
-			self._board.set_pin_mode(pin, Constants.ANALOG)
+			self._board.set_pin_mode(pin, constants.Constants.ANALOG)
 
 	def _set_port(self, port: int, on: bool) -> None:
 		# TODO is this correct?
 		raise NotImplementedError()
 		#port = pin // 8
-		calculated_command = PrivateConstants.DIGITAL_MESSAGE + port
+		calculated_command = private_constants.PrivateConstants.DIGITAL_MESSAGE + port
 		#mask = 1 << (pin % 8)
 		mask = 1 << port
 		# Calculate the value for the pin's position in the port mask
 		if on:
-			PrivateConstants.DIGITAL_OUTPUT_PORT_PINS[port] |= mask
+			private_constants.PrivateConstants.DIGITAL_OUTPUT_PORT_PINS[port] |= mask
 		else:
-			PrivateConstants.DIGITAL_OUTPUT_PORT_PINS[port] &= ~mask
+			private_constants.PrivateConstants.DIGITAL_OUTPUT_PORT_PINS[port] &= ~mask
 		# Assemble the command
 		command = (
 			calculated_command,
-			PrivateConstants.DIGITAL_OUTPUT_PORT_PINS[port] & 0x7f,
-			(PrivateConstants.DIGITAL_OUTPUT_PORT_PINS[port] >> 7) & 0x7f
+			private_constants.PrivateConstants.DIGITAL_OUTPUT_PORT_PINS[port] & 0x7f,
+			(private_constants.PrivateConstants.DIGITAL_OUTPUT_PORT_PINS[port] >> 7) & 0x7f
 		)
 		#await self._board._send_command(command)
 
@@ -279,8 +296,8 @@ class PymataBoard(ExtendedBoard):
 	"""The main concrete Board implementation.
 	Simply starts a PyMata3 board as expected.
 	"""
-	def _new_board(self) -> PyMata3:
-		return PyMata3(self._reset_time, com_port=self._connection_port, log_output=True, serial_timeout=0, serial_write_timeout=1)
+	def _new_board(self) -> 'pymata3.PyMata3':
+		return pymata3.PyMata3(self._reset_time, com_port=self._connection_port, log_output=True, serial_timeout=0, serial_write_timeout=1)
 
 
 __all__ = ['Board', 'ExtendedBoard', 'PymataBoard', 'StatusCode']
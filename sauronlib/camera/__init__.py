@@ -1,5 +1,11 @@
 
+from typing import Tuple
+
+
 class Roi:
+	"""A rectangular region of interest in pixels, from (x0, y0) inclusive to (x1, y1) exclusive.
+	crop() returns a NumPy view of a (height, width, ...) frame, so cropping never copies pixels.
+	"""
 
 	def __init__(self, x0: int, y0: int, x1: int, y1: int) -> None:
 		self.x0 = x0
@@ -16,6 +22,21 @@ class Roi:
 	def n_pixels(self) -> int:
 		return (self.x1 - self.x0) * (self.y1 - self.y0)
 
+	def slices(self) -> Tuple[slice, slice]:
+		"""The (row, column) slices for indexing a frame."""
+		return slice(self.y0, self.y1), slice(self.x0, self.x1)
+
+	def crop(self, frame):
+		"""Returns the part of a frame (indexed by row, then column) inside this ROI, as a view."""
+		return frame[self.y0:self.y1, self.x0:self.x1]
+
+	def fits(self, frame_height: int, frame_width: int) -> bool:
+		"""Whether a frame of this size contains the whole ROI."""
+		return 0 <= self.x0 < self.x1 <= frame_width and 0 <= self.y0 < self.y1 <= frame_height
+
+	def is_full_frame(self, frame_height: int, frame_width: int) -> bool:
+		return self.x0 == 0 and self.y0 == 0 and self.x1 == frame_width and self.y1 == frame_height
+
 	def __repr__(self) -> str:
 		return "({},{})→({},{})".format(self.x0, self.y0, self.x1, self.y1)
 
@@ -0,0 +1,49 @@
+from typing import Optional
+
+import numpy as np
+
+
+class ActivityTrace:
+	"""A per-frame motion index, computed online from consecutive frames.
+	For each frame, takes one channel (frames are cropped to the ROI beforehand) and compares it to the previous frame.
+	The index is the mean absolute difference in intensity (0–255), or, if threshold is set,
+	the fraction of pixels whose intensity changed by more than threshold.
+	The first frame has no predecessor, so its index is nan.
+	Buffers are allocated once, on the first frame, so update() doesn't allocate per frame.
+	"""
+	def __init__(self, channel: Optional[int] = 1, threshold: Optional[int] = None) -> None:
+		"""
+		:param channel: The channel to compare (the default, 1, is green for BGR frames), or None for single-channel frames
+		:param threshold: If set, count changed pixels instead of averaging differences
+		"""
+		self.channel = channel
+		self.threshold = threshold
+		self._previous = None  # type: Optional[np.ndarray]
+		self._diff = None  # type: Optional[np.ndarray]
+		self._changed = None  # type: Optional[np.ndarray]
+
+	def reset(self) -> None:
+		self._previous = None
+
+	def update(self, frame: np.ndarray) -> float:
+		plane = frame if self.channel is None or frame.ndim == 2 else frame[..., self.channel]
+		if self._previous is None or self._previous.shape != plane.shape:
+			self._previous = np.empty(plane.shape, dtype=plane.dtype)
+			self._diff = np.empty(plane.shape, dtype=np.int16)
+			self._changed = np.empty(plane.shape, dtype=bool)
+			np.copyto(self._previous, plane)
+			return float('nan')
+		np.subtract(plane, self._previous, out=self._diff, dtype=np.int16)
+		np.abs(self._diff, out=self._diff)
+		np.copyto(self._previous, plane)
+		if self.threshold is None:
+			return float(self._diff.mean())
+		np.greater(self._diff, self.threshold, out=self._changed)
+		return float(np.count_nonzero(self._changed)) / self._changed.size
+
+	def __repr__(self) -> str:
+		return "ActivityTrace(channel={}, threshold={})".format(self.channel, self.threshold)
+	def __str__(self): return repr(self)
+
+
+__all__ = ['ActivityTrace']
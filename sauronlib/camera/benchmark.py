@@ -0,0 +1,102 @@
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sauronlib import logger
+from sauronlib.camera import Roi
+from sauronlib.camera.camera_config import CameraConfig
+from sauronlib.camera.synthetic import SyntheticWebcam
+from sauronlib.camera.webcam import StreamStats
+
+
+def benchmark_stream(
+		roi: Roi, fps: float, n_milliseconds: int, temp_dir: str, queue_size: int = 64,
+		memory_milliseconds: Optional[int] = None
+) -> Dict[str, Any]:
+	"""Streams from a SyntheticWebcam and reports its throughput, then streams again to measure its memory.
+	Memory is the peak of NumPy and Python allocations (tracemalloc), including the frame pool.
+	It's measured in a separate stream because tracemalloc slows every allocation, so fps and throughput come from one without it.
+	:param memory_milliseconds: The length of the stream that measures memory; defaults to n_milliseconds, and 0 skips it
+	"""
+	config = CameraConfig(fps, roi)
+	video_path = os.path.join(temp_dir, 'bench-{}x{}-{}.avi'.format(roi.width(), roi.height(), fps))
+	stats = _stream(config, temp_dir, queue_size, n_milliseconds, video_path)
+	peak_bytes = None
+	if memory_milliseconds is None:
+		memory_milliseconds = n_milliseconds
+	if memory_milliseconds > 0:
+		tracemalloc.start()
+		try:
+			_stream(config, temp_dir, queue_size, memory_milliseconds, video_path + '.memory.avi')
+			_, peak_bytes = tracemalloc.get_traced_memory()
+		finally:
+			tracemalloc.stop()
+	seconds = (stats.finished_ns - stats.started_ns) / 1e9 if stats.started_ns is not None else 0
+	frame_bytes = roi.n_pixels() * 3
+	return {
+		'mode': 'stream',
+		'width': roi.width(),
+		'height': roi.height(),
+		'target_fps': fps,
+		'sustained_fps': stats.n_encoded / seconds if seconds > 0 else None,
+		'drop_rate': stats.drop_rate(),
+		'n_captured': stats.n_captured,
+		'n_dropped': stats.n_dropped,
+		'n_late': stats.n_late,
+		'max_queue_depth': stats.max_queue_depth,
+		'encode_mb_per_sec': stats.n_encoded * frame_bytes / seconds / 1e6 if seconds > 0 else None,
+		'video_mb': os.path.getsize(video_path) / 1e6 if os.path.exists(video_path) else None,
+		'peak_memory_mb': peak_bytes / 1e6 if peak_bytes is not None else None
+	}
+
+
+def _stream(config: CameraConfig, temp_dir: str, queue_size: int, n_milliseconds: int, video_path: str) -> StreamStats:
+	with SyntheticWebcam(config, temp_dir, queue_size=queue_size) as camera:
+		camera.stream(n_milliseconds, video_path, video_path + '.timestamps.txt')
+		return camera.stream_stats
+
+
+def benchmark_snapshot(roi: Roi, fps: float, n: int, temp_dir: str) -> Dict[str, Any]:
+	"""Times n single snapshots and one burst of n snapshots from a SyntheticWebcam."""
+	config = CameraConfig(fps, roi)
+	with SyntheticWebcam(config, temp_dir) as camera:
+		t0 = time.monotonic()
+		for i in range(n):
+			camera.snapshot(os.path.join(temp_dir, 'snap-{:04d}.png'.format(i)))
+		snapshot_secs = time.monotonic() - t0
+		t0 = time.monotonic()
+		camera.burst(n, 1000 / fps, os.path.join(temp_dir, 'burst-{:04d}.png'))
+		burst_secs = time.monotonic() - t0
+	return {
+		'mode': 'snapshot',
+		'width': roi.width(),
+		'height': roi.height(),
+		'target_fps': fps,
+		'n': n,
+		'snapshot_ms_each': snapshot_secs / n * 1000,
+		'burst_ms_each': burst_secs / n * 1000
+	}
+
+
+def benchmark_matrix(
+		sizes: Sequence[Tuple[int, int]] = ((320, 240), (640, 480), (1280, 720)),
+		fps_values: Sequence[float] = (30, 60, 120),
+		n_milliseconds: int = 3000, n_snapshots: int = 10
+) -> List[Dict[str, Any]]:
+	"""Runs benchmark_stream for every (width, height) × fps, then benchmark_snapshot for every size."""
+	results = []
+	with tempfile.TemporaryDirectory() as temp_dir:
+		for width, height in sizes:
+			for fps in fps_values:
+				result = benchmark_stream(Roi(0, 0, width, height), fps, n_milliseconds, temp_dir)
+				logger.info("Camera benchmark: {}".format(result))
+				results.append(result)
+			result = benchmark_snapshot(Roi(0, 0, width, height), max(fps_values), n_snapshots, temp_dir)
+			logger.info("Camera benchmark: {}".format(result))
+			results.append(result)
+	return results
+
+
+__all__ = ['benchmark_stream', 'benchmark_snapshot', 'benchmark_matrix']
@@ -1,3 +1,7 @@
+import time
+from typing import List, Optional
+
+from sauronlib.clock import RunClock, global_clock
 from .camera_config import CameraConfig
 
 class Camera:
@@ -9,7 +13,7 @@ class Camera:
 		3. exit() disconnects the camera and closes any remaining streams.
 	There is also a snapshot mode:
 		1. init() connects to the camera and starts any necessary engine.
-		2. snapshot() takes a single snapshot.
+		2. snapshot() takes a single snapshot, or burst() takes several at a steady interval.
 		3. exit() disconnects the camera and closes any remaining streams.
 	Example usage:
 		config = CameraConfigBuilder().mode(mode).device_index(1).build()
@@ -17,12 +21,14 @@ class Camera:
 			camera.start()
 			camera.stream()
 			camera.finish()
+	Implementations that timestamp frames in-process should read self.clock, so that frames share a time base with stimuli and sensors.
 	"""
 	def __init__(
-			self, config: CameraConfig, temp_dir: str,
+			self, config: CameraConfig, temp_dir: str, clock: Optional[RunClock] = None
 	) -> None:
 		self.config = config
 		self.temp_dir = temp_dir
+		self.clock = global_clock if clock is None else clock
 
 	def __enter__(self):
 		self.init()
@@ -41,8 +47,26 @@ class Camera:
 	def stream(self, n_milliseconds: int, video_path: str, timestamps_path: str) -> None:
 		raise NotImplementedError()
 
+	def stop(self) -> None:
+		"""Asks a running stream() (in another thread) to finish early. By default, does nothing."""
+		return None
+
 	def snapshot(self, image_path: str) -> None:
 		raise NotImplementedError()
 
+	def burst(self, n: int, interval_ms: float, path_pattern: str) -> List[str]:
+		"""Takes n snapshots, starting interval_ms apart, and returns their paths.
+		:param path_pattern: A str.format pattern filled with the index of each image; ex: 'calibration-{:03d}.png'
+		This default calls snapshot() on a schedule; implementations should override it to keep the device open.
+		"""
+		paths = [path_pattern.format(i) for i in range(n)]
+		t0 = time.monotonic()
+		for i, path in enumerate(paths):
+			wait = t0 + i * interval_ms / 1000 - time.monotonic()
+			if wait > 0:
+				time.sleep(wait)
+			self.snapshot(path)
+		return paths
+
 
 __all__ = ['Camera']
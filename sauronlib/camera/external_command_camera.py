@@ -1,19 +1,58 @@
-from typing import List
+import os
+import re
 import subprocess
+import threading
+import time
+from typing import List, Optional, Pattern, Union
+
 from sauronlib.camera.camera import Camera
 from sauronlib.camera.camera_config import CameraConfig
 from sauronlib import logger
+from sauronlib.clock import RunClock
+
+
+class CameraCommandFailedError(IOError):
+	def description(self):
+		return "The external camera command exited abnormally or never became ready."
 
 
 class ExternalCommandCamera(Camera):
+	"""A camera driven by an external capture executable.
+	stream() runs the executable and blocks. Alternatively, to start a schedule as soon as the camera is recording:
+		camera.start(n_milliseconds, video_path, timestamps_path)
+		camera.wait_ready(timeout_secs=10)
+		runner.run(...)
+		camera.wait()
+	Readiness is signaled by the executable printing a line that matches ready_pattern, or by it creating ready_file.
+	With neither, the camera counts as ready as soon as the process is spawned.
+	If the executable supports a go signal (a line it waits to read on stdin before recording), use prespawn() instead of start():
+	the process loads and warms up in advance, and go() starts recording with only a pipe write of latency.
+	"""
 
 	def __init__(
 			self, config: CameraConfig, temp_dir: str,
-			stdout_path: str, stderr_path: str
+			stdout_path: str, stderr_path: str, clock: Optional[RunClock] = None,
+			ready_pattern: Union[None, str, Pattern] = None, ready_file: Optional[str] = None,
+			go_signal: str = 'go'
 	) -> None:
-		super().__init__(config, temp_dir)
+		"""
+		:param ready_pattern: A regex searched for in each line of stdout; the first match means the camera is ready
+		:param ready_file: A file that the executable creates when ready; deleted before starting if it exists
+		:param go_signal: The line written to stdin by go()
+		"""
+		super().__init__(config, temp_dir, clock)
 		self.stdout_path = stdout_path
 		self.stderr_path = stderr_path
+		self.ready_pattern = re.compile(ready_pattern) if isinstance(ready_pattern, str) else ready_pattern
+		self.ready_file = ready_file
+		self.go_signal = go_signal
+		self.spawned_ns = None  # type: Optional[int]
+		self.ready_ns = None  # type: Optional[int]
+		self.go_ns = None  # type: Optional[int]
+		self._process = None  # type: Optional[subprocess.Popen]
+		self._ready = threading.Event()
+		self._reader = None  # type: Optional[threading.Thread]
+		self._stderr = None
 
 	def _stream_executable(self) -> str:
 		raise NotImplementedError()
@@ -21,18 +60,128 @@ class ExternalCommandCamera(Camera):
 	def _snapshot_executable(self) -> str:
 		raise NotImplementedError()
 
+	def _burst_executable(self) -> Optional[str]:
+		"""Override to return an executable that takes several snapshots in one process. Returns None if there is none."""
+		return None
+
 	def stream(self, n_milliseconds: int, video_path: str, timestamps_path: str) -> None:
 		logger.info("Camera will capture for {}ms. Starting!".format(n_milliseconds))
-		cmd = self.build_cmd(n_milliseconds, video_path, timestamps_path)
+		self.start(n_milliseconds, video_path, timestamps_path)
+		self.wait()
+		logger.info("Camera finished capturing.")
+
+	def start(self, n_milliseconds: int, video_path: str, timestamps_path: str) -> None:
+		"""Launches the capture executable and returns immediately."""
+		self._spawn(self.build_cmd(n_milliseconds, video_path, timestamps_path), stdin=None)
+
+	def prespawn(self, n_milliseconds: int, video_path: str, timestamps_path: str) -> None:
+		"""Launches the capture executable with stdin open, so that it can wait for go()."""
+		self._spawn(self.build_cmd(n_milliseconds, video_path, timestamps_path), stdin=subprocess.PIPE)
+
+	def go(self) -> None:
+		"""Tells a prespawned executable to start recording."""
+		if self._process is None or self._process.stdin is None:
+			raise CameraCommandFailedError("go() requires prespawn()")
+		self._process.stdin.write(self.go_signal + '\n')
+		self._process.stdin.flush()
+		self.go_ns = self.clock.now_ns()
+		logger.debug("Sent go signal to {}".format(self._stream_executable()))
+
+	def _spawn(self, cmd: List[str], stdin) -> None:
+		if self.is_running():
+			raise CameraCommandFailedError("{} is already running".format(self._stream_executable()))
+		if self.ready_file is not None and os.path.exists(self.ready_file):
+			os.remove(self.ready_file)
+		self._ready.clear()
+		self.ready_ns, self.go_ns = None, None
 		logger.info("Running {}".format(cmd))
+		self._stderr = open(self.stderr_path, 'a')
 		try:
-			with open(self.stdout_path, 'a') as out:
-				with open(self.stderr_path, 'a') as err:
-					subprocess.run(cmd, stdout=out, stderr=err)
+			self._process = subprocess.Popen(
+				cmd, stdin=stdin, stdout=subprocess.PIPE, stderr=self._stderr, universal_newlines=True, bufsize=1
+			)
 		except Exception as e:
+			self._stderr.close()
 			logger.fatal("Failed running {}".format(self._stream_executable()))
 			raise e
-		logger.info("Camera finished capturing.")
+		self.spawned_ns = self.clock.now_ns()
+		self._reader = threading.Thread(target=self._read_stdout, name='camera-stdout', daemon=True)
+		self._reader.start()
+		if self.ready_pattern is None and self.ready_file is None:
+			self._mark_ready()
+
+	def _mark_ready(self) -> None:
+		if not self._ready.is_set():
+			self.ready_ns = self.clock.now_ns()
+			self._ready.set()
+			logger.debug("{} is ready".format(self._stream_executable()))
+
+	def _read_stdout(self) -> None:
+		with open(self.stdout_path, 'a') as out:
+			for line in self._process.stdout:
+				out.write(line)
+				if self.ready_pattern is not None and not self._ready.is_set() and self.ready_pattern.search(line):
+					self._mark_ready()
+
+	def is_running(self) -> bool:
+		return self._process is not None and self._process.poll() is None
+
+	def wait_ready(self, timeout_secs: Optional[float] = None, poll_secs: float = 0.001) -> None:
+		"""Blocks until the executable signals that it's ready.
+		Raises a CameraCommandFailedError if it exits first or timeout_secs passes.
+		"""
+		t0 = time.monotonic()
+		while not self._ready.wait(poll_secs):
+			if self.ready_file is not None and os.path.exists(self.ready_file):
+				self._mark_ready()
+				break
+			if self._process is None or self._process.poll() is not None:
+				raise CameraCommandFailedError("{} exited before it was ready".format(self._stream_executable()))
+			if timeout_secs is not None and time.monotonic() - t0 > timeout_secs:
+				raise CameraCommandFailedError("{} was not ready after {}s".format(self._stream_executable(), timeout_secs))
+		logger.info("Camera ready {}ms after launch".format((self.ready_ns - self.spawned_ns) / 1e6))
+
+	def wait(self, timeout_secs: Optional[float] = None) -> int:
+		"""Waits for the executable to finish, and raises a CameraCommandFailedError if it exits with a nonzero code.
+		Also raises a CameraCommandFailedError if start() or prespawn() was never called.
+		"""
+		if self._process is None:
+			raise CameraCommandFailedError("wait() requires start() or prespawn()")
+		try:
+			code = self._process.wait(timeout_secs)
+		finally:
+			if self._process.poll() is not None:
+				self._cleanup()
+		if code != 0:
+			logger.fatal("{} exited with code {}".format(self._stream_executable(), code))
+			raise CameraCommandFailedError("{} exited with code {}".format(self._stream_executable(), code))
+		return code
+
+	def stop(self, timeout_secs: float = 5) -> None:
+		"""Terminates the executable, killing it if it doesn't exit within timeout_secs."""
+		if not self.is_running():
+			return
+		self._process.terminate()
+		try:
+			self._process.wait(timeout_secs)
+		except subprocess.TimeoutExpired:
+			logger.warning("Killing {}".format(self._stream_executable()))
+			self._process.kill()
+			self._process.wait()
+		self._cleanup()
+
+	def _cleanup(self) -> None:
+		if self._reader is not None:
+			self._reader.join()
+			self._reader = None
+		if self._process.stdin is not None:
+			self._process.stdin.close()
+		if self._stderr is not None:
+			self._stderr.close()
+			self._stderr = None
+
+	def exit(self) -> None:
+		self.stop()
 
 	def build_cmd(self, n_milliseconds: int, video_path: str, timestamps_path: str) -> List[str]:
 		return [
@@ -50,5 +199,22 @@ class ExternalCommandCamera(Camera):
 				# TODO fix
 				subprocess.run([self._snapshot_executable(), image_path, '0'], stdout=out, stderr=err)
 
+	def burst(self, n: int, interval_ms: float, path_pattern: str) -> List[str]:
+		"""Takes n snapshots in a single run of _burst_executable(), which keeps the camera open between them.
+		The executable is called as: executable n interval_ms path_pattern, where path_pattern is filled with each index.
+		If there is no burst executable, this falls back to spawning the snapshot executable once per image.
+		"""
+		if self._burst_executable() is None:
+			return super().burst(n, interval_ms, path_pattern)
+		paths = [path_pattern.format(i) for i in range(n)]
+		with open(self.stdout_path, 'a') as out:
+			with open(self.stderr_path, 'a') as err:
+				code = subprocess.run(
+					[self._burst_executable(), str(n), str(interval_ms), path_pattern], stdout=out, stderr=err
+				).returncode
+		if code != 0:
+			raise CameraCommandFailedError("{} exited with code {}".format(self._burst_executable(), code))
+		return paths
+
 
-__all__ = ['ExternalCommandCamera']
+__all__ = ['ExternalCommandCamera', 'CameraCommandFailedError']
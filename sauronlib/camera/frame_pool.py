@@ -0,0 +1,69 @@
+import threading
+from collections import deque
+from typing import Optional, Tuple
+
+import numpy as np
+
+from sauronlib import logger
+
+
+class FramePool:
+	"""A fixed set of preallocated frame buffers that are reused instead of allocating an array per frame.
+	acquire() hands out a free buffer, or returns None and counts n_exhausted if there is none;
+	release() returns a buffer once it's no longer needed (for example, after it's encoded).
+	Example usage:
+		pool = FramePool(66, (roi.height(), roi.width(), 3))
+		buffer = pool.acquire()
+		ret, frame = cap.read(image=buffer)
+		...
+		pool.release(frame)
+	"""
+	def __init__(self, size: int, shape: Tuple[int, ...], dtype=np.uint8) -> None:
+		self.size = size
+		self.dtype = np.dtype(dtype)
+		self.n_exhausted = 0
+		self.n_reallocated = 0
+		self._lock = threading.Lock()
+		self._allocate(tuple(shape))
+
+	def _allocate(self, shape: Tuple[int, ...]) -> None:
+		self.shape = shape
+		self._free = deque(np.empty(shape, dtype=self.dtype) for _ in range(self.size))
+
+	def acquire(self) -> Optional[np.ndarray]:
+		with self._lock:
+			if len(self._free) == 0:
+				self.n_exhausted += 1
+				return None
+			return self._free.pop()
+
+	def release(self, buffer: np.ndarray) -> None:
+		"""Returns a buffer to the pool. Buffers of the wrong shape (from before a reshape) are discarded."""
+		with self._lock:
+			if buffer.shape == self.shape and buffer.dtype == self.dtype and len(self._free) < self.size:
+				self._free.append(buffer)
+
+	def reshape(self, shape: Tuple[int, ...]) -> None:
+		"""Reallocates the buffers to a new shape; buffers in use are discarded when they are released.
+		Use this if the device delivers frames of a different size than requested.
+		"""
+		shape = tuple(shape)
+		with self._lock:
+			if shape == self.shape:
+				return
+			logger.warning("Reallocating frame pool from {} to {}".format(self.shape, shape))
+			self.n_reallocated += 1
+			self._allocate(shape)
+
+	def n_free(self) -> int:
+		return len(self._free)
+
+	def nbytes(self) -> int:
+		return self.size * int(np.prod(self.shape)) * self.dtype.itemsize
+
+	def __repr__(self) -> str:
+		return "FramePool({}x{}, free={}, exhausted={})".format(self.size, self.shape, self.n_free(), self.n_exhausted)
+	def __str__(self): return repr(self)
+
+
+__all__ = ['FramePool']
@@ -0,0 +1,194 @@
+import multiprocessing
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sauronlib import logger
+from sauronlib.camera.camera import Camera
+
+
+class CameraReport:
+	"""The outcome of one camera in a MultiCameraCapture, or its progress so far.
+	Times are time.monotonic_ns() values, which are comparable across processes on one machine.
+	started_ns is when the camera read its first frame if it reports that (as Webcam does through StreamStats),
+	and otherwise when the barrier released.
+	"""
+	def __init__(self, index: int) -> None:
+		self.index = index
+		self.released_ns = None  # type: Optional[int]
+		self.started_ns = None  # type: Optional[int]
+		self.finished_ns = None  # type: Optional[int]
+		self.n_captured = None  # type: Optional[int]
+		self.n_dropped = None  # type: Optional[int]
+		self.fps = None  # type: Optional[float]
+		self.error = None  # type: Optional[str]
+
+	def update(self, values: Dict[str, Any]) -> None:
+		for key, value in values.items():
+			setattr(self, key, value)
+
+	def __repr__(self) -> str:
+		return "CameraReport({}: fps={}, captured={}, dropped={}{})".format(
+			self.index, self.fps, self.n_captured, self.n_dropped, '' if self.error is None else ', error=' + self.error
+		)
+	def __str__(self): return repr(self)
+
+
+def _camera_stats(camera: Camera) -> Dict[str, Any]:
+	stats = getattr(camera, 'stream_stats', None)
+	if stats is None:
+		return {}
+	elapsed = camera.clock.now_ns() - stats.started_ns if stats.started_ns is not None else 0
+	return {
+		'started_ns': stats.started_ns,
+		'n_captured': stats.n_captured,
+		'n_dropped': stats.n_dropped,
+		'fps': stats.n_captured / elapsed * 1e9 if elapsed > 0 else None
+	}
+
+
+def _run_camera(
+		index: int, factory: Callable[[], Camera], n_milliseconds: int, video_path: str, timestamps_path: str,
+		barrier, stop_event, reports, report_interval_secs: float, barrier_timeout_secs: float
+) -> None:
+	"""The body of each camera process."""
+	values = {}  # type: Dict[str, Any]
+	done = threading.Event()
+	camera = None
+	try:
+		camera = factory()
+		camera.init()
+		barrier.wait(barrier_timeout_secs)
+		values['released_ns'] = time.monotonic_ns()
+		reports.put((index, dict(values)))
+
+		def monitor():
+			while not done.wait(report_interval_secs):
+				if stop_event.is_set():
+					camera.stop()
+				reports.put((index, _camera_stats(camera)))
+
+		threading.Thread(target=monitor, daemon=True).start()
+		camera.stream(n_milliseconds, video_path, timestamps_path)
+		values.update(_camera_stats(camera))
+		stats = getattr(camera, 'stream_stats', None)
+		if stats is not None:
+			values['fps'] = stats.fps()
+	except Exception as e:
+		values['error'] = '{}: {}'.format(type(e).__name__, e)
+		barrier.abort()
+	finally:
+		done.set()
+		values['finished_ns'] = time.monotonic_ns()
+		if values.get('started_ns') is None:
+			values['started_ns'] = values.get('released_ns')
+		try:
+			if camera is not None:
+				camera.exit()
+		finally:
+			reports.put((index, values))
+			reports.put((index, None))
+
+
+class MultiCameraCapture:
+	"""Streams from several cameras at once, each in its own process.
+	Each process constructs and initializes its camera, then waits at a shared barrier so that all start streaming together.
+	Progress (fps and dropped frames) is reported live in reports; stop() ends every camera early.
+	Cameras are passed as picklable factories (such as functools.partial(Webcam, config, temp_dir)),
+	because device handles can't be sent between processes.
+	Example usage:
+		capture = MultiCameraCapture([partial(Webcam, config0, tmp), partial(Webcam, config1, tmp)])
+		capture.start(60000, [('cam0.avi', 'cam0.txt'), ('cam1.avi', 'cam1.txt')])
+		...
+		reports = capture.wait()
+		print(capture.start_skew_ms())
+	"""
+	def __init__(
+			self, factories: Sequence[Callable[[], Camera]],
+			barrier_timeout_secs: float = 60, report_interval_secs: float = 1
+	) -> None:
+		self.factories = list(factories)
+		self.barrier_timeout_secs = barrier_timeout_secs
+		self.report_interval_secs = report_interval_secs
+		self.reports = [CameraReport(i) for i in range(len(self.factories))]  # type: List[CameraReport]
+		self._context = multiprocessing.get_context('spawn')
+		self._processes = []  # type: List[multiprocessing.Process]
+		self._barrier = None
+		self._stop_event = None
+		self._queue = None
+		self._listener = None  # type: Optional[threading.Thread]
+
+	def start(self, n_milliseconds: int, outputs: Sequence[Tuple[str, str]]) -> None:
+		"""Launches one process per camera. outputs is a (video_path, timestamps_path) pair per camera."""
+		if len(outputs) != len(self.factories):
+			raise ValueError("There are {} cameras but {} outputs".format(len(self.factories), len(outputs)))
+		self.reports = [CameraReport(i) for i in range(len(self.factories))]
+		# keep references to the shared objects until the children have unpickled them
+		self._barrier = barrier = self._context.Barrier(len(self.factories))
+		self._stop_event = self._context.Event()
+		self._queue = reports = self._context.Queue()
+		self._processes = [
+			self._context.Process(
+				target=_run_camera, name='camera-{}'.format(i),
+				args=(
+					i, factory, n_milliseconds, video_path, timestamps_path,
+					barrier, self._stop_event, reports, self.report_interval_secs, self.barrier_timeout_secs
+				)
+			)
+			for i, (factory, (video_path, timestamps_path)) in enumerate(zip(self.factories, outputs))
+		]
+		for process in self._processes:
+			process.start()
+		self._listener = threading.Thread(target=self._listen, args=(reports,), name='camera-reports', daemon=True)
+		self._listener.start()
+		logger.info("Started {} camera processes".format(len(self._processes)))
+
+	def _listen(self, reports) -> None:
+		n_open = len(self._processes)
+		while n_open > 0:
+			try:
+				index, values = reports.get(timeout=self.report_interval_secs)
+			except queue.Empty:
+				if not any(p.is_alive() for p in self._processes):
+					break
+				continue
+			if values is None:
+				n_open -= 1
+			else:
+				self.reports[index].update(values)
+
+	def stop(self) -> None:
+		"""Asks every camera to stop streaming. Takes effect within report_interval_secs."""
+		if self._stop_event is not None:
+			self._stop_event.set()
+
+	def wait(self, timeout_secs: Optional[float] = None) -> List[CameraReport]:
+		t0 = time.monotonic()
+		for process in self._processes:
+			remaining = None if timeout_secs is None else max(0.0, timeout_secs - (time.monotonic() - t0))
+			process.join(remaining)
+		self._listener.join(None if timeout_secs is None else max(0.0, timeout_secs - (time.monotonic() - t0)))
+		for report in self.reports:
+			if report.error is not None:
+				logger.error("Camera {} failed: {}".format(report.index, report.error))
+		logger.info("Cameras finished with start skew {}ms: {}".format(self.start_skew_ms(), self.reports))
+		return self.reports
+
+	def run(self, n_milliseconds: int, outputs: Sequence[Tuple[str, str]]) -> List[CameraReport]:
+		self.start(n_milliseconds, outputs)
+		return self.wait()
+
+	def start_skew_ms(self) -> Optional[float]:
+		"""The time between the first and last camera starting, or None if any hasn't started."""
+		starts = [r.started_ns for r in self.reports]
+		if len(starts) == 0 or any(s is None for s in starts):
+			return None
+		return (max(starts) - min(starts)) / 1e6
+
+	def __repr__(self) -> str:
+		return "MultiCameraCapture({})".format(self.reports)
+	def __str__(self): return repr(self)
+
+
+__all__ = ['MultiCameraCapture', 'CameraReport']
@@ -0,0 +1,68 @@
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+
+from sauronlib.camera.webcam import Webcam
+
+
+class SyntheticVideoCapture:
+	"""A stand-in for cv2.VideoCapture that generates frames at a target rate and size, for testing without hardware.
+	read() blocks until the next frame is due, like a real device, then copies one of a few pregenerated noise frames.
+	Supports the subset of the cv2.VideoCapture API that Webcam uses.
+	"""
+	def __init__(self, width: int, height: int, fps: float, n_patterns: int = 8, seed: int = 0) -> None:
+		self.width = width
+		self.height = height
+		self.fps = fps
+		self.n_read = 0
+		rng = np.random.RandomState(seed)
+		self._patterns = [rng.randint(0, 256, size=(height, width, 3), dtype=np.uint8) for _ in range(n_patterns)]
+		self._period_ns = int(1e9 / fps)
+		self._next_ns = None  # type: Optional[int]
+		self._open = True
+		self._properties = {3: float(width), 4: float(height), 5: float(fps)}
+
+	def isOpened(self) -> bool:
+		return self._open
+
+	def set(self, prop: int, value) -> bool:
+		self._properties[prop] = value
+		return True
+
+	def get(self, prop: int) -> float:
+		return self._properties.get(prop, 0.0)
+
+	def read(self, image: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+		if not self._open:
+			return False, None
+		now = time.monotonic_ns()
+		if self._next_ns is None:
+			self._next_ns = now
+		elif now < self._next_ns:
+			time.sleep((self._next_ns - now) / 1e9)
+		# like a device, deliver frames on a fixed cadence regardless of when they're read
+		self._next_ns = max(self._next_ns + self._period_ns, time.monotonic_ns() - self._period_ns)
+		pattern = self._patterns[self.n_read % len(self._patterns)]
+		self.n_read += 1
+		if image is None or image.shape != pattern.shape or image.dtype != pattern.dtype:
+			return True, pattern.copy()
+		np.copyto(image, pattern)
+		return True, image
+
+	def release(self) -> None:
+		self._open = False
+
+	def __repr__(self) -> str:
+		return "SyntheticVideoCapture({}x{}@{}fps)".format(self.width, self.height, self.fps)
+	def __str__(self): return repr(self)
+
+
+class SyntheticWebcam(Webcam):
+	"""A Webcam that reads from a SyntheticVideoCapture sized to contain config.roi, at config.fps."""
+
+	def init(self):
+		self.cap = SyntheticVideoCapture(self.config.roi.x1, self.config.roi.y1, self.config.fps)
+
+
+__all__ = ['SyntheticVideoCapture', 'SyntheticWebcam']
@@ -0,0 +1,111 @@
+import shutil
+from typing import Optional, Tuple
+
+import numpy as np
+
+from klgists.files.wrap_cmd_call import wrap_cmd_call
+
+from sauronlib import logger, lazy_import
+from sauronlib.alignment import parse_stamps, read_timestamps
+from sauronlib.scheduling.stimulus_time_log import StimulusTimeLog
+
+cv2 = lazy_import('cv2')
+
+
+class NoFramesInBatteryError(ValueError):
+	def description(self):
+		return "No frames of the video fall within the battery, so there is nothing to trim."
+
+
+class TrimResult:
+	"""The frames kept by trim(): [first_frame, end_frame) of the original video."""
+	def __init__(self, first_frame: int, end_frame: int, n_original_frames: int, method: str) -> None:
+		self.first_frame = first_frame
+		self.end_frame = end_frame
+		self.n_original_frames = n_original_frames
+		self.method = method
+
+	def n_frames(self) -> int:
+		return self.end_frame - self.first_frame
+
+	def __repr__(self) -> str:
+		return "TrimResult(frames {}–{} of {}, via {})".format(self.first_frame, self.end_frame, self.n_original_frames, self.method)
+	def __str__(self): return repr(self)
+
+
+def frame_range(frame_times_ns: np.ndarray, start_ns: int, end_ns: int) -> Tuple[int, int]:
+	"""Finds the frames captured in [start_ns, end_ns] with np.searchsorted, as (first, end) indices with end exclusive."""
+	first = int(np.searchsorted(frame_times_ns, start_ns, side='left'))
+	end = int(np.searchsorted(frame_times_ns, end_ns, side='right'))
+	return first, max(first, end)
+
+
+def battery_frame_range(timestamps_path: str, log: StimulusTimeLog) -> Tuple[int, int, int]:
+	"""Finds the frames in a camera timestamps file that fall within the battery, from log.start_time to log.end_time.
+	Returns (first, end, n_frames).
+	"""
+	frame_times = read_timestamps(timestamps_path).times_ns
+	# convert the log's bounds exactly as the timestamps file was written and parsed, so they compare directly
+	start_ns, end_ns = parse_stamps([log.clock.stamp(log.start_ns), log.clock.stamp(log.end_ns)])
+	first, end = frame_range(frame_times, start_ns, end_ns)
+	return first, end, len(frame_times)
+
+
+def trim(
+		video_path: str, timestamps_path: str, log: StimulusTimeLog,
+		trimmed_video_path: str, trimmed_timestamps_path: str, fps: float,
+		reencode: Optional[bool] = None
+) -> TrimResult:
+	"""Writes the frames of a video (and their timestamps) that fall within the battery in log.
+	By default, copies the frames with ffmpeg's stream copy, which seeks without decoding.
+	That is frame-exact for intra-only codecs such as the MJPG that Webcam writes;
+	for codecs with inter frames, pass reencode=True.
+	If ffmpeg is not installed, decodes and re-encodes with OpenCV instead.
+	Raises a NoFramesInBatteryError, without writing anything, if no frames fall within the battery.
+	:param fps: The frame rate the video was written at (CameraConfig.fps), which maps frame indices to positions
+	"""
+	first, end, n_frames = battery_frame_range(timestamps_path, log)
+	logger.info("Trimming {} to frames {}–{} of {}".format(video_path, first, end, n_frames))
+	if first == end:
+		raise NoFramesInBatteryError("No frames of {} fall within the battery (frame {} of {})".format(video_path, first, n_frames))
+	ffmpeg = shutil.which('ffmpeg')
+	if ffmpeg is not None:
+		codec = ['-c:v', 'mjpeg', '-q:v', '2'] if reencode else ['-c', 'copy']
+		wrap_cmd_call([
+			ffmpeg, '-y', '-v', 'error',
+			'-ss', '{:.6f}'.format(first / fps), '-i', video_path,
+			'-frames:v', str(end - first), *codec, trimmed_video_path
+		])
+		method = 'ffmpeg re-encode' if reencode else 'ffmpeg stream copy'
+	else:
+		_trim_with_opencv(video_path, trimmed_video_path, first, end, fps)
+		method = 'opencv re-encode'
+	with open(timestamps_path, 'r') as f:
+		lines = [line for line in f if len(line.strip()) > 0]
+	with open(trimmed_timestamps_path, 'w') as f:
+		f.writelines(lines[first:end])
+	result = TrimResult(first, end, n_frames, method)
+	logger.info("Trimmed {}: {}".format(video_path, result))
+	return result
+
+
+def _trim_with_opencv(video_path: str, trimmed_video_path: str, first: int, end: int, fps: float) -> None:
+	cap = cv2.VideoCapture(video_path)
+	writer = None
+	try:
+		cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+		for _ in range(first, end):
+			ret, frame = cap.read()
+			if not ret:
+				break
+			if writer is None:
+				fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
+				writer = cv2.VideoWriter(trimmed_video_path, fourcc, fps, (frame.shape[1], frame.shape[0]))
+			writer.write(frame)
+	finally:
+		cap.release()
+		if writer is not None:
+			writer.release()
+
+
+__all__ = ['TrimResult', 'NoFramesInBatteryError', 'frame_range', 'battery_frame_range', 'trim']
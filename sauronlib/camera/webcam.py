@@ -1,16 +1,95 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
 from .camera import *
+from .camera_config import CameraConfig
+from .frame_pool import FramePool
+from .activity import ActivityTrace
+
+import numpy as np
+from sauronlib import logger, lazy_import
+from sauronlib.clock import RunClock
+
+cv2 = lazy_import('cv2')
+
 
-import cv2
-from sauronlib import logger
+class StreamStats:
+	"""Counters for one call to Webcam.stream. Updated live by the capture and encoder threads.
+	n_dropped counts frames that were captured but discarded because the encoder queue was full or no pooled buffer was free;
+	n_pool_exhausted counts the latter alone.
+	started_ns is when the first frame was read, and finished_ns when the encoder finished; both are clock.now_ns() values.
+	"""
+	def __init__(self, queue_size: int) -> None:
+		self.queue_size = queue_size
+		self.n_captured = 0
+		self.n_dropped = 0
+		self.n_pool_exhausted = 0
+		self.n_read_failures = 0
+		self.n_encoded = 0
+		self.max_queue_depth = 0
+		self.n_late = 0
+		self.started_ns = None  # type: Optional[int]
+		self.finished_ns = None  # type: Optional[int]
+
+	def drop_rate(self) -> float:
+		return self.n_dropped / self.n_captured if self.n_captured > 0 else 0.0
+
+	def fps(self) -> float:
+		"""The rate at which frames were encoded."""
+		if self.started_ns is None or self.finished_ns is None or self.finished_ns == self.started_ns:
+			return float('nan')
+		return self.n_encoded / (self.finished_ns - self.started_ns) * 1e9
+
+	def __repr__(self) -> str:
+		return "StreamStats(captured={}, encoded={}, dropped={}, pool_exhausted={}, read_failures={}, late={}, max_depth={}/{})".format(
+			self.n_captured, self.n_encoded, self.n_dropped, self.n_pool_exhausted, self.n_read_failures,
+			self.n_late, self.max_queue_depth, self.queue_size
+		)
+	def __str__(self): return repr(self)
 
 
 class Webcam(Camera):
+	"""A camera read with OpenCV, such as a USB webcam.
+	stream() is a two-stage pipeline: a capture thread reads frames at config.fps into a bounded queue,
+	and an encoder thread writes them to the video file and their timestamps to the timestamps file.
+	If the encoder falls behind, new frames are dropped (and counted) instead of delaying capture.
+	Frames are read into preallocated buffers from a FramePool and recycled after encoding,
+	so streaming doesn't allocate an array per frame.
+	The device captures frames of at least (roi.x1, roi.y1), and each frame is cropped to the ROI (as a view)
+	before encoding, so only the ROI is encoded and stored.
+	If activity is set, the encoder thread also computes an ActivityTrace index for each cropped frame
+	and writes it to activity_path(timestamps_path), one value per line matching the timestamps file.
+	"""
+
+	def __init__(
+			self, config: CameraConfig, temp_dir: str, clock: Optional[RunClock] = None,
+			queue_size: int = 64, fourcc: str = 'MJPG', activity: Optional[ActivityTrace] = None
+	) -> None:
+		"""
+		:param queue_size: Maximum number of frames waiting to be encoded
+		:param fourcc: The codec for the video file
+		:param activity: If set, compute this per-frame activity index while streaming
+		"""
+		super().__init__(config, temp_dir, clock)
+		self.queue_size = queue_size
+		self.fourcc = fourcc
+		self.activity = activity
+		self.cap = None
+		self.stream_stats = None  # type: Optional[StreamStats]
+		self.frame_pool = None  # type: Optional[FramePool]
+		self._roi_warned = False
+		self._stop_requested = threading.Event()
+		self._queue = None  # type: Optional[queue.Queue]
 
 	def init(self):
 		cap = cv2.VideoCapture(self.config.device_index)
 		cap.set(6, cv2.VideoWriter.fourcc('M', 'J', 'P', 'G'))
-		cap.set(3, self.config.roi.width())
-		cap.set(4,self.config.roi.height())
+		# the ROI is in sensor coordinates, so capture enough of the frame to contain it, then crop
+		cap.set(3, self.config.roi.x1)
+		cap.set(4, self.config.roi.y1)
 		cap.set(15, self.config.exposure)
 		for i in range(0, 18):
 			try:
@@ -19,12 +98,175 @@ class Webcam(Camera):
 				logger.debug("Failed to read webcam {}".format(i))
 		self.cap = cap
 
+	def exit(self) -> None:
+		if self.cap is not None:
+			self.cap.release()
+			self.cap = None
+
+	def stop(self) -> None:
+		"""Ends a running stream() after the current frame; frames already queued are still encoded."""
+		self._stop_requested.set()
+
+	@staticmethod
+	def activity_path(timestamps_path: str) -> str:
+		return timestamps_path + '.activity.txt'
+
+	def queue_depth(self) -> int:
+		"""The number of frames currently waiting to be encoded, or 0 if not streaming."""
+		return 0 if self._queue is None else self._queue.qsize()
+
 	def stream(self, n_milliseconds: int, video_path: str, timestamps_path: str) -> None:
-		raise NotImplementedError()  # TODO
+		logger.info("Camera will capture for {}ms. Starting!".format(n_milliseconds))
+		self.stream_stats = StreamStats(self.queue_size)
+		self._queue = queue.Queue(maxsize=self.queue_size)
+		self._stop_requested.clear()
+		if self.frame_pool is None:
+			# one buffer per queue slot, plus the one being captured and the one being encoded
+			self.frame_pool = FramePool(self.queue_size + 2, (self.config.roi.y1, self.config.roi.x1, 3))
+		errors = []
+		encoder = threading.Thread(
+			target=self._encode_loop, args=(video_path, timestamps_path, errors), name='webcam-encoder'
+		)
+		capture = threading.Thread(target=self._capture_loop, args=(n_milliseconds, errors), name='webcam-capture')
+		encoder.start()
+		capture.start()
+		capture.join()
+		encoder.join()
+		self._queue = None
+		if len(errors) > 0:
+			raise errors[0]
+		logger.info("Camera finished capturing. {}".format(self.stream_stats))
+
+	def _capture_loop(self, n_milliseconds: int, errors) -> None:
+		stats, frames, pool = self.stream_stats, self._queue, self.frame_pool
+		now_ns = self.clock.now_ns
+		fps = self.config.fps
+		# one frame per period, starting at 0, so exactly this many fit in n_milliseconds
+		n_frames = int(round(n_milliseconds * fps / 1000))
+		scratch = None  # read into this when the pool is exhausted, to keep the device's timing
+		try:
+			t0 = now_ns()
+			for i in range(n_frames):
+				if self._stop_requested.is_set():
+					break
+				# computed from t0 each time, so a truncated period can't accumulate into an extra frame
+				wait_ns = t0 + int(i * 1e9 / fps) - now_ns()
+				if wait_ns > 0:
+					time.sleep(wait_ns / 1e9)
+				else:
+					stats.n_late += 1
+				buffer = pool.acquire()
+				if buffer is None:
+					if scratch is None:
+						scratch = np.empty(pool.shape, dtype=pool.dtype)
+					ret, _ = self.cap.read(image=scratch)
+					stats.n_pool_exhausted += 1
+					if ret:
+						if stats.started_ns is None:
+							stats.started_ns = now_ns()
+						stats.n_captured += 1
+						stats.n_dropped += 1
+					else:
+						stats.n_read_failures += 1
+					continue
+				ret, frame = self.cap.read(image=buffer)
+				timestamp = now_ns()
+				if not ret:
+					pool.release(buffer)
+					stats.n_read_failures += 1
+					continue
+				if frame.shape != pool.shape:
+					pool.reshape(frame.shape)
+				if stats.started_ns is None:
+					stats.started_ns = timestamp
+				stats.n_captured += 1
+				try:
+					frames.put_nowait((frame, timestamp))
+				except queue.Full:
+					pool.release(frame)
+					stats.n_dropped += 1
+				depth = frames.qsize()
+				if depth > stats.max_queue_depth:
+					stats.max_queue_depth = depth
+		except Exception as e:
+			logger.fatal("Webcam failed while capturing")
+			errors.append(e)
+		finally:
+			frames.put(None)
+
+	def _crop(self, frame: np.ndarray) -> np.ndarray:
+		roi = self.config.roi
+		if roi.is_full_frame(frame.shape[0], frame.shape[1]):
+			return frame
+		if not self._roi_warned and not roi.fits(frame.shape[0], frame.shape[1]):
+			self._roi_warned = True
+			logger.warning("ROI {} does not fit in {}x{} frames; cropping to the overlap".format(roi, frame.shape[1], frame.shape[0]))
+		return roi.crop(frame)
+
+	def _encode_loop(self, video_path: str, timestamps_path: str, errors) -> None:
+		stats, frames = self.stream_stats, self._queue
+		writer = None
+		activity_file = None
+		try:
+			if self.activity is not None:
+				self.activity.reset()
+				activity_file = open(Webcam.activity_path(timestamps_path), 'w')
+			with open(timestamps_path, 'w') as timestamps:
+				while True:
+					item = frames.get()
+					if item is None:
+						break
+					frame, timestamp = item
+					cropped = self._crop(frame)
+					if writer is None:
+						writer = cv2.VideoWriter(
+							video_path, cv2.VideoWriter_fourcc(*self.fourcc), self.config.fps, (cropped.shape[1], cropped.shape[0])
+						)
+					writer.write(cropped)
+					if activity_file is not None:
+						activity_file.write('{:.4f}\n'.format(self.activity.update(cropped)))
+					self.frame_pool.release(frame)
+					timestamps.write(self.clock.stamp(timestamp) + '\n')
+					stats.n_encoded += 1
+		except Exception as e:
+			logger.fatal("Webcam failed while encoding")
+			errors.append(e)
+			# keep draining so the capture thread never blocks on a full queue
+			while frames.get() is not None:
+				pass
+		finally:
+			if writer is not None:
+				writer.release()
+			if activity_file is not None:
+				activity_file.close()
+			stats.finished_ns = self.clock.now_ns()
 
 	def snapshot(self, image_path: str) -> None:
 		ret, frame = self.cap.read()
-		cv2.imwrite(image_path, frame)
+		cv2.imwrite(image_path, self._crop(frame))
+
+	def burst(self, n: int, interval_ms: float, path_pattern: str) -> List[str]:
+		"""Reads n frames from the open device on a steady schedule and writes the images on background threads.
+		Returns once every image is written.
+		"""
+		paths = [path_pattern.format(i) for i in range(n)]
+		now_ns = self.clock.now_ns
+		period_ns = int(interval_ms * 1000000)
+		with ThreadPoolExecutor(max_workers=2, thread_name_prefix='webcam-burst') as writers:
+			futures = []
+			t0 = now_ns()
+			for i, path in enumerate(paths):
+				wait_ns = t0 + i * period_ns - now_ns()
+				if wait_ns > 0:
+					time.sleep(wait_ns / 1e9)
+				ret, frame = self.cap.read()
+				if not ret:
+					raise IOError("Failed to read frame {} of {} from the webcam".format(i, n))
+				futures.append(writers.submit(cv2.imwrite, path, self._crop(frame)))
+			for future in futures:
+				future.result()
+		logger.info("Took {} snapshots in {}ms".format(n, round((now_ns() - t0) / 1e6)))
+		return paths
 
 
-__all__ = ['Webcam']
+__all__ = ['Webcam', 'StreamStats']
@@ -4,13 +4,19 @@ Command-line interface for sauronlib.
 
 from __future__ import annotations
 
+import json
 import logging
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
 
 import typer
 
 logger = logging.getLogger(__package__)
 
-from sauronlib import __title__, __version__, __copyright__, metadata
+import sauronlib
+from sauronlib import __copyright__, show_table
 
 
 class Options:
@@ -27,12 +33,17 @@ def context(verbose: bool = False):
 
         verbose: Print extended information.
     """
+    global global_options
     global_options = Options(verbose=verbose)
+    logging.basicConfig(level=logging.DEBUG if verbose else logging.INFO)
 
 
-cli = typer.Typer(context=context)
+cli = typer.Typer(callback=context)
+bench = typer.Typer(help="Run built-in performance scenarios against in-process stand-ins.")
+cli.add_typer(bench, name="bench")
 
 
+@cli.command()
 def info(n_seconds: float = 0.01) -> None:
     """
     Get info about sauronlib.
@@ -41,9 +52,9 @@ def info(n_seconds: float = 0.01) -> None:
 
         n_seconds: Number of seconds to wait between processing.
     """
-    typer.echo("{} version {}, {}".format(__title__, __version__, __copyright__))
+    typer.echo("{} version {}, {}".format(sauronlib.__title__, sauronlib.__version__, __copyright__))
     if global_options.verbose:
-        typer.echo(str(metadata.__dict__))
+        typer.echo(str(sauronlib.metadata))
     total = 0
     with typer.progressbar(range(100)) as progress:
         for value in progress:
@@ -52,5 +63,188 @@ def info(n_seconds: float = 0.01) -> None:
     typer.echo(f"Processed {total} things.")
 
 
+@bench.command("list")
+def bench_list() -> None:
+    """
+    List the benchmark scenarios.
+    """
+    from sauronlib.benchmark import scenarios
+    for name, scenario in scenarios.items():
+        typer.echo("{:<12}{}".format(name, scenario.__doc__.splitlines()[0]))
+
+
+@bench.command("run")
+def bench_run(
+        scenario: List[str] = typer.Argument(None),
+        output: Optional[Path] = typer.Option(None, "--output", "-o"),
+        quick: bool = False
+) -> None:
+    """
+    Run benchmark scenarios and print the results.
+
+    Args:
+
+        scenario: Scenarios to run (see bench list); all of them by default.
+
+        output: Also write the results and system info to this JSON file.
+
+        quick: Run small versions of each scenario.
+    """
+    from sauronlib.benchmark import run_scenarios, scenarios
+    names = list(scenario) if scenario else list(scenarios.keys())
+    try:
+        report = run_scenarios(names, quick=quick)
+    except KeyError as e:
+        typer.echo(str(e), err=True)
+        raise typer.Exit(2)
+    typer.echo(show_table(["key", "value"], [[k, str(v)] for k, v in report["system"].items()], title="system"))
+    for name, outcome in report["scenarios"].items():
+        if "error" in outcome:
+            typer.echo("{} failed: {}".format(name, outcome["error"]), err=True)
+        elif len(outcome["results"]) > 0:
+            # results can differ in shape (such as per mode), so take every key, in the order first seen
+            headers = list({key: None for row in outcome["results"] for key in row})
+            rows = [[_fmt(row[h]) if h in row else "" for h in headers] for row in outcome["results"]]
+            typer.echo(show_table(headers, rows, title="{} ({}s)".format(name, round(outcome["seconds"], 1))))
+    if output is not None:
+        output.write_text(json.dumps(report, indent=2), encoding="utf8")
+        typer.echo("Wrote {}".format(output))
+    if any("error" in outcome for outcome in report["scenarios"].values()):
+        raise typer.Exit(1)
+
+
+def _fmt(value) -> str:
+    return "{:.4g}".format(value) if isinstance(value, float) else str(value)
+
+
+def _read_layout(path: Path):
+    from sauronlib.board_layout import BoardLayout
+    data = json.loads(path.read_text(encoding="utf8"))
+    for ports in ["digital_ports", "analog_ports"]:
+        data[ports] = {int(port): pins for port, pins in data.get(ports, {}).items()}
+    return BoardLayout(**data)
+
+
+def _report_progress(runner, stop: threading.Event, interval_secs: float) -> None:
+    prev_n, prev_wall, prev_cpu = 0, time.monotonic(), time.process_time()
+    while not stop.wait(interval_secs):
+        n, wall, cpu = runner.n_applied, time.monotonic(), time.process_time()
+        if runner.started_ns is None:
+            continue
+        lateness = runner.lateness.last / 1e6 if runner.lateness.last is not None else float("nan")
+        typer.echo("[{:7.1f}s] {}/{} events  {:8.1f} events/s  lateness {:7.3f}ms  CPU {:3.0f}%".format(
+            (runner.clock.now_ns() - runner.started_ns) / 1e9, n, "?" if runner.n_events is None else runner.n_events,
+            (n - prev_n) / (wall - prev_wall), lateness, (cpu - prev_cpu) / (wall - prev_wall) * 100
+        ))
+        prev_n, prev_wall, prev_cpu = n, wall, cpu
+
+
+@cli.command()
+def run(
+        schedule: Path,
+        output: Path = typer.Option(Path("."), "--output", "-o"),
+        layout: Optional[Path] = None,
+        port: Optional[str] = None,
+        audio_dir: Optional[Path] = None,
+        simulate: bool = False,
+        engine: bool = False,
+        progress_secs: float = 1.0,
+        trace: Optional[Path] = None
+) -> None:
+    """
+    Run a schedule without a GUI, reporting progress as it goes.
+
+    Args:
+
+        schedule: A schedule written by Schedule.write.
+
+        output: A directory for stimuli.csv (the StimulusTimeLog) and timing.json (a timing summary).
+
+        layout: A JSON file of BoardLayout arguments; required unless simulating.
+
+        port: The Arduino's serial port.
+
+        audio_dir: A directory of sound files named by AudioInfo name, for schedules with audio.
+
+        simulate: Use an in-process board and audio device instead of hardware.
+
+        engine: Play audio through one persistent AudioOutputEngine stream, queued up front. Not available with --simulate.
+
+        progress_secs: Seconds between progress lines.
+
+        trace: Record spans, counters, and histograms, and write them to this file as Chrome trace-event JSON.
+    """
+    from sauronlib.audio_handler import GlobalAudio
+    from sauronlib.audio_output import AudioOutputEngine
+    from sauronlib.board import PymataBoard
+    from sauronlib.clock import global_clock
+    from sauronlib.scheduling.schedule import Schedule
+    from sauronlib.scheduling.schedule_runner import ScheduleRunner
+    from sauronlib.simulation import SimulatedBoard, SimulatedGlobalAudio
+    from sauronlib.stimulus import StimulusType
+    from sauronlib.tracing import tracer
+    if simulate and engine:
+        typer.echo("--engine plays on a real audio device, so it can't be used with --simulate", err=True)
+        raise typer.Exit(2)
+    if trace is not None:
+        tracer.enable()
+    sounds = None
+    if audio_dir is not None:
+        import pydub
+        sounds = {p.stem: pydub.AudioSegment.from_file(str(p)) for p in audio_dir.iterdir() if p.is_file()}
+    sched = Schedule.read(str(schedule), sounds)
+    if simulate:
+        stimuli = [s for _, s in sched.stimulus_list if not isinstance(s, str)]
+        board = SimulatedBoard.for_stimuli(
+            sorted({s.name for s in stimuli if s.stim_type is StimulusType.DIGITAL}),
+            sorted({s.name for s in stimuli if s.stim_type is StimulusType.ANALOG})
+        )
+        audio = SimulatedGlobalAudio()
+    elif layout is None:
+        typer.echo("--layout is required unless --simulate is set", err=True)
+        raise typer.Exit(2)
+    else:
+        board = PymataBoard(_read_layout(layout), connection_port=port)
+        audio = GlobalAudio(AudioOutputEngine() if engine else None)
+    output.mkdir(parents=True, exist_ok=True)
+    # one anchor for everything this run records, including the board and audio once opened
+    global_clock.restart()
+    runner = ScheduleRunner(sched)
+    stop = threading.Event()
+    reporter = threading.Thread(target=_report_progress, args=(runner, stop, progress_secs), daemon=True)
+    with board, audio:
+        reporter.start()
+        try:
+            log = runner.run(
+                board.write, lambda s: audio.play(s.audio_obj), audio.engine if engine else None,
+                log_path=str(output / "stimuli.csv"), restart_clock=False
+            )
+        finally:
+            stop.set()
+            reporter.join()
+    lateness = runner.lateness
+    summary = {
+        "schedule": str(schedule),
+        "simulated": simulate,
+        "n_events": runner.n_events,
+        "n_applied": runner.n_applied,
+        "planned_ms": sched.total_ms,
+        "actual_ms": (log.end_ns - log.start_ns) / 1e6,
+        "overrun_ms": (log.end_ns - log.start_ns) / 1e6 - sched.total_ms
+    }
+    if lateness.count > 0:
+        summary.update({
+            "lateness_mean_ms": lateness.mean() / 1e6,
+            "lateness_p50_ms": lateness.percentile(50) / 1e6,
+            "lateness_p99_ms": lateness.percentile(99) / 1e6,
+            "lateness_max_ms": lateness.max / 1e6
+        })
+    (output / "timing.json").write_text(json.dumps(summary, indent=2), encoding="utf8")
+    typer.echo(show_table(["key", "value"], [[k, _fmt(v)] for k, v in summary.items()], title="timing"))
+    if trace is not None:
+        tracer.write_chrome(str(trace))
+        typer.echo("Wrote {} trace events to {}".format(len(tracer.events), trace))
+
+
 if __name__ == "__main__":
     cli()
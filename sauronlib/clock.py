@@ -0,0 +1,58 @@
+import datetime
+import time
+from typing import Optional
+
+
+class RunClock:
+	"""A shared time base for everything recorded during a run.
+	Captures one (wall-clock, monotonic) anchor pair in restart(); recorders then call now_ns(),
+	which is a cheap read of time.monotonic_ns(), and convert to wall time only when they write.
+	Because every stream converts with the same anchor, timestamps from stimuli, sensors, and cameras
+	are directly comparable and never jump with NTP or daylight-saving changes during a run.
+	Example usage:
+		clock = RunClock()
+		t = clock.now_ns()
+		...
+		f.write(clock.stamp(t))
+	"""
+	def __init__(self) -> None:
+		self.wall_anchor_ns = None  # type: Optional[int]
+		self.monotonic_anchor_ns = None  # type: Optional[int]
+		self.restart()
+
+	def restart(self) -> None:
+		"""Captures a new anchor. Call this once at the start of each run, before anything records."""
+		self.wall_anchor_ns = time.time_ns()
+		self.monotonic_anchor_ns = time.monotonic_ns()
+		self._wall_anchor = datetime.datetime.fromtimestamp(self.wall_anchor_ns // 10**9) \
+			+ datetime.timedelta(microseconds=self.wall_anchor_ns % 10**9 // 1000)
+
+	@staticmethod
+	def now_ns() -> int:
+		return time.monotonic_ns()
+
+	def elapsed_ns(self, monotonic_ns: int) -> int:
+		"""Nanoseconds since the anchor."""
+		return monotonic_ns - self.monotonic_anchor_ns
+
+	def to_wall_ns(self, monotonic_ns):
+		"""Converts to nanoseconds since the Unix epoch. Works on ints and on NumPy int64 arrays."""
+		return monotonic_ns - self.monotonic_anchor_ns + self.wall_anchor_ns
+
+	def to_datetime(self, monotonic_ns: int) -> datetime.datetime:
+		"""Converts to a naive local datetime, like datetime.now() would have returned at that instant."""
+		return self._wall_anchor + datetime.timedelta(microseconds=(monotonic_ns - self.monotonic_anchor_ns) // 1000)
+
+	def stamp(self, monotonic_ns: int) -> str:
+		"""Converts to an ISO 8601 string with microseconds, as written to log files."""
+		return self.to_datetime(monotonic_ns).isoformat(timespec='microseconds')
+
+	def __repr__(self) -> str:
+		return "RunClock(anchor={})".format(self._wall_anchor.isoformat(timespec='microseconds'))
+	def __str__(self): return repr(self)
+
+
+global_clock = RunClock()
+
+
+__all__ = ['RunClock', 'global_clock']
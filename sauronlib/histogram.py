@@ -0,0 +1,92 @@
+import math
+from array import array
+from typing import Dict, Optional
+
+
+class Histogram:
+	"""Counts of non-negative integers (such as nanoseconds) in log-spaced buckets, in memory that doesn't grow with the count.
+	Values below 64 have a bucket each; above that, each power of 2 is split into 64 buckets,
+	so percentiles are within 1/64 (about 1.6%) of the true value. Values above max_value share the last bucket.
+	The count, mean, min, max, and most recent value are kept exactly; min and max are inf and -inf while empty.
+	Negative values are counted in the first bucket.
+	Example usage:
+		lateness = Histogram()
+		lateness.add(applied_ns - scheduled_ns)
+		print(lateness.percentile(99), lateness.max)
+	"""
+	_sub_bits = 6
+	_sub_count = 1 << _sub_bits
+
+	def __init__(self, max_value: int = 1 << 40) -> None:
+		"""
+		:param max_value: The largest value with its own bucket; the default is about 18 minutes in nanoseconds
+		"""
+		self.max_value = max_value
+		self._counts = array('q', [0]) * (self._index(max_value) + 1)
+		self.count = 0
+		self.total = 0
+		self.min = math.inf
+		self.max = -math.inf
+		self.last = None  # type: Optional[int]
+
+	def add(self, value: int) -> None:
+		self.count += 1
+		self.total += value
+		self.last = value
+		if value < self.min: self.min = value
+		if value > self.max: self.max = value
+		# _index, inlined for speed
+		if value < 64:
+			self._counts[value if value > 0 else 0] += 1
+		else:
+			if value > self.max_value: value = self.max_value
+			shift = value.bit_length() - 7
+			self._counts[(shift << 6) + (value >> shift)] += 1
+
+	def mean(self) -> float:
+		return self.total / self.count if self.count > 0 else math.nan
+
+	def percentile(self, p: float) -> float:
+		"""The value at percentile p (0–100), as the middle of its bucket, clamped to [min, max]. nan if empty."""
+		if self.count == 0:
+			return math.nan
+		rank = max(1, math.ceil(p / 100 * self.count))
+		if rank >= self.count:
+			return float(self.max)
+		seen = 0
+		for index, n in enumerate(self._counts):
+			seen += n
+			if seen >= rank:
+				return float(min(max(self._value(index), self.min), self.max))
+		return float(self.max)
+
+	def summary(self, scale: float = 1) -> Dict[str, float]:
+		"""The count, mean, 50th, 90th, and 99th percentiles, and max, with values divided by scale (1000 for ns to µs)."""
+		return {
+			'n': self.count,
+			'mean': self.mean() / scale,
+			'p50': self.percentile(50) / scale,
+			'p90': self.percentile(90) / scale,
+			'p99': self.percentile(99) / scale,
+			'max': (self.max if self.count > 0 else math.nan) / scale
+		}
+
+	def _index(self, value: int) -> int:
+		if value < self._sub_count:
+			return value
+		shift = value.bit_length() - self._sub_bits - 1
+		return (shift << self._sub_bits) + (value >> shift)
+
+	def _value(self, index: int) -> float:
+		if index < self._sub_count:
+			return index
+		shift = index // self._sub_count - 1
+		lower = (index % self._sub_count + self._sub_count) << shift
+		return lower + ((1 << shift) - 1) / 2
+
+	def __repr__(self) -> str:
+		return "Histogram(n={}, mean={}, max={})".format(self.count, self.mean(), self.max if self.count > 0 else None)
+	def __str__(self): return repr(self)
+
+
+__all__ = ['Histogram']
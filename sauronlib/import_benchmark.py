@@ -0,0 +1,82 @@
+"""
+Measures how long sauronlib modules take to import, and checks that they stay within a budget.
+Each import runs in a fresh interpreter, so nothing is cached from earlier imports.
+Run it directly (python -m sauronlib.import_benchmark) to print the times and exit nonzero if over budget.
+"""
+
+import json
+import subprocess
+import sys
+from statistics import median
+from typing import Any, Dict, List, Sequence
+
+# modules that must not be loaded merely by importing sauronlib; they're imported when first used
+deferred_modules = (
+	'pandas', 'scipy', 'cv2', 'pydub', 'simpleaudio', 'pyaudio', 'pymata_aio', 'hipsterplot',
+	'terminaltables', 'importlib_metadata', 'typer'
+)
+
+default_modules = (
+	'sauronlib',
+	'sauronlib.scheduling.schedule_runner',
+	'sauronlib.audio_handler',
+	'sauronlib.board',
+	'sauronlib.sensors.microphone',
+	'sauronlib.sensors.arduino_sensor',
+	'sauronlib.camera.webcam',
+	'sauronlib.alignment'
+)
+
+_child = """
+import json, sys, time
+t0 = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t0
+print(json.dumps({{'ms': elapsed * 1000, 'deferred': [m for m in {deferred!r} if m in sys.modules]}}))
+"""
+
+
+class ImportBudgetExceededError(Exception):
+	def description(self):
+		return "Importing sauronlib took too long or loaded modules that should be deferred."
+
+
+def measure_import(module: str, n_runs: int = 5) -> Dict[str, Any]:
+	"""Imports module in n_runs fresh interpreters and returns the median time and any deferred modules it loaded."""
+	times, loaded = [], set()
+	for _ in range(n_runs):
+		out = subprocess.run(
+			[sys.executable, '-c', _child.format(module=module, deferred=deferred_modules)],
+			stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True, check=True
+		).stdout
+		result = json.loads(out.strip().splitlines()[-1])
+		times.append(result['ms'])
+		loaded.update(result['deferred'])
+	return {'module': module, 'median_ms': median(times), 'max_ms': max(times), 'deferred_loaded': sorted(loaded)}
+
+
+def check_import_budget(modules: Sequence[str] = default_modules, budget_ms: float = 250, n_runs: int = 5) -> List[Dict[str, Any]]:
+	"""Measures each module, and raises ImportBudgetExceededError if any takes longer than budget_ms (median)
+	or loads a module in deferred_modules.
+	"""
+	results = [measure_import(module, n_runs) for module in modules]
+	failures = [
+		'{} took {}ms'.format(r['module'], round(r['median_ms'], 1)) if r['median_ms'] > budget_ms
+		else '{} loaded {}'.format(r['module'], ', '.join(r['deferred_loaded']))
+		for r in results if r['median_ms'] > budget_ms or len(r['deferred_loaded']) > 0
+	]
+	if len(failures) > 0:
+		raise ImportBudgetExceededError("Over the {}ms import budget: {}".format(budget_ms, '; '.join(failures)))
+	return results
+
+
+__all__ = ['measure_import', 'check_import_budget', 'ImportBudgetExceededError', 'deferred_modules', 'default_modules']
+
+
+if __name__ == '__main__':
+	try:
+		for r in check_import_budget():
+			print('{:<45}{:>8.1f}ms'.format(r['module'], r['median_ms']))
+	except ImportBudgetExceededError as e:
+		print(e)
+		sys.exit(1)
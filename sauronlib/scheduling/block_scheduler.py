@@ -1,13 +1,15 @@
-import logging, typing
-from typing import List, Optional, Union, Any
+import heapq, itertools, logging, typing
+from typing import Dict, Iterable, Iterator, List, Optional, Union, Any
 
-import pydub
 import numpy as np
 
 from sauronlib.stimulus import StimulusType, Stimulus
 from sauronlib.scheduling.schedule import Schedule
 from sauronlib.audio_info import AudioInfo
 
+# a time in ms and either a Stimulus or the name of a block starting then
+Event = typing.Tuple[int, Union[str, Stimulus]]
+
 
 class Block:
 	def __init__(self, name: str, start: int, frames: np.array, audio_always_native_length: bool = False):
@@ -22,74 +24,155 @@ class Block:
 
 
 class BlockScheduler:
+	"""Builds a Schedule from each stimulus's blocks.
+	Each stimulus's events are kept as a separate track, already in time order,
+	and build() merges the tracks with a k-way heap merge instead of sorting everything.
+	A track can be replaced or removed without regenerating the others, and build() can be called again afterward.
+	"""
 
 	def __init__(self, total_ms: int):
 		self.total_ms = total_ms
-		self._chained = []  # type: List[typing.Tuple[int, Union[str, Stimulus]]]
-		self._blocks = []  # type: List[Block]
+		self._tracks = {}  # type: Dict[str, List[Event]]
+		self._track_blocks = {}  # type: Dict[str, List[Block]]
 
 	def __repr__(self):
-		return "BlockScheduler({}, total={})".format(self._blocks, self.total_ms)
+		return "BlockScheduler({}, total={})".format(
+			', '.join('{}: {} blocks'.format(name, len(blocks)) for name, blocks in self._track_blocks.items()), self.total_ms
+		)
 
 	def __str__(self): return repr(self)
 
 	def build(self) -> Schedule:
-		x = self._chained.copy()
-		self._chained = None
-		return Schedule(x, [(b.start, b.name) for b in self._blocks], self.total_ms)
-
-	def append(self, stimulus_name: str, stimulus_key: Any, audio_obj: Optional[pydub.AudioSegment], blocks: List[Block]):
-		#
-		self._blocks.extend(blocks)
-		#
-		prev_value = 0
-		prev_index = 0
-		index = None
-		#
-		for block in blocks:
-			# start of assay / block
-			self._chained.append((
-				block.start, block.name
-			))
-			# so that we can track the length, write the previous change when the next change is encountered
-			# also, write the final change at the end
-			logging.debug("Appending block {} of length {} (audio_always_native_length={})".format(block.name, len(block.frames), block.audio_always_native_length))
-			#
-			if index is not None and block.start != index + 1 and audio_obj is None:
-				self._append(index, 0, None, block.audio_always_native_length, stimulus_name, stimulus_key, audio_obj)
-				prev_value = 0
-			#
-			for mini_index, value in enumerate(block.frames):
-				index = block.start + mini_index
-				if value != prev_value:
-					if prev_index > 0:
-						self._append(prev_index, prev_value, index - prev_index, block.audio_always_native_length, stimulus_name, audio_obj)
-					prev_index = index
-					prev_value = value
-			#
-			if index is not None:
-				self._append(prev_index, prev_value, index - prev_index, block.audio_always_native_length, stimulus_name, audio_obj)
-		# we want a final stop at the end of the block
-		if index is not None and audio_obj is None:
-			self._append(index, 0, None, False, stimulus_name, stimulus_key, audio_obj)  # chirp=True or chirp=False should be fine
-		return self
+		"""Merges the tracks in time order. Events at the same time come in the order their tracks were first appended."""
+		merged = list(heapq.merge(*self._tracks.values(), key=lambda event: event[0]))
+		blocks = [b for track_blocks in self._track_blocks.values() for b in track_blocks]
+		return Schedule(merged, [(b.start, b.name) for b in blocks], self.total_ms, in_order=True)
 
-	def _append(self, ms: int, val: int, time_since: Optional[int], chirp: bool, stimulus_name: str, stimulus_key: Any, audio_obj: Optional[AudioInfo]) -> None:
-		"""
-		:param ms: The current ms
-		:param val: The value to change to
-		:param time_since: The ms since the last change
-		:param chirp: Treat all audio as native-length regardless of how long the stimulus_frames are applied; for legacy assays
+	def append(
+			self, stimulus_name: str, stimulus_key: Any, audio_obj: Optional[AudioInfo], blocks: List[Block],
+			stim_type: Optional[StimulusType] = None
+	):
+		"""Adds a stimulus's blocks. If stimulus_name already has a track, the new events are merged into it.
+		:param stim_type: Defaults to AUDIO if audio_obj is set and DIGITAL otherwise
 		"""
-		# set length to None (native length) for legacy assays because they don't use the definition audio length==1 <==> play exact length
-		duration_ms = None if chirp else time_since
-		if duration_ms == 1: duration_ms = None
-		audio_obj = AudioInfo.build(audio_obj.name, audio_obj.wave_obj, duration_ms, val) if (audio_obj is not None) else None
-		built_stim = Stimulus(stimulus_name, stimulus_key, val, audio_obj, StimulusType.AUDIO)
-		if built_stim.stim_type is not StimulusType.AUDIO or built_stim.byte_intensity > 0:
-			self._chained.append((
-				ms, built_stim
-			))
-
-
-__all__ = ['Block', 'BlockScheduler']
\ No newline at end of file
+		events = list(track_events(stimulus_name, stimulus_key, audio_obj, blocks, stim_type))
+		if stimulus_name in self._tracks:
+			events = list(heapq.merge(self._tracks[stimulus_name], events, key=lambda event: event[0]))
+		self._tracks[stimulus_name] = events
+		self._track_blocks.setdefault(stimulus_name, []).extend(blocks)
+		return self
+
+	def replace(
+			self, stimulus_name: str, stimulus_key: Any, audio_obj: Optional[AudioInfo], blocks: List[Block],
+			stim_type: Optional[StimulusType] = None
+	):
+		"""Replaces the track for stimulus_name (keeping its place in the order of tracks), or adds it if there is none."""
+		self._tracks[stimulus_name] = list(track_events(stimulus_name, stimulus_key, audio_obj, blocks, stim_type))
+		self._track_blocks[stimulus_name] = list(blocks)
+		return self
+
+	def remove(self, stimulus_name: str):
+		del self._tracks[stimulus_name]
+		del self._track_blocks[stimulus_name]
+		return self
+
+	def track_names(self) -> List[str]:
+		return list(self._tracks.keys())
+
+
+def track_events(
+		stimulus_name: str, stimulus_key: Any, audio_obj: Optional[AudioInfo], blocks: Iterable[Block],
+		stim_type: Optional[StimulusType] = None, chunk_ms: int = 10000
+) -> Iterator[Event]:
+	"""Generates one stimulus's events from its blocks, in time order, as they're needed.
+	Each block yields its start (as a name) and a Stimulus for each change in value.
+	The last value is stopped at a gap between blocks and at the end; adjacent blocks continue the same value.
+	Changes are found chunk_ms frames at a time, so memory doesn't depend on the length of a block,
+	and each is yielded as soon as it's known, so the work between two events is at most one chunk's scan.
+	Digital and analog changes are known when found; audio changes only at the next change,
+	since the audio is rendered at the length it's applied.
+	:param blocks: In order of start, and not overlapping; can be a generator
+	:param stim_type: Defaults to AUDIO if audio_obj is set and DIGITAL otherwise
+	"""
+	if stim_type is None:
+		stim_type = StimulusType.DIGITAL if audio_obj is None else StimulusType.AUDIO
+	deferred = audio_obj is not None
+	# a deferred change is only complete (its duration known) at the next change, so events can come out of order;
+	# they wait here until nothing earlier can follow
+	pending = []  # type: List[typing.Tuple[int, int, Union[str, Stimulus]]]
+	seq = itertools.count()
+
+	def add(ms: int, val, time_since: Optional[int], chirp: bool) -> None:
+		stimulus = _stimulus(val, time_since, chirp, stimulus_name, stimulus_key, audio_obj, stim_type)
+		if stimulus is not None:
+			heapq.heappush(pending, (ms, next(seq), stimulus))
+
+	def release(watermark: int) -> Iterator[Event]:
+		while len(pending) > 0 and pending[0][0] <= watermark:
+			ms, _, event = heapq.heappop(pending)
+			yield ms, event
+
+	prev_value = 0
+	prev_index = None
+	index = None
+	chirp = False
+	for block in blocks:
+		chirp = block.audio_always_native_length
+		logging.debug("Appending block {} of length {} (audio_always_native_length={})".format(block.name, len(block.frames), chirp))
+		# write the final change at a gap between blocks
+		if index is not None and block.start != index + 1:
+			if deferred and prev_index is not None:
+				add(prev_index, prev_value, index - prev_index, chirp)
+			if audio_obj is None:
+				add(index, 0, None, chirp)
+			prev_value = 0
+			prev_index = None
+		# start of assay / block
+		heapq.heappush(pending, (block.start, next(seq), block.name))
+		for offset in range(0, len(block.frames), chunk_ms):
+			# converted a chunk at a time, so frames given as a list aren't copied all at once
+			chunk = np.asarray(block.frames[offset:offset + chunk_ms])
+			changes = np.flatnonzero(chunk != np.concatenate(([prev_value], chunk[:-1])))
+			for i in changes:
+				change_index = block.start + offset + int(i)
+				if not deferred:
+					add(change_index, chunk[i], None, chirp)
+				elif prev_index is not None:
+					# so that we can track the length, write the previous change when the next change is encountered
+					add(prev_index, prev_value, change_index - prev_index, chirp)
+				prev_index = change_index
+				prev_value = chunk[i]
+				yield from release(prev_index)
+			index = block.start + offset + len(chunk) - 1
+			yield from release(prev_index if deferred and prev_index is not None else index)
+	if deferred and prev_index is not None:
+		add(prev_index, prev_value, index - prev_index, chirp)
+	# we want a final stop at the end of the block
+	if index is not None and audio_obj is None:
+		add(index, 0, None, False)  # chirp=True or chirp=False should be fine
+	while len(pending) > 0:
+		ms, _, event = heapq.heappop(pending)
+		yield ms, event
+
+
+def _stimulus(
+		val, time_since: Optional[int], chirp: bool,
+		stimulus_name: str, stimulus_key: Any, audio_obj: Optional[AudioInfo], stim_type: StimulusType
+) -> Optional[Stimulus]:
+	"""
+	:param val: The value to change to
+	:param time_since: The ms since the last change
+	:param chirp: Treat all audio as native-length regardless of how long the stimulus_frames are applied; for legacy assays
+	:return: None for silent audio, which doesn't need to be played
+	"""
+	# set length to None (native length) for legacy assays because they don't use the definition audio length==1 <==> play exact length
+	duration_ms = None if chirp else time_since
+	if duration_ms == 1: duration_ms = None
+	audio_obj = audio_obj.derive(duration_ms, val) if (audio_obj is not None) else None
+	built_stim = Stimulus(stimulus_key, stimulus_name, val, audio_obj, stim_type)
+	if built_stim.stim_type is not StimulusType.AUDIO or built_stim.byte_intensity > 0:
+		return built_stim
+	return None
+
+
+__all__ = ['Block', 'BlockScheduler', 'track_events', 'Event']
\ No newline at end of file
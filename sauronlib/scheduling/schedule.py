@@ -1,22 +1,103 @@
-from typing import List, Union
+import json
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Union
 import typing
 from datetime import timedelta
 
 import numpy as np
 
 from sauronlib import logger, show_table
+from sauronlib.audio_info import AudioInfo
 from sauronlib.stimulus import Stimulus, StimulusType
 
+def _plain(value):
+	"""Converts NumPy scalars (such as values from Block.frames) to Python numbers for JSON."""
+	return value.item() if isinstance(value, np.generic) else value
+
+
 class Schedule:
 
-	def __init__(self, stimulus_list: List[typing.Tuple[int, Union[str, Stimulus]]], assay_positions: List[typing.Tuple[int, str]], total_ms: int):
+	def __init__(
+			self, stimulus_list: List[typing.Tuple[int, Union[str, Stimulus]]], assay_positions: List[typing.Tuple[int, str]], total_ms: int,
+			in_order: bool = False
+	):
+		"""
+		:param in_order: stimulus_list is already sorted by time, so events() doesn't need to sort it
+		"""
 		self.stimulus_list = stimulus_list
 		self.assay_positions = assay_positions
 		self.total_ms = total_ms
+		self.in_order = in_order
 
 	def n_events(self) -> int:
 		return len([1 for t in self.stimulus_list if isinstance(t[1], Stimulus)])
 
+	def events(self) -> Iterator[typing.Tuple[int, Union[str, Stimulus]]]:
+		"""The events in time order. Events at the same time keep their order in stimulus_list."""
+		if self.in_order:
+			return iter(self.stimulus_list)
+		return iter(sorted(self.stimulus_list, key=lambda x: x[0]))
+
+	def audio_nbytes(self) -> int:
+		"""The memory needed for this schedule's audio, counting each distinct rendered buffer once.
+		Buffers that aren't rendered yet are estimated without rendering them.
+		"""
+		distinct = {}
+		for _, stimulus in self.stimulus_list:
+			if isinstance(stimulus, Stimulus) and stimulus.audio_obj is not None:
+				info = stimulus.audio_obj
+				distinct.setdefault(info.render_key if info.render_key is not None else id(info), info)
+		return sum(info.nbytes() for info in distinct.values())
+
+	def write(self, path: str) -> None:
+		"""Writes this schedule as JSON. Audio is stored by name, length, and volume, so read() needs the sounds.
+		Stimulus keys are written as their id if they have one.
+		"""
+		events = []  # type: List[Dict[str, Any]]
+		for ms, stimulus in self.stimulus_list:
+			if isinstance(stimulus, str):
+				events.append({'ms': _plain(ms), 'marker': stimulus})
+				continue
+			event = {
+				'ms': _plain(ms), 'key': _plain(getattr(stimulus.key, 'id', stimulus.key)), 'name': stimulus.name,
+				'type': stimulus.stim_type.name, 'value': _plain(stimulus.byte_intensity)
+			}
+			if stimulus.audio_obj is not None:
+				event['audio'] = {'name': stimulus.audio_obj.name, 'length': _plain(stimulus.audio_obj.duration_ms)}
+			events.append(event)
+		with open(path, 'w', encoding='utf8') as f:
+			json.dump({
+				'total_ms': _plain(self.total_ms),
+				'assay_positions': [(_plain(start), name) for start, name in self.assay_positions],
+				'events': events
+			}, f)
+
+	@staticmethod
+	def read(path: str, sounds: Optional[Mapping[str, Any]] = None) -> 'Schedule':
+		"""Reads a schedule written by write().
+		:param sounds: pydub.AudioSegments by AudioInfo name; required if the schedule has audio
+		"""
+		with open(path, encoding='utf8') as f:
+			data = json.load(f)
+		stimulus_list = []  # type: List[typing.Tuple[int, Union[str, Stimulus]]]
+		for event in data['events']:
+			if 'marker' in event:
+				stimulus_list.append((event['ms'], event['marker']))
+				continue
+			audio_obj = None
+			if 'audio' in event:
+				name = event['audio']['name']
+				if sounds is None or name not in sounds:
+					raise KeyError("The schedule plays audio {} but it wasn't provided".format(name))
+				audio_obj = AudioInfo.build(name, sounds[name], event['audio']['length'], int(event['value']))
+			stimulus_list.append((
+				event['ms'], Stimulus(event['key'], event['name'], event['value'], audio_obj, StimulusType[event['type']])
+			))
+		assay_positions = [(start, name) for start, name in data['assay_positions']]
+		return Schedule(stimulus_list, assay_positions, data['total_ms'])
+
+	def audio_names(self) -> List[str]:
+		return sorted({s.audio_obj.name for _, s in self.stimulus_list if not isinstance(s, str) and s.audio_obj is not None})
+
 	def pretty_print_list(self) -> str:
 		def tabify(index, stimulus) -> str:
 			# TODO stimulus.key.name
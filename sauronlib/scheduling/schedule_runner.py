@@ -1,76 +1,176 @@
-import datetime
-import typing
-from time import monotonic
-from typing import Optional, List, Tuple, Union, Iterator, Callable
+import collections, math, typing
+from typing import Optional, List, Tuple, Union, Iterator, Callable, Deque
 
-from asyncio import LifoQueue
+from asyncio import QueueEmpty
 
-from sauronx.core.sx_logger import logger
+from sauronlib import logger
+from sauronlib.audio_output import AudioOutputEngine
+from sauronlib.clock import RunClock, global_clock
+from sauronlib.histogram import Histogram
+from sauronlib.scheduling.block_scheduler import Event
 from sauronlib.scheduling.schedule import *
 from sauronlib.scheduling.stimulus_time_log import *
+from sauronlib.scheduling.streaming_schedule import StreamingSchedule
 from sauronlib.stimulus import *
+from sauronlib.tracing import tracer
 
 
 class ScheduleRunner:
 	"""
-	This class is itself a queue: It will drop elements out of Schedule.queue as they are taken.
+	This class is itself a queue: It takes events from the schedule, in time order, as they are due.
+	The schedule can be a Schedule or a StreamingSchedule; either way, events are drawn from one call to schedule.events()
+	as they're needed during run(), so a StreamingSchedule starts immediately and is never held in memory.
+	They're drawn audio_lead_ms ahead of when they're due, and their audio rendered (and queued on an audio engine) then.
+	While run() executes, n_applied and lateness (a Histogram of how many nanoseconds after its scheduled time
+	each stimulus was applied) are updated live, so another thread can report progress.
+	Neither grows with the number of stimuli, and neither does the StimulusTimeLog if run() is given a log_path.
 	"""
-	def __init__(self, schedule: Schedule) -> None:
-		"""Stimulus_list is in MILLISECONDS."""
-		self.stimulus_list = schedule.stimulus_list
-		self.queue = LifoQueue()
-		self.time_range = range(0, len(self.stimulus_list))
+	def __init__(
+			self, schedule: Union[Schedule, StreamingSchedule], clock: Optional[RunClock] = None,
+			audio_lead_ms: Optional[int] = None
+	) -> None:
+		"""Stimulus_list is in MILLISECONDS.
+		:param audio_lead_ms: How far ahead of time to render audio, and to queue it on an audio engine.
+		                      Defaults to all of it before starting for a Schedule, and 10 seconds ahead for a StreamingSchedule.
+		"""
+		self.clock = global_clock if clock is None else clock
+		self.schedule = schedule
 		self.n_ms_total = schedule.total_ms
-		# sorting on tuples apparently sorts by the first index first
-		for index_ms, stimulus in sorted(schedule.stimulus_list, key=lambda x: x[0], reverse=True):
-			self.queue.put_nowait((index_ms / 1000, stimulus))
+		self.streaming = isinstance(schedule, StreamingSchedule)
+		self.audio_lead_ms = (10000 if self.streaming else None) if audio_lead_ms is None else audio_lead_ms
+		# counting a StreamingSchedule's events would mean generating all of them
+		self.n_events = None if self.streaming else schedule.n_events()  # type: Optional[int]
+		self.n_applied = 0
+		self.started_ns = None  # type: Optional[int]
+		self.lateness = Histogram()
+		self._events = schedule.events()
+		if not self.streaming:
+			logger.info("Battery holds {}MB of audio".format(round(schedule.audio_nbytes() / 1e6, 2)))
 
-	def get_nowait(self) -> typing.Tuple[int, Stimulus]:
-		return self.queue.get_nowait()
+	def get_nowait(self) -> typing.Tuple[int, Union[str, Stimulus]]:
+		"""Takes the next event, with its time in nanoseconds. Raises QueueEmpty after the last."""
+		try:
+			index_ms, stimulus = next(self._events)
+		except StopIteration:
+			raise QueueEmpty() from None
+		return index_ms * 1000000, stimulus
 
 	def run(
 			self,
 			write_callback: Callable[[Stimulus], None],
-			audio_callback: Callable[[Stimulus], None]
+			audio_callback: Callable[[Stimulus], None],
+			audio_engine: Optional[AudioOutputEngine] = None,
+			log_path: Optional[str] = None,
+			max_log_records: Optional[int] = None,
+			restart_clock: bool = True
 	) -> StimulusTimeLog:
 		"""Runs the stimulus schedule immediately.
 		This runs the scheduled stimuli and blocks. Does not sleep.
 		:param write_callback: Example: board.write
 		:param audio_callback: Example: global_audio.play
+		:param audio_engine: If set (and running), audio is queued on it ahead of time (see audio_lead_ms),
+		                     each at the exact sample position of its scheduled time, and audio_callback is not called.
+		                     Audio scheduled within the engine's output latency of the start may play late.
+		:param log_path: Write the StimulusTimeLog to this file as stimuli are applied, instead of only keeping it in memory
+		:param max_log_records: How many of the most recent records the returned StimulusTimeLog keeps in memory.
+		                        Defaults to 1000 with a log_path, and to all of them otherwise
+		:param restart_clock: Capture a new clock anchor for this run (see RunClock.restart).
+		                      Pass False if sensors or cameras sharing the clock started recording before this call
+		If sauronlib.tracing.tracer is enabled when this is called, each dispatch is recorded as a span,
+		and lateness in the 'runner.lateness_us' histogram.
 		"""
 
 		logger.info("Battery will run for {}ms. Starting!".format(self.n_ms_total))
-		stimulus_time_log = StimulusTimeLog()
+		if restart_clock:
+			self.clock.restart()
+		now_ns = self.clock.now_ns
+		# events taken from the schedule but not yet due, with their audio rendered
+		ahead = collections.deque()  # type: Deque[Event]
+		lead_ms = math.inf if self.audio_lead_ms is None else self.audio_lead_ms
+		# generate and render what we can before starting, so the work doesn't make stimuli late
+		more = self._take_ahead(ahead, lead_ms, None, None)
+		if log_path is not None and max_log_records is None:
+			max_log_records = 1000
+		if self.streaming and max_log_records is None:
+			logger.warning("Keeping every stimulus time of a StreamingSchedule in memory; pass log_path to write them as they go")
+		stimulus_time_log = StimulusTimeLog(clock=self.clock, path=log_path, max_records=max_log_records)
 		stimulus_time_log.start()  # This is totally fine: It happens at time 0 in the stimulus_list AND the full battery.
 
-		t0 = monotonic()
-		for _ in self.time_range:
-			scheduled_seconds, stimulus = self.get_nowait()
-			while monotonic() - t0 < scheduled_seconds: pass
+		t0 = stimulus_time_log.start_ns
+		self.started_ns = t0
+		lateness = self.lateness
+		traced = tracer.enabled
+		start_sample = None
+		if audio_engine is not None:
+			start_sample = audio_engine.sample_at(t0)
+			for event in ahead:
+				self._queue_audio(audio_engine, start_sample, event)
+		try:
+			while len(ahead) > 0:
+				index_ms, stimulus = ahead.popleft()
+				scheduled_ns = index_ms * 1000000
+				if more and (len(ahead) == 0 or ahead[-1][0] <= index_ms + lead_ms):
+					more = self._take_ahead(ahead, index_ms + lead_ms, audio_engine, start_sample)
+				while now_ns() - t0 < scheduled_ns: pass
+				if traced:
+					dispatch_ns = now_ns()
 
-			# Use self._board.digital_write and analog_write because we don't want to perform checks (for performance)
-			if stimulus is StimulusType.MARKER:
-				logger.info("Starting: {}".format(stimulus.name))
-				continue
-			elif stimulus.is_digital() or stimulus.is_analog():
-				write_callback(stimulus)
-			elif stimulus.is_audio():
-				audio_callback(stimulus)  # volume is handled internally
-			else:
-				raise ValueError("Invalid stimulus type %s!" % stimulus.stim_type)
+				# Use self._board.digital_write and analog_write because we don't want to perform checks (for performance)
+				if isinstance(stimulus, str):  # the start of a block
+					logger.info("Starting: {}".format(stimulus))
+					if traced:
+						tracer.instant(stimulus, 'block')
+					continue
+				elif stimulus.is_digital() or stimulus.is_analog():
+					write_callback(stimulus)
+				elif stimulus.is_audio():
+					if audio_engine is None:
+						audio_callback(stimulus)  # volume is handled internally
+				else:
+					raise ValueError("Invalid stimulus type %s!" % stimulus.stim_type)
 
-			stimulus_time_log.append(StimulusTimeRecord(stimulus, datetime.datetime.now()))
+				applied_ns = now_ns()
+				stimulus_time_log.append(StimulusTimeRecord(stimulus, applied_ns))
+				lateness.add(applied_ns - t0 - scheduled_ns)
+				self.n_applied += 1
+				if traced:
+					tracer.complete('runner.dispatch', dispatch_ns, 'runner', stimulus=stimulus.name, scheduled_ms=index_ms)
+					tracer.observe('runner.lateness_us', lateness.last / 1000)
+		except BaseException as e:
+			stimulus_time_log.finish_now()  # so that a log_path file is complete up to the failure
+			raise e
 
 		# This is critical. Otherwise, the StimulusTimeLog will finish() at the time the last stimulus is applied, not the time the battery ends
-		# TODO double-check
-		#while monotonic() - t0 < self.n_ms_total / 1000: pass
-		offset_ms = datetime.timedelta(milliseconds = self.n_ms_total - monotonic() + t0)
-		if offset_ms.microseconds < 0:
-			logger.warning("Stimuli finished too late: {}ms after".format(offset_ms))
-			offset_ms = 0
-		stimulus_time_log.finish_future(datetime.datetime.now() + offset_ms)
-		return stimulus_time_log  # for trimming camera frames
+		end_ns = t0 + self.n_ms_total * 1000000
+		finished_ns = now_ns()
+		if finished_ns > end_ns:
+			logger.warning("Stimuli finished too late: {}ms after".format((finished_ns - end_ns) / 1000000))
+			end_ns = finished_ns
+		stimulus_time_log.finish_future(end_ns)
+		return stimulus_time_log  # for trimming camera frames; see sauronlib.camera.trimming
+
+	def _take_ahead(
+			self, ahead: Deque[Event], until_ms: float, engine: Optional[AudioOutputEngine], start_sample: Optional[int]
+	) -> bool:
+		"""Moves events from the schedule to the end of ahead until one is after until_ms (or ahead has one, if it was empty),
+		rendering their audio, and queuing it on engine if it's set. Returns False once the schedule has no more events.
+		"""
+		while len(ahead) == 0 or ahead[-1][0] <= until_ms:
+			event = next(self._events, None)
+			if event is None:
+				return False
+			ahead.append(event)
+			stimulus = event[1]
+			if not isinstance(stimulus, str) and stimulus.is_audio():
+				stimulus.audio_obj.samples()  # renders it if no other AudioInfo with the same key has
+				if engine is not None:
+					self._queue_audio(engine, start_sample, event)
+		return True
 
+	def _queue_audio(self, engine: AudioOutputEngine, start_sample: int, event: Event) -> None:
+		index_ms, stimulus = event
+		if not isinstance(stimulus, str) and stimulus.is_audio() and stimulus.intensity > 0:
+			engine.schedule(stimulus.audio_obj.samples(), start_sample + index_ms * engine.sample_rate // 1000)
 
 
 __all__ = ['ScheduleRunner']
@@ -1,38 +1,77 @@
-import datetime
+import datetime, shutil
+from collections import deque
 from typing import Optional, List, Tuple, Union, Iterator
 
-from sauronlib import logger, stamp
+from sauronlib import logger
+from sauronlib.clock import RunClock, global_clock
 from sauronlib.stimulus import *
 
 
 class StimulusTimeRecord:
-	def __init__(self, stimulus: Stimulus, real_timestamp: datetime.datetime) -> None:
+	"""A stimulus and the RunClock.now_ns() at which it was applied."""
+	def __init__(self, stimulus: Stimulus, monotonic_ns: int) -> None:
 		self.stimulus = stimulus
-		self.real_timestamp = real_timestamp
+		self.monotonic_ns = monotonic_ns
 
-	def delta_timestamp(self) -> datetime.datetime:
-		return StimulusTimeRecord.calc_delta(self.real_timestamp)
+	def delta_timestamp(self) -> int:
+		return StimulusTimeRecord.calc_delta(self.monotonic_ns)
 
 	@staticmethod
-	def calc_delta(real_timestamp: datetime.datetime) -> datetime.datetime:
-		return real_timestamp + datetime.timedelta(microseconds=0)
+	def calc_delta(monotonic_ns: int) -> int:
+		return monotonic_ns + 0
 
 
 class StimulusTimeLog:
-
-	def __init__(self, records: Optional[List[StimulusTimeRecord]] = None) -> None:
-		self.records = [] if records is None else records
-		self.start_time = None  # type: datetime
-		self.end_time = None  # type: datetime
+	"""The times at which stimuli were applied during a run.
+	Times are kept as monotonic nanoseconds from a RunClock and converted to wall time only in write(),
+	so they share a time base with sensors and cameras that use the same clock.
+	With a path, the log is instead written to that file as it goes: the start row at start(), each record as it's appended,
+	and the end row at finish_now() or finish_future(). Together with max_records, memory then doesn't grow with the run.
+	"""
+
+	def __init__(
+			self, records: Optional[List[StimulusTimeRecord]] = None, clock: Optional[RunClock] = None,
+			path: Optional[str] = None, max_records: Optional[int] = None
+	) -> None:
+		"""
+		:param path: A CSV file to write the log to as it goes, in the format of write()
+		:param max_records: Keep only this many of the most recent records in memory; n_records still counts all of them
+		"""
+		self.records = ([] if records is None else records) if max_records is None else deque(records or [], maxlen=max_records)
+		self.clock = global_clock if clock is None else clock
+		self.path = path
+		self.n_records = len(self.records)
+		self.start_ns = None  # type: Optional[int]
+		self.end_ns = None  # type: Optional[int]
+		self._file = None
+		if path is not None:
+			# opened now, so that start() doesn't pay for it
+			self._file = open(path, 'w')
+			self._file.write('datetime,id,intensity\n')
+
+	@property
+	def start_time(self) -> Optional[datetime.datetime]:
+		return None if self.start_ns is None else self.clock.to_datetime(self.start_ns)
+
+	@property
+	def end_time(self) -> Optional[datetime.datetime]:
+		return None if self.end_ns is None else self.clock.to_datetime(self.end_ns)
 
 	def start(self) -> None:
-		self.start_time = datetime.datetime.now()
+		self.start_ns = self.clock.now_ns()
+		if self._file is not None:
+			self._file.write('{},0,0\n'.format(self.clock.stamp(StimulusTimeRecord.calc_delta(self.start_ns))))
 
 	def finish_now(self) -> None:
-		self.end_time = datetime.datetime.now()
+		self.finish_future(self.clock.now_ns())
 
-	def finish_future(self, dt: datetime.datetime) -> None:
-		self.end_time = dt
+	def finish_future(self, monotonic_ns: int) -> None:
+		self.end_ns = monotonic_ns
+		if self._file is not None:
+			self._file.write('{},0,0'.format(self.clock.stamp(StimulusTimeRecord.calc_delta(self.end_ns))))
+			self._file.close()
+			self._file = None
+			logger.debug("Wrote {} stimulus times to {}".format(self.n_records, self.path))
 
 	def __iter__(self) -> Iterator[StimulusTimeRecord]:
 		return iter(self.records)
@@ -47,20 +86,37 @@ class StimulusTimeLog:
 
 	def append(self, record: StimulusTimeRecord) -> None:
 		self.records.append(record)
+		self.n_records += 1
+		if self._file is not None:
+			self._file.write(self._row(record))
 
 	def write(self, log_file: str) -> None:
+		"""Writes every record to log_file. For a log with a path, copies the finished file."""
+		if self.path is not None:
+			if self._file is not None:
+				raise ValueError("The stimulus time log at {} is not finished".format(self.path))
+			if log_file != self.path:
+				shutil.copyfile(self.path, log_file)
+			return
+		if self.n_records > len(self.records):
+			raise ValueError("Only the last {} of {} stimulus times were kept".format(len(self.records), self.n_records))
 		logger.debug("Writing stimulus times.")
+		stamp = self.clock.stamp
 		with open(log_file, 'w') as file:
 			file.write('datetime,id,intensity\n')
-			start_stamp = stamp(StimulusTimeRecord.calc_delta(self.start_time))
+			start_stamp = stamp(StimulusTimeRecord.calc_delta(self.start_ns))
 			file.write('{},0,0\n'.format(start_stamp))
 			for record in self:
-				current_stamp = stamp(record.delta_timestamp())
-				if record.stimulus is not StimulusType.MARKER:
-					file.write("{},{},{}\n".format(current_stamp, record.stimulus.key.id, record.stimulus.byte_intensity))
-			end_stamp = stamp(StimulusTimeRecord.calc_delta(self.end_time))
+				file.write(self._row(record))
+			end_stamp = stamp(StimulusTimeRecord.calc_delta(self.end_ns))
 			file.write('{},0,0'.format(end_stamp))
 		logger.debug("Finished writing stimulus times.")
 
+	def _row(self, record: StimulusTimeRecord) -> str:
+		if record.stimulus is StimulusType.MARKER:
+			return ''
+		key = record.stimulus.key
+		return "{},{},{}\n".format(self.clock.stamp(record.delta_timestamp()), getattr(key, 'id', key), record.stimulus.byte_intensity)
+
 
 __all__ = ['StimulusTimeRecord', 'StimulusTimeLog']
@@ -0,0 +1,63 @@
+import heapq, typing
+from typing import Any, Iterable, Iterator, List, Optional
+
+from sauronlib.audio_info import AudioInfo
+from sauronlib.stimulus import StimulusType
+from sauronlib.scheduling.block_scheduler import Block, Event, track_events
+
+
+class StreamingSchedule:
+	"""A schedule whose events are generated from blocks only as they're needed, for batteries too long to hold in memory.
+	Each stimulus's blocks feed a track_events generator, and the tracks are merged in time order,
+	so at most one pending event per track (and chunk_ms frames of the block being read) is in memory at once.
+	ScheduleRunner accepts one in place of a Schedule and starts without building anything.
+	Example usage:
+		schedule = StreamingSchedule(total_ms)
+		schedule.append('blue led', key, None, lambda: assay_blocks())
+		ScheduleRunner(schedule).run(board.write, global_audio.play)
+	"""
+
+	def __init__(self, total_ms: int, chunk_ms: int = 10000) -> None:
+		"""
+		:param chunk_ms: The number of frames of a block to scan for changes at a time
+		"""
+		self.total_ms = total_ms
+		self.chunk_ms = chunk_ms
+		self._tracks = []  # type: List[typing.Tuple[str, Any, Optional[AudioInfo], Any, Optional[StimulusType]]]
+
+	def append(
+			self, stimulus_name: str, stimulus_key: Any, audio_obj: Optional[AudioInfo],
+			blocks: typing.Union[Iterable[Block], typing.Callable[[], Iterable[Block]]],
+			stim_type: Optional[StimulusType] = None
+	) -> 'StreamingSchedule':
+		"""Adds a stimulus track, with the same arguments as BlockScheduler.append.
+		:param blocks: A list of blocks, or a function that returns a fresh iterable (such as a generator) of them.
+		               assay_positions and n_events() read the blocks again, so a bare generator is not enough.
+		"""
+		self._tracks.append((stimulus_name, stimulus_key, audio_obj, blocks, stim_type))
+		return self
+
+	def events(self) -> Iterator[Event]:
+		"""Generates every event in time order. Events at the same time come in the order their tracks were appended."""
+		return heapq.merge(*[
+			track_events(name, key, audio_obj, self._blocks(blocks), stim_type, self.chunk_ms)
+			for name, key, audio_obj, blocks, stim_type in self._tracks
+		], key=lambda event: event[0])
+
+	@property
+	def assay_positions(self) -> List[typing.Tuple[int, str]]:
+		return [(block.start, block.name) for track in self._tracks for block in self._blocks(track[3])]
+
+	def n_events(self) -> int:
+		"""Counts the stimulus events by generating all of them. Takes time proportional to the battery, but not memory."""
+		return sum(1 for _, event in self.events() if not isinstance(event, str))
+
+	def _blocks(self, blocks) -> Iterable[Block]:
+		return blocks() if callable(blocks) else blocks
+
+	def __repr__(self) -> str:
+		return "StreamingSchedule({} tracks, total={})".format(len(self._tracks), self.total_ms)
+	def __str__(self): return repr(self)
+
+
+__all__ = ['StreamingSchedule']
@@ -1,42 +1,66 @@
 import datetime
 from os.path import dirname
-from typing import Callable, List
-
-import pandas as pd
-from hipsterplot import HipsterPlotter
+from typing import Callable, List, Optional
 
 from klgists.files import make_dirs
 
-from sauronlib import logger
+from sauronlib import logger, lazy_import
+from sauronlib.clock import RunClock, global_clock
 from sauronlib.sensors.sensor import *
+from sauronlib.sensors.rolling_stats import RollingStats, RollingSnapshot
+from sauronlib.tracing import tracer
+
+pd = lazy_import('pandas')
+hipsterplot = lazy_import('hipsterplot')
 
 
 class ArduinoCsvSensor(PlottableSensor):
 	"""An abstract sensor that uses Arduino sensor callbacks and writes Value,Time column to a CSV file.
+	Also keeps online statistics of the values recorded since it was last armed; call snapshot() to read them mid-run.
 	Example usage:
 	MyImplementation('data.csv', lambda r: board.register_sensor(pin, r), board.reset_sensor)
 	"""
-	def __init__(self, output_path: str, activation_callback: Callable[[Callable[[List[float]], None]], None], deactivation_callback: Callable[[], None]) -> None:
+	def __init__(
+			self, output_path: str,
+			activation_callback: Callable[[Callable[[List[float]], None]], None], deactivation_callback: Callable[[], None],
+			stats: Optional[RollingStats] = None, clock: Optional[RunClock] = None
+	) -> None:
 		"""
 		:param output_path: A CSV file to record to. Will contain columns 'Value' and 'Time'.
 		:param activation_callback: Ex: lambda inner_callback: board.register_sensor(pin, inner_callback)
 		:param deactivation_callback: Ex: lambda: board.reset_sensor(pin)
+		:param stats: Online statistics to update with each value; defaults to RollingStats()
+		:param clock: The time base for the Time column; defaults to the global RunClock
 		"""
 		super(ArduinoCsvSensor, self).__init__()
 		self.output_path = output_path
 		self.activation_callback = activation_callback
 		self.deactivation_callback = deactivation_callback
+		self.stats = RollingStats() if stats is None else stats
+		self.clock = global_clock if clock is None else clock
 
 	def _arm(self) -> None:
 		logger.info("Recording {} to {}".format(self.name(), self.output_path))
 		make_dirs(dirname(self.output_path))
+		# re-arming appends to the same file, so only a new (or empty) file gets the header
 		self.log_file = open(self.output_path, 'a')
-		self.log_file.write('Value,Time\n')
+		if self.log_file.tell() == 0:
+			self.log_file.write('Value,Time\n')
+		self.stats.reset()
 		self.activation_callback(self._record)
 
 	def _record(self, data: List[float]) -> None:
-		self.log_file.write('%s,%s\n' % (data[1], datetime.datetime.now()))
+		now_ns = self.clock.now_ns()
+		self.log_file.write('%s,%s\n' % (data[1], self.clock.stamp(now_ns)))
 		self.previous_value = data[1]
+		self.stats.update(data[1])
+		if tracer.enabled:
+			tracer.complete('sensor.record', now_ns, 'sensor', sensor=self.name())
+			tracer.count(self.name() + '.values')
+
+	def snapshot(self) -> RollingSnapshot:
+		"""Returns the statistics of the values recorded so far. Safe to call from any thread while recording."""
+		return self.stats.snapshot()
 
 	def _disarm(self) -> None:
 		self.deactivation_callback()
@@ -45,13 +69,12 @@ class ArduinoCsvSensor(PlottableSensor):
 	def _fire(self) -> None: pass
 
 	def plot(self):
-		fmt = '%Y-%m-%d %H:%M:%S.%f'
 		df = pd.read_csv(self.output_path)
 		if len(df) == 0:
 			return '{}: <no data>'.format(self.sensor_name())
-		low_x = datetime.datetime.strptime(df['Time'].iloc[0], fmt).strftime('%H:%M:%S')
-		high_x = datetime.datetime.strptime(df['Time'].iloc[-1], fmt).strftime('%H:%M:%S')
-		s = HipsterPlotter(num_y_chars=10).plot(df['Value'], title=self.name(), low_x_label=low_x, high_x_label=high_x)
+		low_x = datetime.datetime.fromisoformat(df['Time'].iloc[0]).strftime('%H:%M:%S')
+		high_x = datetime.datetime.fromisoformat(df['Time'].iloc[-1]).strftime('%H:%M:%S')
+		s = hipsterplot.HipsterPlotter(num_y_chars=10).plot(df['Value'], title=self.name(), low_x_label=low_x, high_x_label=high_x)
 		with open(self.output_path + '.plot.txt', 'w', encoding="utf8") as f:
 			f.write(s)
 		return s
@@ -1,25 +1,34 @@
 import wave
-from datetime import datetime
 from os.path import dirname
+from typing import Optional
 
 import numpy as np
-import pyaudio
-from scipy.io import wavfile
-from hipsterplot import HipsterPlotter
 
 from klgists.files import make_dirs
 
-from sauronlib import logger
+from sauronlib import logger, lazy_import
+from sauronlib.clock import RunClock, global_clock
 from sauronlib.sensors.sensor import Sensor
-from sauronlib import stamp
+from sauronlib.sensors.rolling_stats import RollingStats, RollingSnapshot
+from sauronlib.tracing import tracer
+
+pyaudio = lazy_import('pyaudio')
+wavfile = lazy_import('scipy.io.wavfile')
+hipsterplot = lazy_import('hipsterplot')
 
 
 class Microphone(Sensor):
 	"""A microphone that records a WAV file to a file.
 	Runs for a specified number of milliseconds. fire() opens and closes the stream.
+	Keeps online statistics of the samples, scaled to [-1, 1); call snapshot() to read them mid-run.
+	By default, each history point is the RMS amplitude of one buffer.
+	Buffer timestamps are read from a RunClock and converted to wall time in save().
 	"""
 
-	def __init__(self, output_path: str, timestamp_file_path: str, sample_rate: int, frames_per_buffer: int) -> None:
+	def __init__(
+			self, output_path: str, timestamp_file_path: str, sample_rate: int, frames_per_buffer: int,
+			stats: Optional[RollingStats] = None, clock: Optional[RunClock] = None
+	) -> None:
 		super(Microphone, self).__init__()
 		self.output_path = output_path
 		self.timestamp_file_path = timestamp_file_path
@@ -32,13 +41,16 @@ class Microphone(Sensor):
 		self._timestamps = None
 		self._frames = None
 		self.log_file = None
+		self.stats = RollingStats(downsample=frames_per_buffer, history_of='rms') if stats is None else stats
+		self.clock = global_clock if clock is None else clock
 		super(Microphone, self).__init__()
 
 	def _arm(self, **kwargs) -> None:
 		logger.info("Recording {} to {}".format(self.name(), self.output_path))
-		make_dirs(dirname(self.log_file))
+		make_dirs(dirname(self.output_path))
 		self.timestamps = []
 		self.frames = []
+		self.stats.reset()
 		try:
 			self._p = pyaudio.PyAudio()
 			self._stream = self._p.open(
@@ -55,11 +67,21 @@ class Microphone(Sensor):
 
 	def _fire(self) -> None:
 		# TODO exception handling got a bit much here
+		now_ns = self.clock.now_ns
 		try:
 			while not self.should_kill[0]:
+				traced = tracer.enabled
+				if traced:
+					read_ns = now_ns()
 				data = self._stream.read(self.frames_per_buffer)
+				received_ns = now_ns()
 				self.frames.append(data)
-				self.timestamps.append(datetime.now())
+				self.timestamps.append(received_ns)
+				self.stats.update_many(np.frombuffer(data, dtype=np.int32) / 2**31)
+				if traced:
+					# the span covers blocking on the device and handling the buffer; the histogram, only the blocking
+					tracer.complete('microphone.read', read_ns, 'sensor', frames=self.frames_per_buffer)
+					tracer.observe('microphone.read_ms', (received_ns - read_ns) / 1e6)
 		except Exception as e:
 			logger.fatal("Microphone failed while capturing")
 			#warn_user("Microphone failed while capturing")
@@ -67,8 +89,13 @@ class Microphone(Sensor):
 		self.save()
 		self._kill()
 
-	def disarm(self):
-		self.should_kill[0] = True
+	def snapshot(self) -> RollingSnapshot:
+		"""Returns the statistics of the samples recorded so far. Safe to call from any thread while recording."""
+		return self.stats.snapshot()
+
+	def _disarm(self) -> None:
+		# should_kill is already set; _fire() saves and closes the stream when it sees it, and disarm() joins it
+		pass
 
 	def save(self):
 		try:
@@ -76,9 +103,9 @@ class Microphone(Sensor):
 			logger.debug("Writing microphone timestamps")
 			with open(self.timestamp_file_path, 'w') as f:
 				for ts in self.timestamps:
-					f.write(stamp(ts) + '\n')
+					f.write(self.clock.stamp(ts) + '\n')
 			logger.debug("Writing microphone WAV data")
-			wf = wave.open(self.log_file, 'wb')
+			wf = wave.open(self.output_path, 'wb')
 			try:
 				wf.setnchannels(self.channels)
 				wf.setsampwidth(self._p.get_sample_size(self.audio_format))
@@ -96,9 +123,9 @@ class Microphone(Sensor):
 		with open(self.output_path, 'rb') as f:
 			self.sampling_rate, data = wavfile.read(f)
 			ms = np.array([i / self.sampling_rate * 1000 for i in range(0, len(data))])
-		low_x = self.timestamps[0].strftime('%H:%M:%S')
-		high_x = self.timestamps[-1].strftime('%H:%M:%S')
-		s = HipsterPlotter(num_y_chars=10).plot(data, title=self.name(), low_x_label=low_x, high_x_label=high_x)
+		low_x = self.clock.to_datetime(self.timestamps[0]).strftime('%H:%M:%S')
+		high_x = self.clock.to_datetime(self.timestamps[-1]).strftime('%H:%M:%S')
+		s = hipsterplot.HipsterPlotter(num_y_chars=10).plot(data, title=self.name(), low_x_label=low_x, high_x_label=high_x)
 		with open(self.output_path + '.plot.txt', 'w', encoding="utf8") as f:
 			f.write(s)
 		return s
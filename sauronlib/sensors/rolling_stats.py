@@ -0,0 +1,194 @@
+import math
+import threading
+from collections import deque
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+
+
+class RollingSnapshot:
+	"""A point-in-time copy of the aggregates in a RollingStats.
+	variance is the sample variance (n-1 denominator), and is nan for fewer than 2 values.
+	history holds one point (the mean, RMS, or peak absolute value) per consecutive group of downsample values, oldest first.
+	"""
+	def __init__(
+			self, count: int, mean: float, minimum: float, maximum: float, variance: float,
+			ewma: float, rms: float, history: List[float]
+	) -> None:
+		self.count = count
+		self.mean = mean
+		self.minimum = minimum
+		self.maximum = maximum
+		self.variance = variance
+		self.ewma = ewma
+		self.rms = rms
+		self.history = history
+
+	def std(self) -> float:
+		return math.sqrt(self.variance)
+
+	def __repr__(self) -> str:
+		return "RollingSnapshot(n={}, mean={}, min={}, max={}, var={}, ewma={}, rms={})".format(
+			self.count, self.mean, self.minimum, self.maximum, self.variance, self.ewma, self.rms
+		)
+	def __str__(self): return repr(self)
+
+
+class RollingStats:
+	"""Online aggregates over a stream of values, updated in O(1) per value and readable from any thread.
+	Keeps count, mean, min, max, variance (Welford's method), an exponentially weighted moving average, and RMS,
+	plus a fixed-size ring of downsampled history.
+	Arrays (such as audio buffers) can be added with update_many(), which is vectorized.
+	Example usage:
+		stats = RollingStats(ewma_alpha=0.1, downsample=10, history_size=500)
+		stats.update(24.5)
+		stats.update_many(np.array([0.1, -0.2, 0.05]))
+		print(stats.snapshot().mean)
+	"""
+	def __init__(self, ewma_alpha: float = 0.05, downsample: int = 1, history_size: int = 1000, history_of: str = 'mean') -> None:
+		"""
+		:param ewma_alpha: Weight of each new value in the EWMA, in (0, 1]
+		:param downsample: Number of consecutive values summarized into each history point
+		:param history_size: Maximum number of history points kept; older points are dropped
+		:param history_of: How each group is summarized: 'mean', 'rms', or 'peak' (the largest absolute value).
+		                   Use 'rms' or 'peak' for signals centered on 0, such as audio, whose mean is always about 0
+		"""
+		if not 0 < ewma_alpha <= 1:
+			raise ValueError("ewma_alpha is {} but must be in (0, 1]".format(ewma_alpha))
+		if downsample < 1:
+			raise ValueError("downsample is {} but must be at least 1".format(downsample))
+		if history_of not in ('mean', 'rms', 'peak'):
+			raise ValueError("history_of is {} but must be 'mean', 'rms', or 'peak'".format(history_of))
+		self.ewma_alpha = ewma_alpha
+		self.downsample = downsample
+		self.history_of = history_of
+		self.history_size = history_size
+		self._lock = threading.Lock()
+		self.reset()
+
+	def reset(self) -> None:
+		with self._lock:
+			self._count = 0
+			self._mean = 0.0
+			self._m2 = 0.0
+			self._sum_sq = 0.0
+			self._min = math.inf
+			self._max = -math.inf
+			self._ewma = None  # type: Optional[float]
+			self._bucket_sum = 0.0
+			self._bucket_count = 0
+			self._history = deque(maxlen=self.history_size)
+
+	def update(self, value: float) -> None:
+		value = float(value)
+		with self._lock:
+			self._count += 1
+			delta = value - self._mean
+			self._mean += delta / self._count
+			self._m2 += delta * (value - self._mean)
+			self._sum_sq += value * value
+			if value < self._min: self._min = value
+			if value > self._max: self._max = value
+			self._ewma = value if self._ewma is None else self._ewma + self.ewma_alpha * (value - self._ewma)
+			if self.history_of == 'rms':
+				self._bucket_sum += value * value
+			elif self.history_of == 'peak':
+				self._bucket_sum = max(self._bucket_sum, abs(value))
+			else:
+				self._bucket_sum += value
+			self._bucket_count += 1
+			if self._bucket_count == self.downsample:
+				self._history.append(self._bucket_point())
+				self._bucket_sum = 0.0
+				self._bucket_count = 0
+
+	def update_many(self, values: Union[np.ndarray, Sequence[float]]) -> None:
+		values = np.asarray(values, dtype=np.float64).ravel()
+		n = len(values)
+		if n == 0:
+			return
+		block_mean = float(values.mean())
+		block_m2 = float(np.square(values - block_mean).sum())
+		# EWMA over the block in closed form: e_n = (1-a)^n e_0 + sum_i a (1-a)^(n-1-i) x_i
+		decay = np.power(1 - self.ewma_alpha, np.arange(n - 1, -1, -1, dtype=np.float64))
+		weighted = float(self.ewma_alpha * np.dot(decay, values))
+		with self._lock:
+			# Chan et al.'s parallel combination of (count, mean, M2)
+			total = self._count + n
+			delta = block_mean - self._mean
+			self._m2 += block_m2 + delta * delta * self._count * n / total
+			self._mean += delta * n / total
+			self._count = total
+			self._sum_sq += float(np.dot(values, values))
+			self._min = min(self._min, float(values.min()))
+			self._max = max(self._max, float(values.max()))
+			e0 = float(values[0]) if self._ewma is None else self._ewma
+			self._ewma = (1 - self.ewma_alpha) ** n * e0 + weighted
+			self._extend_history(values)
+
+	def _extend_history(self, values: np.ndarray) -> None:
+		i = 0
+		if self._bucket_count > 0:
+			i = min(len(values), self.downsample - self._bucket_count)
+			self._bucket_sum = self._add_to_bucket(self._bucket_sum, values[:i])
+			self._bucket_count += i
+			if self._bucket_count < self.downsample:
+				return
+			self._history.append(self._bucket_point())
+			self._bucket_sum = 0.0
+			self._bucket_count = 0
+		n_full = (len(values) - i) // self.downsample
+		if n_full > 0:
+			# only the last history_size points can survive, so skip summarizing the rest
+			n_kept = min(n_full, self.history_size)
+			start = i + (n_full - n_kept) * self.downsample
+			end = i + n_full * self.downsample
+			groups = values[start:end].reshape(n_kept, self.downsample)
+			if self.history_of == 'rms':
+				points = np.sqrt(np.square(groups).mean(axis=1))
+			elif self.history_of == 'peak':
+				points = np.abs(groups).max(axis=1)
+			else:
+				points = groups.mean(axis=1)
+			self._history.extend(points.tolist())
+		leftover = values[i + n_full * self.downsample:]
+		self._bucket_sum = self._add_to_bucket(0.0, leftover)
+		self._bucket_count = len(leftover)
+
+	def _add_to_bucket(self, bucket: float, values: np.ndarray) -> float:
+		"""Accumulates values into the partial history point: a sum, a sum of squares, or a running peak."""
+		if len(values) == 0:
+			return bucket
+		if self.history_of == 'rms':
+			return bucket + float(np.dot(values, values))
+		if self.history_of == 'peak':
+			return max(bucket, float(np.abs(values).max()))
+		return bucket + float(values.sum())
+
+	def _bucket_point(self) -> float:
+		if self.history_of == 'rms':
+			return math.sqrt(self._bucket_sum / self.downsample)
+		if self.history_of == 'peak':
+			return self._bucket_sum
+		return self._bucket_sum / self.downsample
+
+	def snapshot(self) -> RollingSnapshot:
+		with self._lock:
+			n = self._count
+			return RollingSnapshot(
+				count=n,
+				mean=self._mean if n > 0 else math.nan,
+				minimum=self._min if n > 0 else math.nan,
+				maximum=self._max if n > 0 else math.nan,
+				variance=self._m2 / (n - 1) if n > 1 else math.nan,
+				ewma=math.nan if self._ewma is None else self._ewma,
+				rms=math.sqrt(self._sum_sq / n) if n > 0 else math.nan,
+				history=list(self._history)
+			)
+
+	def __repr__(self) -> str:
+		return "RollingStats(alpha={}, downsample={}, history={} of {})".format(self.ewma_alpha, self.downsample, self.history_size, self.history_of)
+	def __str__(self): return repr(self)
+
+
+__all__ = ['RollingStats', 'RollingSnapshot']
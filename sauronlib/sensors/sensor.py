@@ -1,5 +1,7 @@
-import threading
-from typing import Set, Any
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, wait
+from typing import Set, Any, Optional
+
+from sauronlib import logger
 
 
 class Sensor:
@@ -10,10 +12,13 @@ class Sensor:
 		- Arming begins recording and disarming stops it.
 		- Arming simply primes, and starts for a specified duration, indefinite period, or single shot.
 			Disarming stops recording if applicable and closes.
-	Calling fire() causes _fire() to be called in a new thread. If sensor does not support firing, it can exit immediately.
+	Calling fire() submits _fire() to an executor (normally the one owned by a SensorRegistry).
+	If sensor does not support firing, it can exit immediately.
+	A sensor can be armed, fired, and disarmed any number of times; disarm() waits for the current _fire() to finish.
 	"""
 	def __init__(self):
-		self._thread = threading.Thread(target=self._fire)  # type: threading.Thread
+		self._future = None  # type: Optional[Future]
+		self._own_executor = None  # type: Optional[ThreadPoolExecutor]
 		self._is_armed = False  # type: bool
 		self.should_kill = [None]
 
@@ -31,16 +36,41 @@ class Sensor:
 		self._arm()
 		self._is_armed = True
 
-	def disarm(self) -> None:
+	def disarm(self, timeout_secs: Optional[float] = None) -> None:
+		"""Stops the sensor, then waits up to timeout_secs for a running _fire() to return."""
 		self.should_kill[0] = True
 		self._disarm()
+		self.join(timeout_secs)
 		self._is_armed = False
 
-	def fire(self) -> None:
+	def fire(self, executor: Optional[Executor] = None) -> Future:
+		"""Submits _fire() to executor, or to a single-thread executor private to this sensor if executor is None."""
 		assert self.is_armed()
-		self._thread.start()  # calls _fire
+		assert not self.is_running(), "{} is already firing".format(self.name())
+		if executor is None:
+			if self._own_executor is None:
+				self._own_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=self.name())
+			executor = self._own_executor
+		self._future = executor.submit(self._fire)
+		return self._future
+
+	def join(self, timeout_secs: Optional[float] = None) -> bool:
+		"""Waits for the last fire() to complete. Returns False if it is still running after timeout_secs.
+		An exception raised by _fire() is logged, not re-raised.
+		"""
+		if self._future is None:
+			return True
+		done, _ = wait([self._future], timeout=timeout_secs)
+		if len(done) == 0:
+			logger.warning("{} did not stop within {}s".format(self.name(), timeout_secs))
+			return False
+		if self._future.exception() is not None:
+			logger.error("{} failed while firing".format(self.name()), exc_info=self._future.exception())
+		self._future = None
+		return True
 
 	def is_armed(self) -> bool: return self._is_armed
+	def is_running(self) -> bool: return self._future is not None and not self._future.done()
 
 	@classmethod
 	def sensor_name(cls) -> str: return cls.__name__.lower()
@@ -73,10 +103,10 @@ class TriggeredSensor(Sensor):
 	def firing(self) -> Set[Any]:
 		raise NotImplementedError()
 
-	def trigger(self, trigger: Any):
+	def trigger(self, trigger: Any, executor: Optional[Executor] = None, timeout_secs: Optional[float] = None):
 		if trigger in self.arming(): self.arm()
-		if trigger in self.firing(): self.fire()
-		if trigger in self.disarming(): self.disarm()
+		if trigger in self.firing(): self.fire(executor)
+		if trigger in self.disarming(): self.disarm(timeout_secs)
 
 
 __all__ = ['Sensor', 'PlottableSensor', 'TriggeredSensor']
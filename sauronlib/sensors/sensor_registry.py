@@ -1,36 +1,103 @@
-from typing import Dict, List, Set, Any, Iterable, Union
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Set, Any, Iterable, Union, Optional, Tuple
 from warnings import warn
 
+from sauronlib import logger
 from .sensor import Sensor, TriggeredSensor
 
 
+class SensorTimeoutError(TimeoutError):
+	def description(self):
+		return "Some sensors did not finish arming or disarming in time."
+
+
+class _TriggerActions:
+	"""The sensors to arm, fire, and disarm (in that order) for a single trigger."""
+	def __init__(self) -> None:
+		self.to_arm = []  # type: List[TriggeredSensor]
+		self.to_fire = []  # type: List[TriggeredSensor]
+		self.to_disarm = []  # type: List[TriggeredSensor]
+
+	def __repr__(self) -> str:
+		return "_TriggerActions(arm={}, fire={}, disarm={})".format(self.to_arm, self.to_fire, self.to_disarm)
+
+
 class SensorRegistry:
 	"""A collection of TriggeredSensors, which respond to triggers.
+	Keeps an index from each trigger to the sensors that arm, fire, or disarm on it, so a trigger only touches those sensors.
+	The index reads each sensor's arming(), firing(), and disarming() once, when the sensor is added;
+	remove and re-add a sensor if those sets change.
+	Owns a thread pool that runs every sensor's fire(), with room for one running fire() per added sensor.
+	Arms and disarms run in parallel on separate short-lived threads, so that slow device opens (audio, serial) overlap
+	instead of adding up, and so they never wait behind a running fire().
+	The wall time taken by each trigger is recorded in trigger_times.
 	Example usage:
-		registry = SensorRegistry({'thermometer', 'photometer', 'microphone'}).add(Thermometer(), Photometer())
-		registry.trigger('board_initialized')
-		something_needed = get_something_needed()
-		registry.add(Microphone(something_needed))
-		registry.trigger('experiment_started').trigger('going_going_going')
-		sleep(10)
-		registry.trigger('all_done')
+		with SensorRegistry({'thermometer', 'photometer', 'microphone'}).add(Thermometer(), Photometer()) as registry:
+			registry.trigger('board_initialized')
+			something_needed = get_something_needed()
+			registry.add(Microphone(something_needed))
+			registry.trigger('experiment_started').trigger('going_going_going')
+			sleep(10)
+			registry.trigger('all_done')
 	"""
-	def __init__(self, expected: Set[str]) -> None:
+	def __init__(
+			self, expected: Set[str], max_workers: Optional[int] = None, disarm_timeout_secs: Optional[float] = 10,
+			control_timeout_secs: Optional[float] = 30
+	) -> None:
+		"""
+		:param expected: Names of the sensors that are expected to be added; others are added with a warning
+		:param max_workers: Minimum size of the fire() thread pool; it always has at least one thread per added sensor
+		:param disarm_timeout_secs: Maximum time to wait for each sensor's fire() to finish when it is disarmed
+		:param control_timeout_secs: Maximum time to wait for a group of arms or disarms;
+		                             SensorTimeoutError names the sensors that did not finish
+		"""
 		self._expected = expected
 		self._sensors = []  # type: List[TriggeredSensor]
-		self._by_name = []  # type: Dict[str, List[TriggeredSensor]]
+		self._by_name = defaultdict(list)  # type: Dict[str, List[TriggeredSensor]]
+		self._by_trigger = defaultdict(_TriggerActions)  # type: Dict[Any, _TriggerActions]
+		self.trigger_times = []  # type: List[Tuple[Any, float]]
+		self.max_workers = 1 if max_workers is None else max_workers
+		self.disarm_timeout_secs = disarm_timeout_secs
+		self.control_timeout_secs = control_timeout_secs
+		self._executor = None  # type: Optional[ThreadPoolExecutor]
+		self._executor_size = 0
+		self._retired_executors = []  # type: List[ThreadPoolExecutor]
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, type, value, traceback) -> None:
+		self.close()
 
 	def add(self, *sensors: TriggeredSensor):
 		for sensor in sensors:
 			if sensor.name() not in self._expected:
 				warn("Sensor {} is unexpected".format(sensor))
-			self._sensors.extend(sensor)
-		self._by_name = {s.name(): [] for s in self._sensors}
+			self._sensors.append(sensor)
+			self._by_name[sensor.name()].append(sensor)
+			for trigger in sensor.arming():
+				self._by_trigger[trigger].to_arm.append(sensor)
+			for trigger in sensor.firing():
+				self._by_trigger[trigger].to_fire.append(sensor)
+			for trigger in sensor.disarming():
+				self._by_trigger[trigger].to_disarm.append(sensor)
 		return self
 
 	def remove(self, *sensors: TriggeredSensor):
 		for sensor in sensors:
 			self._sensors.remove(sensor)
+			self._by_name[sensor.name()].remove(sensor)
+			if len(self._by_name[sensor.name()]) == 0:
+				del self._by_name[sensor.name()]
+			for trigger in list(self._by_trigger.keys()):
+				actions = self._by_trigger[trigger]
+				for sensors_list in (actions.to_arm, actions.to_fire, actions.to_disarm):
+					if sensor in sensors_list:
+						sensors_list.remove(sensor)
+				if len(actions.to_arm) == len(actions.to_fire) == len(actions.to_disarm) == 0:
+					del self._by_trigger[trigger]
 		return self
 
 	def armed(self) -> List[Sensor]:
@@ -40,17 +107,80 @@ class SensorRegistry:
 		return [s for s in self._sensors if not s.is_armed()]
 
 	def trigger(self, trigger: Any):
-		for sensor in self._sensors:
-			sensor.trigger(trigger)
+		if trigger not in self._by_trigger:
+			return self
+		t0 = time.monotonic()
+		actions = self._by_trigger[trigger]
+		self.arm(*actions.to_arm)
+		if len(actions.to_fire) > 0:
+			executor = self._fire_executor()
+			for sensor in actions.to_fire:
+				sensor.fire(executor)
+		self.disarm(*actions.to_disarm)
+		elapsed = time.monotonic() - t0
+		self.trigger_times.append((trigger, elapsed))
+		logger.debug("Trigger {} took {}ms".format(trigger, round(elapsed * 1000, 3)))
+		return self
+
+	def arm(self, *sensors: Sensor):
+		"""Arms sensors in parallel and waits for all of them. Re-raises the first failure after all have finished."""
+		self._run_all(sensors, lambda s: s.arm())
 		return self
 
+	def disarm(self, *sensors: Sensor):
+		"""Disarms sensors in parallel, each waiting up to disarm_timeout_secs for its fire() to finish."""
+		self._run_all(sensors, lambda s: s.disarm(self.disarm_timeout_secs))
+		return self
+
+	def _run_all(self, sensors: Tuple[Sensor, ...], function) -> None:
+		"""Calls function on each sensor in parallel, on threads separate from the fire() pool."""
+		if len(sensors) == 0:
+			return
+		if len(sensors) == 1:
+			function(sensors[0])
+			return
+		executor = ThreadPoolExecutor(max_workers=len(sensors), thread_name_prefix='sensor-control')
+		try:
+			futures = {executor.submit(function, sensor): sensor for sensor in sensors}
+			_, not_done = wait(futures, timeout=self.control_timeout_secs)
+		finally:
+			executor.shutdown(wait=False)
+		if len(not_done) > 0:
+			names = [futures[future].name() for future in not_done]
+			logger.error("Sensors {} did not finish within {}s".format(names, self.control_timeout_secs))
+			raise SensorTimeoutError("Sensors {} did not finish within {}s".format(names, self.control_timeout_secs))
+		for future in futures:
+			if future.exception() is not None:
+				raise future.exception()
+
+	def _fire_executor(self) -> ThreadPoolExecutor:
+		"""The pool for fire(), replaced by a larger one if sensors were added since it was made.
+		A replaced pool is shut down in close(), after its running fire()s are disarmed.
+		"""
+		size = max(self.max_workers, len(self._sensors))
+		if self._executor is None or self._executor_size < size:
+			if self._executor is not None:
+				self._retired_executors.append(self._executor)
+			self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix='sensor')
+			self._executor_size = size
+		return self._executor
+
+	def close(self) -> None:
+		"""Disarms every armed sensor, then shuts down the thread pools."""
+		try:
+			self.disarm(*self.armed())
+		finally:
+			for executor in self._retired_executors + ([] if self._executor is None else [self._executor]):
+				executor.shutdown(wait=False)
+		logger.debug("Closed {}".format(self))
+
 	def __len__(self) -> int:
 		return len(self._sensors)
 
 	def __getitem__(self, name: Union[type, str, Sensor]) -> List[Sensor]:
-		if isinstance(name, type): item = name.sensor_name()
+		if isinstance(name, type): name = name.sensor_name()
 		if isinstance(name, Sensor): name = name.name()
-		return self._by_name[name]
+		return self._by_name.get(name, [])
 
 	def __contains__(self, item: Union[type, str, Sensor]):
 		if isinstance(item, type): item = item.sensor_name()
@@ -58,14 +188,14 @@ class SensorRegistry:
 		return item in self._by_name
 
 	def __iadd__(self, other: TriggeredSensor):
-		self.add(other)
+		return self.add(other)
 
 	def __isub__(self, other: TriggeredSensor):
-		self.remove(other)
+		return self.remove(other)
 
 	def __repr__(self) -> str:
 		return "SensorRegistry({})".format(self._sensors)
 	def __str__(self) -> str: return repr(self)
 
 
-__all__ = ['SensorRegistry']
+__all__ = ['SensorRegistry', 'SensorTimeoutError']
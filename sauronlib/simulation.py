@@ -0,0 +1,127 @@
+"""
+In-process stand-ins for the Arduino board and the audio device, for running schedules without hardware.
+"""
+
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sauronlib.audio_handler import GlobalAudio
+from sauronlib.audio_info import AudioInfo
+from sauronlib.board import ExtendedBoard
+from sauronlib.board_layout import BoardLayout
+from sauronlib.clock import RunClock, global_clock
+from sauronlib.tracing import tracer
+
+
+class _SimulatedSerial:
+	def close(self) -> None:
+		pass
+
+
+class _SimulatedCore:
+	def __init__(self) -> None:
+		self.serial_port = type('SerialPort', (), {'my_serial': _SimulatedSerial()})()
+		self.loop = type('Loop', (), {'stop': lambda self: None, 'close': lambda self: None})()
+
+	def send_reset(self) -> None:
+		pass
+
+
+class SimulatedPymata:
+	"""A stand-in for PyMata3 that records pin writes in memory instead of sending them over serial.
+	Writes are recorded as (RunClock time, pin, value). Sensor pins never report values.
+	"""
+	def __init__(self, clock: Optional[RunClock] = None, keep_writes: bool = True) -> None:
+		self.clock = global_clock if clock is None else clock
+		self.keep_writes = keep_writes
+		self.writes = []  # type: List[Tuple[int, int, int]]
+		self.n_writes = 0
+		self.pin_values = {}  # type: Dict[int, int]
+		self.core = _SimulatedCore()
+
+	def digital_write(self, pin: int, value: int) -> None:
+		self._write(pin, value)
+
+	def digital_pin_write(self, pin: int, value: int) -> None:
+		self._write(pin, value)
+
+	def analog_write(self, pin: int, value: int) -> None:
+		self._write(pin, value)
+
+	def _write(self, pin: int, value: int) -> None:
+		self.pin_values[pin] = value
+		self.n_writes += 1
+		if self.keep_writes:
+			self.writes.append((self.clock.now_ns(), pin, value))
+
+	def sleep(self, seconds: float) -> None:
+		time.sleep(seconds)
+
+	def set_sampling_interval(self, interval_ms: int) -> None: pass
+	def set_pin_mode(self, *args, **kwargs) -> None: pass
+	def get_pin_state(self, pin: int) -> List[int]: return [pin, 0]
+	def enable_analog_reporting(self, pin: int) -> None: pass
+	def disable_analog_reporting(self, pin: int) -> None: pass
+	def disable_digital_reporting(self, pin: int) -> None: pass
+	def digital_read(self, pin: int) -> int: return self.pin_values.get(pin, 0)
+	def analog_read(self, pin: int) -> int: return self.pin_values.get(pin, 0)
+	def send_reset(self) -> None: pass
+
+	def __repr__(self) -> str:
+		return "SimulatedPymata(writes={})".format(self.n_writes)
+	def __str__(self): return repr(self)
+
+
+class SimulatedBoard(ExtendedBoard):
+	"""A Board backed by a SimulatedPymata. Status flashes are skipped, so init() and exit() are instant."""
+
+	def __init__(self, layout: BoardLayout, clock: Optional[RunClock] = None, keep_writes: bool = True) -> None:
+		super(SimulatedBoard, self).__init__(layout)
+		self.clock = clock
+		self.keep_writes = keep_writes
+
+	def _new_board(self) -> SimulatedPymata:
+		return SimulatedPymata(self.clock, self.keep_writes)
+
+	def flash_status(self, status) -> None:
+		pass
+
+	def exit(self) -> None:
+		self.stop_all_stimuli()
+		self.set_illumination(0)
+		self.reset_all_sensors()
+
+	@staticmethod
+	def for_stimuli(digital: List[str], analog: List[str], clock: Optional[RunClock] = None) -> 'SimulatedBoard':
+		"""A SimulatedBoard with a layout that gives each named stimulus its own pin."""
+		digital_stimuli = {name: i + 2 for i, name in enumerate(digital)}
+		analog_stimuli = {name: i + 2 + len(digital) for i, name in enumerate(analog)}
+		pins = list(range(2, 2 + len(digital) + len(analog)))
+		layout = BoardLayout(
+			{0: pins}, {}, 13, digital_stimuli=digital_stimuli, analog_stimuli=analog_stimuli,
+			digital_sensors={}, analog_sensors={}
+		)
+		return SimulatedBoard(layout, clock)
+
+
+class SimulatedGlobalAudio(GlobalAudio):
+	"""A GlobalAudio that records what it's asked to play instead of playing it.
+	Plays are recorded as (RunClock time, AudioInfo name, at_sample).
+	"""
+	def __init__(self, clock: Optional[RunClock] = None) -> None:
+		super(SimulatedGlobalAudio, self).__init__()
+		self.clock = global_clock if clock is None else clock
+		self.plays = []  # type: List[Tuple[int, str, Optional[int]]]
+
+	def play(self, info: AudioInfo, blocking: bool = False, at_sample: Optional[int] = None, gain: float = 1.0):
+		assert self.is_on, "Cannot play sound because the audio service is off"
+		if info.intensity > 0:
+			with tracer.span('audio.play', 'audio', sound=info.name, simulated=True):
+				self.plays.append((self.clock.now_ns(), info.name, at_sample))
+
+	def __repr__(self) -> str:
+		return "SimulatedGlobalAudio(plays={})".format(len(self.plays))
+	def __str__(self): return repr(self)
+
+
+__all__ = ['SimulatedPymata', 'SimulatedBoard', 'SimulatedGlobalAudio']
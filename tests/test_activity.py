@@ -0,0 +1,64 @@
+import math
+
+import numpy as np
+import pytest
+
+from sauronlib.camera.activity import ActivityTrace
+
+HEIGHT, WIDTH = 10, 20
+
+
+def _square(x: int, y: int = 3, size: int = 4, value: int = 200, channels=(0, 1, 2)) -> np.ndarray:
+    """A black BGR frame with a size × size square of value at (x, y) in the given channels."""
+    frame = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+    for c in channels:
+        frame[y:y + size, x:x + size, c] = value
+    return frame
+
+
+class TestActivityTrace:
+    def test_mean_difference_of_a_moving_square(self):
+        trace = ActivityTrace()
+        # still, then one pixel right, then two pixels right, then to a square that doesn't overlap
+        frames = [_square(2), _square(2), _square(3), _square(5), _square(12)]
+        values = [trace.update(f) for f in frames]
+        assert math.isnan(values[0])
+        n = HEIGHT * WIDTH
+        assert values[1:] == pytest.approx([0, 2 * 4 * 200 / n, 2 * 2 * 4 * 200 / n, 2 * 16 * 200 / n])
+
+    def test_fraction_changed_with_threshold(self):
+        trace = ActivityTrace(threshold=50)
+        frames = [_square(2), _square(3), _square(3, value=240), _square(4, value=240)]
+        values = [trace.update(f) for f in frames]
+        n = HEIGHT * WIDTH
+        # brightening by 40 is under the threshold
+        assert values[1:] == pytest.approx([2 * 4 / n, 0, 2 * 4 / n])
+
+    def test_compares_only_its_channel(self):
+        trace = ActivityTrace(channel=1)
+        values = [trace.update(_square(x, channels=(0, 2))) for x in [2, 6, 10]]
+        assert values[1:] == [0, 0]
+        gray = ActivityTrace(channel=None)
+        values = [gray.update(_square(x)[..., 0]) for x in [2, 3]]
+        assert values[1] == pytest.approx(2 * 4 * 200 / (HEIGHT * WIDTH))
+
+    def test_reset_and_new_size_restart_the_trace(self):
+        trace = ActivityTrace()
+        trace.update(_square(2))
+        assert trace.update(_square(3)) > 0
+        trace.reset()
+        assert math.isnan(trace.update(_square(3)))
+        assert math.isnan(trace.update(np.zeros((5, 5, 3), dtype=np.uint8)))
+        assert trace.update(np.zeros((5, 5, 3), dtype=np.uint8)) == 0
+
+    def test_reuses_its_buffers(self):
+        trace = ActivityTrace()
+        trace.update(_square(2))
+        previous, diff = trace._previous, trace._diff
+        for x in range(3, 10):
+            trace.update(_square(x))
+        assert trace._previous is previous and trace._diff is diff
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,89 @@
+import os
+import tempfile
+
+import numpy as np
+import pytest
+
+from sauronlib.alignment import RunAlignment, match_indices, parse_stamps, read_sensor_csv, read_timestamps
+from sauronlib.clock import RunClock
+from sauronlib.scheduling.stimulus_time_log import StimulusTimeLog, StimulusTimeRecord
+from sauronlib.stimulus import Stimulus, StimulusType
+
+
+class TestMatchIndices:
+    times = np.array([10, 20, 30], dtype=np.int64)
+    targets = np.array([5, 10, 14, 16, 30, 40], dtype=np.int64)
+
+    def test_backward(self):
+        assert list(match_indices(self.times, self.targets, "backward")) == [-1, 0, 0, 0, 2, 2]
+
+    def test_forward(self):
+        assert list(match_indices(self.times, self.targets, "forward")) == [0, 0, 1, 1, 2, -1]
+
+    def test_nearest(self):
+        assert list(match_indices(self.times, self.targets, "nearest")) == [0, 0, 0, 1, 2, 2]
+
+    def test_tolerance(self):
+        assert list(match_indices(self.times, self.targets, "nearest", tolerance_ns=4)) == [-1, 0, 0, 1, 2, -1]
+
+    def test_empty(self):
+        assert list(match_indices(np.empty(0, dtype=np.int64), self.targets)) == [-1] * 6
+
+    def test_bad_direction(self):
+        with pytest.raises(ValueError):
+            match_indices(self.times, self.targets, "sideways")
+
+
+class TestReadFiles:
+    def test_fast_parser_matches_pandas(self):
+        clock = RunClock()
+        times_ns = [clock.monotonic_anchor_ns + i * 33_333_333 for i in range(500)]
+        stamps = [clock.stamp(t) for t in times_ns]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "timestamps.txt")
+            with open(path, "w", newline="") as f:
+                f.write("\r\n".join(stamps))  # CRLF, and no final newline
+            stream = read_timestamps(path, "cam0")
+        assert list(stream.times_ns) == list(parse_stamps(stamps))
+        assert list(stream.values) == list(range(500))
+
+    def test_sensor_csv(self):
+        clock = RunClock()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "thermometer.csv")
+            with open(path, "w") as f:
+                f.write("Value,Time\n")
+                for i in range(5):
+                    f.write("{},{}\n".format(20 + i / 2, clock.stamp(clock.monotonic_anchor_ns + i * 10**9)))
+            stream = read_sensor_csv(path)
+        assert list(stream.values) == [20.0, 20.5, 21.0, 21.5, 22.0]
+        assert list(np.diff(stream.times_ns)) == [10**9] * 4
+
+
+class TestRunAlignment:
+    def test_from_files(self):
+        clock = RunClock()
+        t0 = clock.monotonic_anchor_ns
+        ms = 1_000_000
+        log = StimulusTimeLog(clock=clock)
+        log.start_ns = t0
+        for t, intensity in [(100, 255), (300, 0)]:
+            log.append(StimulusTimeRecord(Stimulus("led", "led", intensity, None, StimulusType.DIGITAL), t0 + t * ms))
+        log.finish_future(t0 + 500 * ms)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            log_path = os.path.join(temp_dir, "stimuli.csv")
+            log.write(log_path)
+            camera_path = os.path.join(temp_dir, "cam0.txt")
+            with open(camera_path, "w") as f:
+                f.writelines(clock.stamp(t0 + t * ms) + "\n" for t in range(0, 500, 50))
+            run = RunAlignment.from_files(log_path, camera_timestamps_paths={"cam0": camera_path})
+        assert (run.start_ns, run.end_ns) == tuple(parse_stamps([clock.stamp(t0), clock.stamp(t0 + 500 * ms)]))
+        events = run.by_stimulus(direction="nearest")
+        assert list(events["intensity"]) == [255, 0]
+        assert list(events["cam0"]) == [2, 6]
+        frames = run.by_frame("cam0")
+        assert list(frames["stimulus_led"]) == [0, 0, 255, 255, 255, 255, 0, 0, 0, 0]
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,31 @@
+import os
+import tempfile
+
+import numpy as np
+import pytest
+
+from sauronlib.alignment import read_sensor_csv
+from sauronlib.sensors.arduino_sensor import Thermometer
+
+
+class TestArduinoCsvSensor:
+    def test_rearming_appends_without_another_header(self):
+        callbacks = []
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "thermometer.csv")
+            sensor = Thermometer(path, callbacks.append, lambda: None)
+            for values in [[20.5, 21.0], [22.5]]:
+                sensor.arm()
+                for value in values:
+                    callbacks[-1]([0, value])
+                sensor.disarm()
+            with open(path) as f:
+                lines = f.read().splitlines()
+            assert lines[0] == "Value,Time" and lines.count("Value,Time") == 1
+            stream = read_sensor_csv(path)
+            assert list(stream.values) == [20.5, 21.0, 22.5]
+            assert np.all(np.diff(stream.times_ns) >= 0)
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,63 @@
+import time
+
+import numpy as np
+import pytest
+
+from sauronlib.audio_handler import DefaultSmartGlobalAudio, GlobalAudio, OsAudioSetting
+from sauronlib.audio_info import AudioInfo
+from sauronlib.audio_output import AudioOutputEngine
+
+
+class _Wave:
+    def __init__(self, n_samples: int) -> None:
+        self.audio_data = np.ones(n_samples, dtype=np.int16).tobytes()
+
+
+def _engine(sample_rate: int = 1000) -> AudioOutputEngine:
+    # not started: anchors sample 0 to now, as the first callback would
+    engine = AudioOutputEngine(sample_rate=sample_rate)
+    engine._anchor = (0, engine.clock.now_ns())
+    return engine
+
+
+class TestGlobalAudio:
+    def test_time_of_inverts_sample_at(self):
+        engine = _engine()
+        for sample in [0, 1, 500, 12345]:
+            assert engine.sample_at(engine.time_of(sample)) == sample
+
+    def test_blocking_play_honors_at_sample(self):
+        engine = _engine()
+        audio = GlobalAudio(engine)
+        audio.is_on = True
+        info = AudioInfo("beep", _Wave(100), 100, 255)
+        t0 = time.monotonic()
+        audio.play(info, blocking=True, at_sample=200)  # starts at 0.2s and lasts 0.1s
+        elapsed = time.monotonic() - t0
+        assert 0.28 <= elapsed < 0.5
+        start, _, samples, _ = engine._incoming.get_nowait()
+        assert start == 200 and len(samples) == 100
+
+    def test_at_sample_without_engine(self):
+        audio = GlobalAudio()
+        audio.is_on = True
+        with pytest.raises(ValueError):
+            audio.play(AudioInfo("beep", _Wave(100), 100, 255), at_sample=200)
+
+
+class TestDefaultSmartGlobalAudio:
+    def test_apply_caches_settings(self):
+        audio = DefaultSmartGlobalAudio(None, None, None, None, timeout_secs=10)
+        stage = [OsAudioSetting("input_gain:{}".format(i), "x", ["true"], ["echo", "y"]) for i in range(8)]
+        stage.append(OsAudioSetting("output_gain", "x", ["false"], ["echo", "x"]))  # already satisfied, so never set
+        audio._DefaultSmartGlobalAudio__apply([stage])
+        assert audio._current == {s.name: "x" for s in stage}
+        audio._DefaultSmartGlobalAudio__apply([[OsAudioSetting("input_device", "mic", ["true"])]])
+        # switching the input device forgets the gains read from the old one
+        assert audio._current == {"output_gain": "x", "input_device": "mic"}
+        audio.refresh()
+        assert audio._current == {}
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,84 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pydub
+import pytest
+
+from sauronlib.audio_info import AudioInfo, AudioRenderCache
+
+
+class _Wave:
+    def __init__(self, n_bytes: int) -> None:
+        self.audio_data = bytes(n_bytes)
+
+
+class TestAudioRenderCache:
+    @pytest.fixture
+    def slow_render(self, monkeypatch):
+        calls = []
+        lock = threading.Lock()
+
+        def render(song, applied_length, *args):
+            with lock:
+                calls.append(applied_length)
+            time.sleep(0.2)
+            return _Wave(applied_length)
+
+        monkeypatch.setattr(AudioInfo, "render", staticmethod(render))
+        return calls
+
+    def test_renders_each_key_once(self, slow_render):
+        cache = AudioRenderCache()
+        digest = cache.add_base(pydub.AudioSegment.silent(duration=100))
+        key = (digest, 100, 255, -50, 2, 44100)
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            waves = list(pool.map(lambda _: cache.render(key), range(4)))
+        assert slow_render == [100]
+        assert all(w is waves[0] for w in waves)
+        assert cache.is_rendered(key) and cache.n_rendered() == 1
+
+    def test_renders_different_keys_concurrently(self, slow_render):
+        cache = AudioRenderCache()
+        digest = cache.add_base(pydub.AudioSegment.silent(duration=100))
+        keys = [(digest, length, 255, -50, 2, 44100) for length in [10, 20, 30, 40]]
+        t0 = time.monotonic()
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(cache.render, keys))
+        assert time.monotonic() - t0 < 0.6  # 0.8s if serialized behind the lock
+        assert sorted(slow_render) == [10, 20, 30, 40]
+        assert cache.n_rendered() == 4
+
+    def test_failed_render_can_be_retried(self, monkeypatch):
+        cache = AudioRenderCache()
+        digest = cache.add_base(pydub.AudioSegment.silent(duration=100))
+        key = (digest, 100, 255, -50, 2, 44100)
+
+        def fail(*args):
+            raise IOError("render failed")
+
+        monkeypatch.setattr(AudioInfo, "render", staticmethod(fail))
+        with pytest.raises(IOError):
+            cache.render(key)
+        monkeypatch.setattr(AudioInfo, "render", staticmethod(lambda song, length, *args: _Wave(length)))
+        assert len(cache.render(key).audio_data) == 100
+
+    def test_live_infos_share_one_buffer_per_key(self, monkeypatch):
+        monkeypatch.setattr(AudioInfo, "render", staticmethod(lambda song, length, *args: _Wave(length)))
+        cache = AudioRenderCache()
+        song = pydub.AudioSegment.silent(duration=100)
+        loud = [AudioInfo.build("tone", song, 1000, 255, cache=cache) for _ in range(50)]
+        quiet = [info.derive(1000, 100) for info in loud]
+        for info in loud + quiet:
+            info.samples()
+        assert len({id(info.wave_obj) for info in loud}) == 1
+        assert len({id(info.wave_obj) for info in quiet}) == 1
+        assert np.shares_memory(loud[0].samples(), loud[-1].samples())
+        assert not np.shares_memory(loud[0].samples(), quiet[0].samples())
+        assert cache.n_rendered() == 2
+        assert cache.nbytes() == len(song.raw_data) + 2 * 1000
+
+
+if __name__ == "__main__":
+    pytest.main()
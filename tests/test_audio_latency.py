@@ -0,0 +1,46 @@
+import math
+
+import numpy as np
+import pytest
+
+from sauronlib.audio_latency import chirp, find_delays, synthetic_recording
+
+
+class TestFindDelays:
+    sample_rate = 44100
+    start_ns = 1_000_000_000
+
+    def _recording(self, probe, scheduled_ns, delays_ms, noise=0.01):
+        n_samples = int((scheduled_ns[-1] - self.start_ns) * self.sample_rate / 1e9) + self.sample_rate
+        return synthetic_recording(probe, self.sample_rate, self.start_ns, scheduled_ns, delays_ms, n_samples, noise=noise)
+
+    def test_recovers_known_delays(self):
+        probe = chirp(self.sample_rate)
+        scheduled_ns = [self.start_ns + i * 500_000_000 for i in range(1, 11)]
+        delays_ms = [3.0, 12.5, 25.0, 40.2, 0.0, 7.7, 60.0, 18.1, 33.3, 5.5]
+        recording = self._recording(probe, scheduled_ns, delays_ms)
+        report = find_delays(recording, self.sample_rate, self.start_ns, probe, scheduled_ns)
+        # within one sample
+        assert report.delays_ms == pytest.approx(delays_ms, abs=1000 / self.sample_rate)
+        assert report.n_missing() == 0
+        assert report.offset_ms() == pytest.approx(np.median(delays_ms), abs=0.05)
+
+    def test_recovers_delays_in_noise(self):
+        probe = chirp(self.sample_rate)
+        scheduled_ns = [self.start_ns + i * 300_000_000 for i in range(1, 6)]
+        delays_ms = [10.0, -5.0, 150.0, 42.0, 1.0]
+        recording = self._recording(probe, scheduled_ns, delays_ms, noise=0.2)
+        report = find_delays(recording, self.sample_rate, self.start_ns, probe, scheduled_ns)
+        assert report.delays_ms == pytest.approx(delays_ms, abs=0.1)
+
+    def test_probe_outside_recording_is_missing(self):
+        probe = chirp(self.sample_rate)
+        scheduled_ns = [self.start_ns + 500_000_000, self.start_ns + 60_000_000_000]
+        recording = self._recording(probe, scheduled_ns[:1], [20.0])
+        report = find_delays(recording, self.sample_rate, self.start_ns, probe, scheduled_ns)
+        assert report.n_missing() == 1 and math.isnan(report.delays_ms[1])
+        assert report.found() == pytest.approx([20.0], abs=0.05)
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from sauronlib.audio_output import AudioMixer, AudioOutputEngine
+
+
+def _blocks(engine: AudioOutputEngine, n: int, status: int = 0):
+    """Calls the stream callback n times, as the device would, and returns the output samples."""
+    out = []
+    for _ in range(n):
+        data, _ = engine._callback(None, engine.frames_per_buffer, {}, status)
+        out.extend(np.frombuffer(data, dtype=np.int16).tolist())
+    return out
+
+
+class TestAudioMixer:
+    def test_mixes_overlapping_voices_at_their_offsets(self):
+        mixer = AudioMixer(8)
+        a = np.full(4, 100, dtype=np.int16)
+        b = np.full(10, 10, dtype=np.int16)
+        out = mixer.mix([(2, 0, a, 1.0), (-3, 1, b, 1.0)], 0, 8)
+        # b started 3 samples before this block, so 7 of its samples remain
+        assert list(out) == [10, 10, 110, 110, 110, 110, 10, 0]
+        assert mixer.n_clipped == 0
+
+    def test_gain(self):
+        mixer = AudioMixer(4)
+        out = mixer.mix([(0, 0, np.full(4, 1000, dtype=np.int16), 0.5)], 0, 4)
+        assert list(out) == [500] * 4
+
+    def test_clips_and_counts(self):
+        mixer = AudioMixer(4)
+        loud = np.full(4, 30000, dtype=np.int16)
+        out = mixer.mix([(0, 0, loud, 1.0), (2, 1, loud, 1.0)], 0, 4)
+        assert list(out) == [30000, 30000, 32767, 32767]
+        assert mixer.n_clipped == 2
+
+    def test_voice_outside_block(self):
+        mixer = AudioMixer(4)
+        out = mixer.mix([(10, 0, np.ones(4, dtype=np.int16), 1.0)], 0, 4)
+        assert list(out) == [0] * 4
+
+    def test_grows_for_larger_blocks(self):
+        mixer = AudioMixer(4)
+        out = mixer.mix([(0, 0, np.arange(16, dtype=np.int16), 1.0)], 4, 12)
+        assert list(out) == list(range(4, 16))
+
+
+class TestAudioOutputEngineCallback:
+    def test_starts_at_the_scheduled_sample(self):
+        engine = AudioOutputEngine(sample_rate=1000, frames_per_buffer=8)
+        engine.schedule(np.full(2, 5, dtype=np.int16), 3)
+        engine.schedule(np.full(3, 7, dtype=np.int16), 16)
+        out = _blocks(engine, 3)
+        assert out == [0, 0, 0, 5, 5, 0, 0, 0] + [0] * 8 + [7, 7, 7, 0, 0, 0, 0, 0]
+        assert engine.position() == 16 and engine.n_late == 0
+
+    def test_continues_across_a_block_boundary(self):
+        engine = AudioOutputEngine(sample_rate=1000, frames_per_buffer=8)
+        samples = np.arange(1, 13, dtype=np.int16)
+        engine.schedule(samples, 5)
+        out = _blocks(engine, 3)
+        assert out[:5] == [0] * 5
+        assert out[5:17] == list(range(1, 13))
+        assert out[17:] == [0] * 7
+        assert engine._active == []
+
+    def test_buffers_scheduled_between_callbacks(self):
+        engine = AudioOutputEngine(sample_rate=1000, frames_per_buffer=8)
+        _blocks(engine, 1)
+        engine.schedule(np.full(2, 3, dtype=np.int16), 10)
+        engine.schedule(np.full(2, 4, dtype=np.int16))  # as soon as possible
+        engine.schedule(np.full(2, 6, dtype=np.int16), 2)  # already passed, so late
+        out = _blocks(engine, 1, status=4)  # paOutputUnderflow
+        assert out == [10, 10, 3, 3, 0, 0, 0, 0]
+        assert engine.n_late == 1 and engine.n_underflows == 1
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+from sauronlib.scheduling.block_scheduler import Block, BlockScheduler, track_events
+from sauronlib.scheduling.streaming_schedule import StreamingSchedule
+
+
+class _Frames:
+    """Frames that record how far they've been read."""
+
+    def __init__(self, frames: np.ndarray) -> None:
+        self.frames = frames
+        self.read_to = 0
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def __getitem__(self, item: slice) -> np.ndarray:
+        self.read_to = max(self.read_to, min(item.stop, len(self.frames)))
+        return self.frames[item]
+
+
+def _values(events):
+    return [(ms, e if isinstance(e, str) else e.intensity) for ms, e in events]
+
+
+def _keyed(events):
+    return [(ms, e if isinstance(e, str) else (e.key, e.intensity)) for ms, e in events]
+
+
+def _random_blocks(rng, n_blocks, block_ms):
+    return [
+        Block("block-{}".format(b), b * (block_ms + 5), np.repeat(rng.randint(0, 3, size=block_ms // 10) * 100, 10))
+        for b in range(n_blocks)
+    ]
+
+
+class TestTrackEvents:
+    def test_yields_changes_as_found(self):
+        frames = np.zeros(1000000, dtype=np.uint8)
+        frames[10:20] = 255
+        frames[500000:500010] = 255
+        recorded = _Frames(frames)
+        events = track_events("led", 1, None, [Block("assay", 0, recorded)], chunk_ms=1000)
+        assert _values([next(events), next(events), next(events)]) == [(0, "assay"), (10, 255), (20, 0)]
+        assert recorded.read_to == 1000
+        assert _values(events) == [(500000, 255), (500010, 0), (999999, 0)]
+
+    def test_gaps_and_adjacent_blocks(self):
+        blocks = [
+            Block("a", 0, np.array([0, 5, 5])),
+            Block("b", 3, np.array([5, 0])),  # adjacent, so the 5 continues
+            Block("c", 10, np.array([7])),
+        ]
+        assert _values(track_events("led", 1, None, blocks, chunk_ms=2)) == [
+            (0, "a"), (1, 5), (3, "b"), (4, 0), (4, 0), (10, "c"), (10, 7), (10, 0)
+        ]
+
+
+class TestBlockScheduler:
+    def test_build_is_a_stable_merge_of_tracks(self):
+        rng = np.random.RandomState(0)
+        tracks = [("stim-{}".format(i), _random_blocks(rng, 4, 200)) for i in range(5)]
+        scheduler = BlockScheduler(1000)
+        for name, blocks in tracks:
+            scheduler.append(name, name, None, blocks)
+        schedule = scheduler.build()
+        assert schedule.in_order
+        # the same as concatenating the tracks and sorting stably by time
+        expected = sorted(
+            [e for name, blocks in tracks for e in track_events(name, name, None, blocks)], key=lambda e: e[0]
+        )
+        assert _keyed(schedule.events()) == _keyed(expected)
+        assert schedule.assay_positions == [(b.start, b.name) for _, blocks in tracks for b in blocks]
+
+    def test_replace_and_remove(self):
+        rng = np.random.RandomState(1)
+        a, b, c = (_random_blocks(rng, 2, 100) for _ in range(3))
+        scheduler = BlockScheduler(500).append("a", "a", None, a).append("b", "b", None, b)
+        scheduler.replace("a", "a", None, c)
+        assert scheduler.track_names() == ["a", "b"]
+        expected = BlockScheduler(500).append("a", "a", None, c).append("b", "b", None, b).build()
+        assert _keyed(scheduler.build().events()) == _keyed(expected.events())
+        scheduler.remove("a")
+        assert {e.key for _, e in scheduler.build().events() if not isinstance(e, str)} == {"b"}
+
+    def test_append_merges_into_track(self):
+        blocks = _random_blocks(np.random.RandomState(2), 4, 100)
+        whole = BlockScheduler(500).append("a", "a", None, blocks).build()
+        split = BlockScheduler(500).append("a", "a", None, blocks[2:]).append("a", "a", None, blocks[:2]).build()
+        # the blocks are separated by gaps, so splitting them doesn't change their events
+        assert _keyed(split.events()) == _keyed(whole.events())
+
+    def test_streaming_schedule_matches_build(self):
+        rng = np.random.RandomState(3)
+        tracks = [("stim-{}".format(i), _random_blocks(rng, 3, 300)) for i in range(4)]
+        scheduler = BlockScheduler(1000)
+        streaming = StreamingSchedule(1000, chunk_ms=70)
+        for name, blocks in tracks:
+            scheduler.append(name, name, None, blocks)
+            streaming.append(name, name, None, lambda blocks=blocks: iter(blocks))
+        built = scheduler.build()
+        assert _keyed(streaming.events()) == _keyed(built.events())
+        assert streaming.n_events() == built.n_events()
+        assert streaming.assay_positions == built.assay_positions
+
+
+if __name__ == "__main__":
+    pytest.main()
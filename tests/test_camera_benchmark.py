@@ -0,0 +1,34 @@
+import tempfile
+import tracemalloc
+
+import pytest
+
+from sauronlib.camera.benchmark import benchmark_stream
+from sauronlib.camera.camera_config import Roi
+from sauronlib.camera.synthetic import SyntheticWebcam
+
+
+class TestBenchmarkStream:
+    def test_times_a_stream_without_tracemalloc(self, monkeypatch):
+        tracing = []
+        stream = SyntheticWebcam.stream
+
+        def traced_stream(self, *args):
+            tracing.append(tracemalloc.is_tracing())
+            stream(self, *args)
+
+        monkeypatch.setattr(SyntheticWebcam, "stream", traced_stream)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            result = benchmark_stream(Roi(0, 0, 32, 24), 20, 250, temp_dir, memory_milliseconds=100)
+        assert tracing == [False, True]
+        assert result["n_captured"] == 5 and result["sustained_fps"] > 0
+        assert result["peak_memory_mb"] > 0
+
+    def test_memory_can_be_skipped(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            result = benchmark_stream(Roi(0, 0, 32, 24), 20, 100, temp_dir, memory_milliseconds=0)
+        assert result["peak_memory_mb"] is None and result["n_captured"] == 2
+
+
+if __name__ == "__main__":
+    pytest.main()
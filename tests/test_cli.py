@@ -0,0 +1,73 @@
+import json
+import os
+import tempfile
+
+import pytest
+from typer.testing import CliRunner
+
+import sauronlib.benchmark
+from sauronlib.cli import cli
+from sauronlib.scheduling.schedule import Schedule
+from sauronlib.stimulus import Stimulus, StimulusType
+
+
+def _write_schedule(path: str) -> None:
+    stimulus_list = [(0, "assay")]
+    for ms in range(0, 200, 20):
+        stimulus_list.append((ms, Stimulus("led", "led", 1 - ms // 20 % 2, None, StimulusType.DIGITAL)))
+    Schedule(stimulus_list, [(0, "assay")], 200).write(path)
+
+
+class TestBenchRun:
+    def test_headers_are_union_of_result_keys(self, monkeypatch):
+        report = {
+            "system": {"python": "3"},
+            "scenarios": {
+                "camera": {
+                    "seconds": 1.0,
+                    "results": [
+                        {"mode": "stream", "fps": 30.0, "drop_rate": 0.0},
+                        {"mode": "burst", "fps": 10.0, "burst_ms": 12.5},
+                    ],
+                }
+            },
+        }
+        monkeypatch.setattr(sauronlib.benchmark, "run_scenarios", lambda names, quick: report)
+        result = CliRunner().invoke(cli, ["bench", "run", "camera"])
+        assert result.exit_code == 0, result.output
+        header = next(line for line in result.output.splitlines() if "mode" in line)
+        assert [h.strip() for h in header.strip("|").split("|")] == ["mode", "fps", "drop_rate", "burst_ms"]
+        assert "12.5" in result.output
+
+
+class TestRun:
+    def test_simulated_run(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            schedule_path = os.path.join(temp_dir, "schedule.json")
+            _write_schedule(schedule_path)
+            output = os.path.join(temp_dir, "out")
+            result = CliRunner().invoke(cli, ["run", schedule_path, "--simulate", "--output", output, "--progress-secs", "0.05"])
+            assert result.exit_code == 0, result.output
+            with open(os.path.join(output, "timing.json"), encoding="utf8") as f:
+                summary = json.load(f)
+            assert summary["simulated"] is True
+            assert summary["n_events"] == summary["n_applied"] == 10
+            assert summary["actual_ms"] >= 200
+            with open(os.path.join(output, "stimuli.csv")) as f:
+                lines = f.read().splitlines()
+            assert lines[0] == "datetime,id,intensity" and len(lines) == 1 + 1 + 10 + 1
+            assert lines[2].endswith(",led,1") and lines[3].endswith(",led,0")
+
+    def test_engine_cannot_be_simulated(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            schedule_path = os.path.join(temp_dir, "schedule.json")
+            _write_schedule(schedule_path)
+            output = os.path.join(temp_dir, "out")
+            result = CliRunner().invoke(cli, ["run", schedule_path, "--simulate", "--engine", "--output", output])
+            assert result.exit_code == 2
+            assert "--engine" in result.output
+            assert not os.path.exists(output)
+
+
+if __name__ == "__main__":
+    pytest.main()
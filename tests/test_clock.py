@@ -0,0 +1,40 @@
+import time
+
+import numpy as np
+import pytest
+
+from sauronlib.alignment import parse_stamps
+from sauronlib.clock import RunClock
+
+
+class TestRunClock:
+    def test_monotonic_to_wall(self):
+        clock = RunClock()
+        now_ns = clock.now_ns()
+        assert abs(clock.to_wall_ns(now_ns) - time.time_ns()) < 50_000_000
+        assert clock.elapsed_ns(clock.monotonic_anchor_ns + 123) == 123
+
+    def test_to_wall_ns_on_arrays(self):
+        clock = RunClock()
+        times = np.array([clock.monotonic_anchor_ns, clock.monotonic_anchor_ns + 10**9], dtype=np.int64)
+        assert list(clock.to_wall_ns(times) - clock.wall_anchor_ns) == [0, 10**9]
+
+    def test_stamp_round_trips_to_the_microsecond(self):
+        clock = RunClock()
+        offsets_ns = [0, 1_000, 999_999, 86_400_000_000_123]
+        times_ns = [clock.monotonic_anchor_ns + offset for offset in offsets_ns]
+        parsed = parse_stamps([clock.stamp(t) for t in times_ns])
+        expected = [np.datetime64(clock.to_datetime(t), "ns").astype(np.int64) for t in times_ns]
+        assert list(parsed) == expected
+        # each is truncated to the microsecond since the anchor
+        assert list(parsed - parsed[0]) == [offset // 1000 * 1000 for offset in offsets_ns]
+
+    def test_stamps_are_evenly_spaced(self):
+        clock = RunClock()
+        times_ns = [clock.monotonic_anchor_ns + i * 1_500_000 for i in range(100)]
+        parsed = parse_stamps([clock.stamp(t) for t in times_ns])
+        assert set(np.diff(parsed).tolist()) == {1_500_000}
+
+
+if __name__ == "__main__":
+    pytest.main()
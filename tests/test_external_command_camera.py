@@ -0,0 +1,30 @@
+import tempfile
+
+import pytest
+
+from sauronlib.camera.camera_config import CameraConfig, Roi
+from sauronlib.camera.external_command_camera import CameraCommandFailedError, ExternalCommandCamera
+
+
+class _EchoCamera(ExternalCommandCamera):
+    def _stream_executable(self) -> str:
+        return "echo"
+
+
+class TestExternalCommandCamera:
+    def test_wait_before_start(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            camera = _EchoCamera(CameraConfig(30, Roi(0, 0, 32, 24)), temp_dir, temp_dir + "/out.txt", temp_dir + "/err.txt")
+            with pytest.raises(CameraCommandFailedError):
+                camera.wait()
+            camera.stop()  # does nothing
+
+    def test_wait_after_start(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            camera = _EchoCamera(CameraConfig(30, Roi(0, 0, 32, 24)), temp_dir, temp_dir + "/out.txt", temp_dir + "/err.txt")
+            camera.start(100, temp_dir + "/video.avi", temp_dir + "/timestamps.txt")
+            assert camera.wait(timeout_secs=10) == 0
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,66 @@
+import os
+import tempfile
+
+import numpy as np
+import pytest
+
+from sauronlib.camera.camera_config import CameraConfig, Roi
+from sauronlib.camera.frame_pool import FramePool
+from sauronlib.camera.synthetic import SyntheticWebcam
+
+
+class TestFramePool:
+    def test_reuses_buffers(self):
+        pool = FramePool(3, (4, 5, 3))
+        allocated = {id(b) for b in pool._free}
+        seen = set()
+        for _ in range(20):
+            buffer = pool.acquire()
+            assert buffer.shape == (4, 5, 3) and buffer.dtype == np.uint8
+            seen.add(id(buffer))
+            pool.release(buffer)
+        assert seen <= allocated
+        assert pool.n_free() == 3 and pool.n_exhausted == 0
+
+    def test_returns_none_when_exhausted(self):
+        pool = FramePool(2, (4, 5))
+        held = [pool.acquire(), pool.acquire()]
+        assert held[0] is not held[1]
+        assert pool.acquire() is None and pool.acquire() is None
+        assert pool.n_exhausted == 2 and pool.n_free() == 0
+        pool.release(held[0])
+        assert pool.acquire() is held[0]
+        assert pool.n_exhausted == 2
+
+    def test_never_holds_more_than_its_size(self):
+        pool = FramePool(2, (4, 5))
+        pool.release(np.empty((4, 5), dtype=np.uint8))
+        assert pool.n_free() == 2
+
+    def test_reshape_discards_old_buffers(self):
+        pool = FramePool(2, (4, 5, 3))
+        old = pool.acquire()
+        pool.reshape((6, 8, 3))
+        assert pool.n_reallocated == 1 and pool.n_free() == 2
+        pool.release(old)
+        assert pool.n_free() == 2
+        assert pool.acquire().shape == (6, 8, 3)
+        pool.reshape((6, 8, 3))
+        assert pool.n_reallocated == 1
+        assert pool.nbytes() == 2 * 6 * 8 * 3
+
+    def test_stream_returns_every_buffer(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with SyntheticWebcam(CameraConfig(50, Roi(0, 0, 32, 24)), temp_dir, queue_size=4) as camera:
+                camera.stream(200, os.path.join(temp_dir, "video.avi"), os.path.join(temp_dir, "timestamps.txt"))
+                pool = camera.frame_pool
+                allocated = {id(b) for b in pool._free}
+                assert pool.n_free() == pool.size == 6
+                camera.stream(200, os.path.join(temp_dir, "video2.avi"), os.path.join(temp_dir, "timestamps2.txt"))
+                assert camera.frame_pool is pool and pool.n_reallocated == 0
+                assert {id(b) for b in pool._free} == allocated
+                assert camera.stream_stats.n_encoded == 10
+
+
+if __name__ == "__main__":
+    pytest.main()
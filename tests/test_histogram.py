@@ -0,0 +1,43 @@
+import math
+
+import numpy as np
+import pytest
+
+from sauronlib.histogram import Histogram
+
+
+class TestHistogram:
+    def test_empty(self):
+        h = Histogram()
+        assert h.count == 0 and math.isnan(h.mean()) and math.isnan(h.percentile(50))
+
+    def test_small_values_are_exact(self):
+        h = Histogram()
+        for value in range(64):
+            h.add(value)
+        assert h.percentile(50) == 31 and h.min == 0 and h.max == 63 and h.last == 63
+        assert h.mean() == pytest.approx(31.5)
+
+    def test_percentiles_within_bucket_precision(self):
+        values = np.random.RandomState(0).lognormal(12, 2, 20000).astype(np.int64)
+        h = Histogram()
+        for value in values.tolist():
+            h.add(value)
+        assert h.count == len(values) and h.max == values.max() and h.min == values.min()
+        assert h.mean() == pytest.approx(values.mean())
+        for p in [10, 50, 90, 99]:
+            assert h.percentile(p) == pytest.approx(np.percentile(values, p), rel=1 / 32)
+        assert h.percentile(100) == values.max()
+
+    def test_fixed_size(self):
+        h = Histogram(max_value=1 << 20)
+        n_buckets = len(h._counts)
+        for value in [-5, 0, 1 << 30, 1 << 50]:
+            h.add(value)
+        assert len(h._counts) == n_buckets
+        assert h.min == -5 and h.max == 1 << 50
+        assert h.summary(scale=1000)["n"] == 4
+
+
+if __name__ == "__main__":
+    pytest.main()
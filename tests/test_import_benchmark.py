@@ -0,0 +1,15 @@
+import pytest
+
+from sauronlib.import_benchmark import check_import_budget, default_modules
+
+
+class TestImportBudget:
+    def test_within_budget(self):
+        # raises ImportBudgetExceededError, naming the modules, if any is over 250ms or loads a deferred module
+        results = check_import_budget(default_modules, budget_ms=250, n_runs=3)
+        assert [r["module"] for r in results] == list(default_modules)
+        assert all(r["median_ms"] <= 250 and r["deferred_loaded"] == [] for r in results)
+
+
+if __name__ == "__main__":
+    pytest.main()
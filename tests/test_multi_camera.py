@@ -0,0 +1,64 @@
+import os
+import tempfile
+import time
+from functools import partial
+
+import pytest
+
+from sauronlib.camera.camera_config import CameraConfig, Roi
+from sauronlib.camera.multi_camera import MultiCameraCapture
+from sauronlib.camera.synthetic import SyntheticWebcam
+
+
+def _capture(temp_dir: str, n_cameras: int) -> MultiCameraCapture:
+    factories = [partial(SyntheticWebcam, CameraConfig(20, Roi(0, 0, 32, 24)), temp_dir) for _ in range(n_cameras)]
+    return MultiCameraCapture(factories, barrier_timeout_secs=30, report_interval_secs=0.1)
+
+
+def _outputs(temp_dir: str, n_cameras: int):
+    return [
+        (os.path.join(temp_dir, "cam{}.avi".format(i)), os.path.join(temp_dir, "cam{}.txt".format(i)))
+        for i in range(n_cameras)
+    ]
+
+
+def _n_lines(path: str) -> int:
+    with open(path) as f:
+        return len(f.read().splitlines())
+
+
+class TestMultiCameraCapture:
+    def test_cameras_start_together_and_write_their_own_files(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            capture = _capture(temp_dir, 2)
+            outputs = _outputs(temp_dir, 2)
+            reports = capture.run(500, outputs)
+            assert [r.error for r in reports] == [None, None]
+            assert [r.n_captured for r in reports] == [10, 10]
+            for _, timestamps_path in outputs:
+                assert _n_lines(timestamps_path) == 10
+            # both were released by the same barrier
+            assert abs(reports[0].released_ns - reports[1].released_ns) < 100 * 1000000
+            assert capture.start_skew_ms() < 100
+
+    def test_stop_ends_every_camera(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            capture = _capture(temp_dir, 2)
+            outputs = _outputs(temp_dir, 2)
+            capture.start(60000, outputs)
+            deadline = time.monotonic() + 30
+            while any(r.n_captured is None or r.n_captured < 5 for r in capture.reports):
+                assert time.monotonic() < deadline, "the cameras never started"
+                time.sleep(0.05)
+            capture.stop()
+            reports = capture.wait(timeout_secs=30)
+            assert [r.error for r in reports] == [None, None]
+            assert all(r.finished_ns is not None for r in reports)
+            assert abs(reports[0].finished_ns - reports[1].finished_ns) < 1000 * 1000000
+            for report, (_, timestamps_path) in zip(reports, outputs):
+                assert 5 <= report.n_captured < 60 * 20
+                assert 0 < _n_lines(timestamps_path) <= report.n_captured
+
+
+if __name__ == "__main__":
+    pytest.main()
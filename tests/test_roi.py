@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from sauronlib.camera import Roi
+
+
+def _frame(height: int = 24, width: int = 32) -> np.ndarray:
+    return np.arange(height * width * 3, dtype=np.uint32).reshape(height, width, 3)
+
+
+class TestRoi:
+    def test_roi_at_the_border(self):
+        frame = _frame()
+        roi = Roi(20, 16, 32, 24)
+        assert roi.fits(24, 32) and not roi.fits(23, 32) and not roi.fits(24, 31)
+        cropped = roi.crop(frame)
+        assert cropped.shape == (8, 12, 3)
+        assert np.shares_memory(cropped, frame)
+        assert cropped[-1, -1, 2] == frame[-1, -1, 2]
+        assert np.array_equal(frame[roi.slices()], cropped)
+        assert Roi(0, 0, 32, 24).is_full_frame(24, 32)
+
+    def test_roi_larger_than_the_frame(self):
+        frame = _frame()
+        roi = Roi(0, 0, 40, 30)
+        assert not roi.fits(24, 32)
+        # slicing stops at the edge, so the crop is smaller than the ROI
+        assert roi.crop(frame).shape == (24, 32, 3)
+        assert Roi(28, 20, 36, 28).crop(frame).shape == (4, 4, 3)
+        assert not Roi(-1, 0, 8, 8).fits(24, 32)
+
+    @pytest.mark.parametrize("roi", [Roi(5, 5, 5, 10), Roi(5, 5, 10, 5), Roi(0, 0, 0, 0)])
+    def test_zero_size_roi(self, roi):
+        assert roi.n_pixels() == 0
+        assert not roi.fits(24, 32)
+        assert roi.crop(_frame()).size == 0
+        assert _frame()[roi.slices()].size == 0
+
+
+if __name__ == "__main__":
+    pytest.main()
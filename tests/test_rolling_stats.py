@@ -0,0 +1,59 @@
+import math
+
+import numpy as np
+import pytest
+
+from sauronlib.sensors.rolling_stats import RollingStats
+
+
+class TestRollingStats:
+    def test_matches_numpy(self):
+        values = np.random.RandomState(0).normal(3, 2, size=1001)
+        one_at_a_time, in_blocks = RollingStats(), RollingStats()
+        for v in values:
+            one_at_a_time.update(v)
+        for block in np.array_split(values, 7):
+            in_blocks.update_many(block)
+        for stats in [one_at_a_time, in_blocks]:
+            snap = stats.snapshot()
+            assert snap.count == len(values)
+            assert snap.mean == pytest.approx(values.mean())
+            assert snap.variance == pytest.approx(values.var(ddof=1))
+            assert snap.minimum == values.min() and snap.maximum == values.max()
+            assert snap.rms == pytest.approx(np.sqrt(np.mean(values ** 2)))
+        assert one_at_a_time.snapshot().ewma == pytest.approx(in_blocks.snapshot().ewma)
+
+    @pytest.mark.parametrize("history_of", ["mean", "rms", "peak"])
+    def test_history_across_blocks(self, history_of):
+        values = np.sin(np.arange(1000) / 5)
+        expected = {
+            "mean": lambda g: g.mean(),
+            "rms": lambda g: np.sqrt(np.mean(g ** 2)),
+            "peak": lambda g: np.abs(g).max()
+        }[history_of]
+        one_at_a_time = RollingStats(downsample=50, history_of=history_of)
+        in_blocks = RollingStats(downsample=50, history_of=history_of)
+        for v in values:
+            one_at_a_time.update(v)
+        for block in np.array_split(values, 13):
+            in_blocks.update_many(block)
+        want = [expected(g) for g in values.reshape(20, 50)]
+        assert one_at_a_time.snapshot().history == pytest.approx(want)
+        assert in_blocks.snapshot().history == pytest.approx(want)
+
+    def test_rms_history_of_audio_is_not_zero(self):
+        tone = 0.5 * np.sin(np.arange(4096) * 2 * np.pi * 440 / 44100)
+        mean, rms = RollingStats(downsample=1024), RollingStats(downsample=1024, history_of="rms")
+        mean.update_many(tone)
+        rms.update_many(tone)
+        assert all(abs(p) < 0.05 for p in mean.snapshot().history)
+        assert rms.snapshot().history == pytest.approx([0.5 / math.sqrt(2)] * 4, rel=0.05)
+
+    def test_history_is_bounded(self):
+        stats = RollingStats(history_size=10)
+        stats.update_many(np.arange(100))
+        assert stats.snapshot().history == list(range(90, 100))
+
+
+if __name__ == "__main__":
+    pytest.main()
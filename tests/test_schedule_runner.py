@@ -0,0 +1,129 @@
+import os
+import tempfile
+import time
+
+import numpy as np
+import pydub
+import pytest
+
+from sauronlib.audio_info import AudioInfo, AudioRenderCache
+from sauronlib.audio_output import AudioOutputEngine
+from sauronlib.clock import RunClock
+from sauronlib.scheduling.block_scheduler import Block
+from sauronlib.scheduling.schedule import Schedule
+from sauronlib.scheduling.schedule_runner import ScheduleRunner
+from sauronlib.scheduling.streaming_schedule import StreamingSchedule
+from sauronlib.stimulus import Stimulus, StimulusType
+
+
+def _slow_blocks():
+    time.sleep(0.2)  # such as reading frames from disk
+    yield Block("assay", 0, np.array([255, 255, 0, 0]))
+
+
+class _Wave:
+    def __init__(self, n_samples: int) -> None:
+        self.audio_data = np.ones(n_samples, dtype=np.int16).tobytes()
+
+
+def _engine(sample_rate: int = 1000) -> AudioOutputEngine:
+    # not started: anchors sample 0 to now, as the first callback would
+    engine = AudioOutputEngine(sample_rate=sample_rate)
+    engine._anchor = (0, engine.clock.now_ns())
+    return engine
+
+
+def _queued(engine: AudioOutputEngine):
+    queued = []
+    while not engine._incoming.empty():
+        start, _, samples, _ = engine._incoming.get_nowait()
+        queued.append((start, len(samples)))
+    return queued
+
+
+class TestScheduleRunner:
+    def test_first_event_is_generated_before_start(self):
+        schedule = StreamingSchedule(10).append("led", 1, None, _slow_blocks)
+        runner = ScheduleRunner(schedule)
+        written = []
+        runner.run(written.append, lambda s: None)
+        assert [s.intensity for s in written] == [255, 0, 0]
+        assert runner.lateness.count == 3
+        assert runner.lateness.max < 50 * 1000000
+
+    def test_log_path_bounds_memory(self):
+        times = range(0, 200, 2)
+        schedule = Schedule([(t, Stimulus("led", "led", t % 4 * 85, None, StimulusType.DIGITAL)) for t in times], [], 200, in_order=True)
+        runner = ScheduleRunner(schedule)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "stimuli.csv")
+            log = runner.run(lambda s: None, lambda s: None, log_path=path, max_log_records=10)
+            assert log.n_records == 100 and len(log) == 10
+            assert [r.stimulus.intensity for r in log] == [t % 4 * 85 for t in times][-10:]
+            with open(path) as f:
+                lines = f.read().splitlines()
+            assert lines[0] == "datetime,id,intensity"
+            assert len(lines) == 1 + 1 + 100 + 1
+            assert lines[2].endswith(",led,0") and lines[3].endswith(",led,170")
+            assert lines[-1] == log.clock.stamp(log.end_ns) + ",0,0"
+        assert runner.lateness.count == 100
+
+    def test_each_run_has_its_own_clock_anchor(self):
+        clock = RunClock()
+        anchors, logs = [], []
+        for _ in range(2):
+            time.sleep(0.05)
+            schedule = Schedule([(0, Stimulus("led", "led", 255, None, StimulusType.DIGITAL))], [], 10, in_order=True)
+            logs.append(ScheduleRunner(schedule, clock=clock).run(lambda s: None, lambda s: None))
+            anchors.append((clock.wall_anchor_ns, clock.monotonic_anchor_ns))
+        assert anchors[1][1] - anchors[0][1] >= 50 * 1000000
+        assert anchors[1][0] - anchors[0][0] >= 50 * 1000000
+        # each run's start is stamped relative to its own anchor, moments after it
+        for (_, monotonic_anchor_ns), log in zip(anchors, logs):
+            assert 0 <= log.start_ns - monotonic_anchor_ns < 50 * 1000000
+
+    @pytest.mark.parametrize("with_engine", [False, True])
+    def test_audio_is_rendered_before_start(self, monkeypatch, with_engine):
+        rendered_ns = []
+
+        def render(song, length, *args):
+            rendered_ns.append(time.monotonic_ns())
+            return _Wave(length)
+
+        monkeypatch.setattr(AudioInfo, "render", staticmethod(render))
+        tone = AudioInfo.build("tone", pydub.AudioSegment.silent(duration=10), cache=AudioRenderCache())
+        times = range(0, 100, 10)
+        stimulus_list = [
+            (t, Stimulus("tone", "tone", 255, tone.derive(t % 30 + 5, 255), StimulusType.AUDIO)) for t in times
+        ]
+        runner = ScheduleRunner(Schedule(stimulus_list, [], 100, in_order=True))
+        played = []
+        engine = _engine() if with_engine else None
+        runner.run(lambda s: None, lambda s: played.append(s.audio_obj.samples()), audio_engine=engine)
+        assert len(rendered_ns) == 3
+        assert max(rendered_ns) < runner.started_ns
+        if with_engine:
+            assert len(_queued(engine)) == 10
+        else:
+            assert len(played) == 10
+
+    def test_streaming_audio_is_queued_from_the_same_events(self, monkeypatch):
+        monkeypatch.setattr(AudioInfo, "render", staticmethod(lambda song, length, *args: _Wave(length)))
+        tone = AudioInfo.build("tone", pydub.AudioSegment.silent(duration=10), cache=AudioRenderCache())
+        n_reads = []
+
+        def blocks():
+            n_reads.append(1)
+            yield Block("assay", 0, np.array([0, 0, 255, 255, 255, 0, 0, 0, 100, 100, 0, 0]))
+
+        schedule = StreamingSchedule(20).append("tone", 1, tone, blocks)
+        engine = _engine()
+        runner = ScheduleRunner(schedule, audio_lead_ms=5)
+        runner.run(lambda s: None, lambda s: None, audio_engine=engine)
+        start = engine.sample_at(runner.started_ns)
+        assert n_reads == [1]
+        assert _queued(engine) == [(start + 2, 3), (start + 8, 2)]
+
+
+if __name__ == "__main__":
+    pytest.main()
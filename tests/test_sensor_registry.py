@@ -0,0 +1,165 @@
+import threading
+import time
+
+import pytest
+
+from sauronlib.sensors.sensor import TriggeredSensor
+from sauronlib.sensors.sensor_registry import SensorRegistry, SensorTimeoutError
+
+
+class _LoopingSensor(TriggeredSensor):
+    def __init__(self, name: str, arm_secs: float = 0) -> None:
+        super().__init__()
+        self._name = name
+        self.arm_secs = arm_secs
+        self.n_loops = 0
+
+    def name(self) -> str:
+        return self._name
+
+    def arming(self):
+        return {"arm"}
+
+    def firing(self):
+        return {"go"}
+
+    def disarming(self):
+        return {"stop"}
+
+    def _arm(self) -> None:
+        time.sleep(self.arm_secs)
+
+    def _fire(self) -> None:
+        while not self.should_kill[0]:
+            self.n_loops += 1
+            time.sleep(0.001)
+
+    def _disarm(self) -> None:
+        pass
+
+
+class _RecordingSensor(TriggeredSensor):
+    """Appends (event, name, time.monotonic()) to a shared log when it starts and finishes arming, fires, and disarms."""
+    def __init__(self, name: str, log, arm=(), fire=(), disarm=(), arm_secs: float = 0) -> None:
+        super().__init__()
+        self._name = name
+        self.log = log
+        self._arming, self._firing, self._disarming = set(arm), set(fire), set(disarm)
+        self.arm_secs = arm_secs
+
+    def name(self) -> str:
+        return self._name
+
+    def arming(self):
+        return self._arming
+
+    def firing(self):
+        return self._firing
+
+    def disarming(self):
+        return self._disarming
+
+    def _record(self, event: str) -> None:
+        self.log.append((event, self._name, time.monotonic()))
+
+    def _arm(self) -> None:
+        self._record("arming")
+        time.sleep(self.arm_secs)
+        self._record("armed")
+
+    def _fire(self) -> None:
+        self._record("fired")
+
+    def _disarm(self) -> None:
+        self._record("disarmed")
+
+
+def _times(log, event: str):
+    return {name: t for e, name, t in log if e == event}
+
+
+def _run_with_timeout(function, timeout_secs: float):
+    thread = threading.Thread(target=function, daemon=True)
+    thread.start()
+    thread.join(timeout_secs)
+    return not thread.is_alive()
+
+
+class TestSensorRegistry:
+    def test_stop_with_more_sensors_than_expected_names(self):
+        sensors = [_LoopingSensor(name) for name in ["a", "a", "b", "b"]]
+        registry = SensorRegistry({"a", "b"}).add(*sensors)
+
+        def run():
+            registry.trigger("arm").trigger("go")
+            time.sleep(0.05)
+            registry.trigger("stop")
+
+        assert _run_with_timeout(run, 10)
+        assert registry.armed() == []
+        assert all(not s.is_running() and s.n_loops > 0 for s in sensors)
+        registry.close()
+
+    def test_sensors_added_after_first_fire(self):
+        first = [_LoopingSensor("a"), _LoopingSensor("a")]
+        later = [_LoopingSensor("b"), _LoopingSensor("b")]
+        registry = SensorRegistry({"a", "b"}).add(*first)
+
+        def run():
+            registry.trigger("arm").trigger("go")
+            registry.add(*later)
+            later[0].arm(), later[1].arm()
+            for sensor in later:
+                sensor.fire(registry._fire_executor())
+            time.sleep(0.05)
+            registry.trigger("stop")
+
+        assert _run_with_timeout(run, 10)
+        assert all(s.n_loops > 0 and not s.is_running() for s in first + later)
+        registry.close()
+
+    def test_arm_timeout_names_sensors(self):
+        registry = SensorRegistry({"fast", "slow"}, control_timeout_secs=0.1)
+        registry.add(_LoopingSensor("fast"), _LoopingSensor("slow", arm_secs=1))
+        with pytest.raises(SensorTimeoutError, match="slow"):
+            registry.trigger("arm")
+        registry.close()
+
+
+class TestTriggerFanOut:
+    def test_arms_concurrently_then_fires_then_disarms(self):
+        log = []
+        sensors = [
+            _RecordingSensor("a", log, arm={"start"}, fire={"start"}, disarm={"end"}, arm_secs=0.2),
+            _RecordingSensor("b", log, arm={"start"}, fire={"start"}, disarm={"end"}, arm_secs=0.2),
+            _RecordingSensor("c", log, arm={"start"}, disarm={"start"}, arm_secs=0.2),
+            _RecordingSensor("other", log, arm={"later"}, disarm={"later"}),
+        ]
+        with SensorRegistry({"a", "b", "c", "other"}).add(*sensors) as registry:
+            t0 = time.monotonic()
+            registry.trigger("start")
+            elapsed = time.monotonic() - t0
+            # three 0.2s arms overlap instead of adding up
+            assert elapsed < 0.5
+            arming, armed = _times(log, "arming"), _times(log, "armed")
+            assert set(arming) == set(armed) == {"a", "b", "c"}
+            assert max(arming.values()) < min(armed.values())
+            # every arm finishes before any fire, and fires are started before disarms
+            deadline = time.monotonic() + 5
+            while len(_times(log, "fired")) < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            fired = _times(log, "fired")
+            assert set(fired) == {"a", "b"}
+            assert max(armed.values()) <= min(fired.values())
+            assert set(_times(log, "disarmed")) == {"c"}
+            assert _times(log, "disarmed")["c"] >= max(armed.values())
+            assert not sensors[2].is_armed() and sensors[0].is_armed() and not sensors[3].is_armed()
+            registry.trigger("end").trigger("unknown")
+            assert set(_times(log, "disarmed")) == {"a", "b", "c"}
+            assert [trigger for trigger, _ in registry.trigger_times] == ["start", "end"]
+            assert registry.trigger_times[0][1] == pytest.approx(elapsed, abs=0.05)
+            assert registry.trigger_times[0][1] >= 0.2
+
+
+if __name__ == "__main__":
+    pytest.main()
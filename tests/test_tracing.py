@@ -0,0 +1,112 @@
+import json
+import os
+import tempfile
+import threading
+
+import pytest
+
+from sauronlib.board import BadPinWriteValueException
+from sauronlib.clock import RunClock
+from sauronlib.simulation import SimulatedBoard
+from sauronlib.tracing import Tracer, tracer
+
+
+@pytest.fixture
+def global_tracer():
+    tracer.clear()
+    tracer.enable()
+    yield tracer
+    tracer.disable()
+    tracer.clear()
+
+
+class TestTracer:
+    def test_records_nothing_until_enabled(self):
+        t = Tracer(RunClock())
+        with t.span("ignored"):
+            t.count("ignored")
+            t.observe("ignored_us", 1.0)
+            t.instant("ignored")
+        assert t.events == [] and t.counters == {} and t.histograms == {}
+        t.enable()
+        with t.span("kept"):
+            pass
+        t.disable()
+        with t.span("ignored"):
+            pass
+        assert [e["name"] for e in t.events] == ["kept"]
+
+    def test_nested_spans_contain_each_other(self):
+        t = Tracer(RunClock())
+        t.enable()
+        with t.span("outer", "test", step=1):
+            with t.span("inner", "test"):
+                pass
+        inner, outer = t.events
+        assert (inner["name"], outer["name"]) == ("inner", "outer")
+        assert outer["ts"] <= inner["ts"]
+        assert inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+        assert outer["args"] == {"step": 1} and inner["tid"] == outer["tid"]
+
+    def test_span_records_errors(self):
+        t = Tracer(RunClock())
+        t.enable()
+        with pytest.raises(KeyError):
+            with t.span("fails"):
+                raise KeyError("x")
+        assert t.events[0]["args"] == {"error": "KeyError"}
+
+    def test_writes_chrome_json(self):
+        t = Tracer(RunClock())
+        t.enable()
+        with t.span("work", "test"):
+            t.count("items", 2)
+        thread = threading.Thread(target=lambda: t.instant("block", "test"), name="worker")
+        thread.start()
+        thread.join()
+        for value in [1.5, 2.5, 100.0]:
+            t.observe("lateness_us", value)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "trace.json")
+            t.write_chrome(path)
+            with open(path, encoding="utf8") as f:
+                trace = json.load(f)
+        phases = {e["name"]: e["ph"] for e in trace["traceEvents"] if e["ph"] != "M"}
+        assert phases == {"work": "X", "items": "C", "block": "i"}
+        thread_names = {e["args"]["name"] for e in trace["traceEvents"] if e["ph"] == "M"}
+        assert thread_names == {threading.current_thread().name, "worker"}
+        assert trace["otherData"]["counters"] == {"items": 2}
+        summary = trace["otherData"]["histograms"]["lateness_us"]
+        assert summary["n"] == 3 and summary["max"] == 100.0
+        assert summary["mean"] == pytest.approx(104 / 3)
+
+    def test_histograms_stay_the_same_size(self):
+        t = Tracer(RunClock())
+        t.enable()
+        t.observe("read_ms", 1.0)
+        size = len(t.histograms["read_ms"]._counts)
+        for i in range(10000):
+            t.observe("read_ms", i / 100)
+        assert len(t.histograms["read_ms"]._counts) == size
+        summary = t.histogram_summary()["read_ms"]
+        assert summary["n"] == 10001
+        assert summary["p50"] == pytest.approx(50, rel=0.02)
+        assert summary["max"] == 99.99
+
+
+class TestBoardTracing:
+    def test_rejected_writes_are_not_counted(self, global_tracer):
+        board = SimulatedBoard.for_stimuli(["led"], [])
+        with board:
+            global_tracer.clear()
+            board.set_stimulus("led", 1)
+            board.set_stimulus("led", 0)
+            with pytest.raises(BadPinWriteValueException):
+                board.set_stimulus("led", 2)
+        assert global_tracer.counters["board.writes"] == 2
+        errors = [e["args"].get("error") for e in global_tracer.events if e["name"] == "board.set_stimulus"]
+        assert errors == [None, None, "BadPinWriteValueException"]
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,43 @@
+import os
+import tempfile
+
+import pytest
+
+from sauronlib.camera.trimming import NoFramesInBatteryError, battery_frame_range, trim
+from sauronlib.clock import RunClock
+from sauronlib.scheduling.stimulus_time_log import StimulusTimeLog
+
+
+def _write_timestamps(path, clock, times_ns):
+    with open(path, "w") as f:
+        f.writelines(clock.stamp(t) + "\n" for t in times_ns)
+
+
+class TestTrim:
+    def test_battery_frame_range(self):
+        clock = RunClock()
+        log = StimulusTimeLog(clock=clock)
+        log.start_ns, log.end_ns = clock.monotonic_anchor_ns + 10_000_000, clock.monotonic_anchor_ns + 50_000_000
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "timestamps.txt")
+            _write_timestamps(path, clock, [clock.monotonic_anchor_ns + i * 5_000_000 for i in range(20)])
+            assert battery_frame_range(path, log) == (2, 11, 20)
+
+    def test_empty_range_raises_before_ffmpeg(self):
+        clock = RunClock()
+        log = StimulusTimeLog(clock=clock)
+        log.start_ns, log.end_ns = clock.monotonic_anchor_ns + 1_000_000_000, clock.monotonic_anchor_ns + 2_000_000_000
+        with tempfile.TemporaryDirectory() as temp_dir:
+            timestamps_path = os.path.join(temp_dir, "timestamps.txt")
+            _write_timestamps(timestamps_path, clock, [clock.monotonic_anchor_ns + i * 5_000_000 for i in range(20)])
+            trimmed_path = os.path.join(temp_dir, "trimmed.avi")
+            with pytest.raises(NoFramesInBatteryError):
+                trim(
+                    os.path.join(temp_dir, "video.avi"), timestamps_path, log,
+                    trimmed_path, os.path.join(temp_dir, "trimmed.txt"), fps=200
+                )
+            assert not os.path.exists(trimmed_path)
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,63 @@
+import os
+import tempfile
+
+import cv2
+import numpy as np
+import pytest
+
+from sauronlib.camera.camera_config import CameraConfig, Roi
+from sauronlib.camera.synthetic import SyntheticWebcam
+
+
+class TestWebcamStream:
+    @pytest.mark.parametrize("fps, n_milliseconds, n_frames", [(30, 1000, 30), (20, 500, 10), (7, 1000, 7)])
+    def test_captures_exactly_n_frames(self, fps, n_milliseconds, n_frames):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with SyntheticWebcam(CameraConfig(fps, Roi(0, 0, 32, 24)), temp_dir) as camera:
+                timestamps_path = os.path.join(temp_dir, "timestamps.txt")
+                camera.stream(n_milliseconds, os.path.join(temp_dir, "video.avi"), timestamps_path)
+                stats = camera.stream_stats
+                assert stats.n_captured + stats.n_read_failures == n_frames
+                assert camera.cap.n_read == n_frames
+                with open(timestamps_path) as f:
+                    assert len(f.read().splitlines()) == stats.n_encoded
+
+    def test_started_at_first_frame(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with SyntheticWebcam(CameraConfig(20, Roi(0, 0, 32, 24)), temp_dir) as camera:
+                timestamps_path = os.path.join(temp_dir, "timestamps.txt")
+                before_ns = camera.clock.now_ns()
+                camera.stream(200, os.path.join(temp_dir, "video.avi"), timestamps_path)
+                with open(timestamps_path) as f:
+                    first_stamp = f.readline().strip()
+                stats = camera.stream_stats
+                assert before_ns < stats.started_ns < stats.finished_ns
+                assert camera.clock.stamp(stats.started_ns) == first_stamp
+
+
+class TestWebcamBurst:
+    def test_takes_n_frames_at_the_interval(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with SyntheticWebcam(CameraConfig(50, Roi(4, 2, 36, 26)), temp_dir) as camera:
+                read = camera.cap.read
+                read_ns = []
+
+                def timed_read(*args):
+                    result = read(*args)
+                    read_ns.append(camera.clock.now_ns())
+                    return result
+
+                camera.cap.read = timed_read
+                paths = camera.burst(6, 100, os.path.join(temp_dir, "burst-{:02d}.png"))
+            assert paths == [os.path.join(temp_dir, "burst-{:02d}.png".format(i)) for i in range(6)]
+            assert len(read_ns) == 6
+            # frames arrive every 20ms, so each read is within one frame of its slot
+            intervals_ms = np.diff(read_ns) / 1e6
+            assert np.all(np.abs(intervals_ms - 100) < 25), intervals_ms
+            assert (read_ns[-1] - read_ns[0]) / 1e6 == pytest.approx(500, abs=25)
+            for path in paths:
+                assert cv2.imread(path).shape == (24, 32, 3)
+
+
+if __name__ == "__main__":
+    pytest.main()